@@ -1,19 +1,64 @@
 import os
 import io
+import posixpath
+import gc
 import base64
+import re
 import uuid
 import json
+import gzip
 import zipfile
 import hashlib
-import xml.etree.ElementTree as etree
+from html import escape as _html_escape
+try:
+    # Optional: libxml2-backed parsing — same parse/find/findall/iter API as
+    # the stdlib, but tree walks run in C and parsing releases the GIL, which
+    # lets _parse_slides actually overlap slides across threads
+    from lxml import etree
+except ImportError:
+    import xml.etree.ElementTree as etree
 import concurrent.futures
+from collections import Counter
 from pypdf import PdfReader
+try:
+    import fitz  # PyMuPDF — optional; pulls native image streams with no re-encode
+except ImportError:
+    fitz = None
 from flask import Flask, render_template, request, jsonify, send_from_directory, Response
 from werkzeug.utils import secure_filename
 import urllib.request
 import urllib.error
 from dotenv import load_dotenv
 
+try:
+    # Optional: streams multipart uploads in large chunks instead of
+    # werkzeug's CPU-bound formparser
+    from streaming_form_data import StreamingFormDataParser
+    from streaming_form_data.targets import ValueTarget
+except ImportError:
+    StreamingFormDataParser = None
+
+try:
+    import orjson
+
+    def _json_loads(data):
+        return orjson.loads(data)
+
+    def _json_dumps_bytes(obj):
+        return orjson.dumps(obj)
+
+    def _json_dumps_str(obj):
+        # NON_STR_KEYS: the image/audio lookups are int-keyed
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+except ImportError:
+    _json_loads = json.loads
+
+    def _json_dumps_bytes(obj):
+        return json.dumps(obj).encode("utf-8")
+
+    def _json_dumps_str(obj):
+        return json.dumps(obj, ensure_ascii=False)
+
 load_dotenv()
 
 app = Flask(__name__)
@@ -59,6 +104,64 @@ _NS = {
     "rel": "http://schemas.openxmlformats.org/package/2006/relationships",
 }
 EMU_PER_INCH = 914400
+_EMU_TO_IN = 1.0 / EMU_PER_INCH  # multiply instead of divide in the hot loop
+
+# Pre-expanded element paths for the hot per-picture lookups — find() skips
+# the namespace-map resolution it would otherwise redo on every call
+_BLIP_PATH = f"{{{_NS['p']}}}blipFill/{{{_NS['a']}}}blip"
+_EXT_PATH = f"{{{_NS['p']}}}spPr/{{{_NS['a']}}}xfrm/{{{_NS['a']}}}ext"
+_CNVPR_PATH = f"{{{_NS['p']}}}nvPicPr/{{{_NS['p']}}}cNvPr"
+
+# Clark-notation tags used in the per-slide iter() loops — built once here
+# instead of re-creating the qualified string on every call
+_SP_TAG = f"{{{_NS['p']}}}sp"
+_PIC_TAG = f"{{{_NS['p']}}}pic"
+_T_TAG = f"{{{_NS['a']}}}t"
+_TBL_TAG = f"{{{_NS['a']}}}tbl"
+_BLIP_ANY = f".//{{{_NS['a']}}}blip"
+_EXT_ANY = f".//{{{_NS['a']}}}ext"
+_REL_TAG = f"{{{_NS['rel']}}}Relationship"
+_R_ID_ATTR = f"{{{_NS['r']}}}id"
+_R_EMBED_ATTR = f"{{{_NS['r']}}}embed"
+
+# Fallback slide ordering parses the number out of the member name once,
+# with a precompiled pattern instead of a per-key re.search(r'(\d+)')
+_SLIDE_NUM_RE = re.compile(r"slide(\d+)\.xml$")
+
+# Alt texts marking decorative art we never keep — one compiled alternation
+# instead of a Python-level loop of substring tests per image
+_DECOR_RE = re.compile(r"rasterized|gradient|background|/tmp/", re.IGNORECASE)
+
+# Image keep/drop thresholds: blobs under _IMG_MIN_SIZE bytes (icons,
+# bullets) are dropped before hashing; blobs repeated more than
+# _IMG_MAX_REPEATS times across the deck are treated as decoration
+_IMG_MIN_SIZE = 15_000
+_IMG_MAX_REPEATS = 3
+
+
+def _open_pptx(filepath):
+    """Read a PPTX into memory once and return a ZipFile over the buffer.
+
+    One sequential disk read replaces hundreds of seek+inflate round trips;
+    the central directory is scanned once at open, and every member is read
+    from RAM exactly once per upload (slides via _slide_inventory, rels via
+    _slide_rels_tree, media via the extract-time caches)."""
+    with open(filepath, "rb") as f:
+        data = f.read()
+    return zipfile.ZipFile(io.BytesIO(data))
+
+
+def _pptx_zf(source):
+    """Accept a file path, a file-like object, or an already-open ZipFile.
+
+    Returns (zf, owned) — owned is True when this call opened the archive
+    and the caller is responsible for closing it.
+    """
+    if isinstance(source, zipfile.ZipFile):
+        return source, False
+    if hasattr(source, "read"):
+        return zipfile.ZipFile(source), True
+    return _open_pptx(source), True
 
 
 def _pptx_slide_order(zf):
@@ -68,46 +171,134 @@ def _pptx_slide_order(zf):
         # Get slide rIds in order
         sld_ids = pres.findall(".//p:sldIdLst/p:sldId", _NS)
         sld_ids.sort(key=lambda e: int(e.get("id", "0")))
-        rids = [e.get("{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id")
-                for e in sld_ids]
+        rids = [e.get(_R_ID_ATTR) for e in sld_ids]
         # Resolve rIds via presentation.xml.rels
         rels_tree = etree.parse(zf.open("ppt/_rels/presentation.xml.rels"))
         rid_map = {}
-        for rel in rels_tree.findall("{http://schemas.openxmlformats.org/package/2006/relationships}Relationship"):
+        for rel in rels_tree.findall(_REL_TAG):
             rid_map[rel.get("Id")] = "ppt/" + rel.get("Target").lstrip("/")
         return [rid_map[r] for r in rids if r in rid_map]
     except Exception:
         # Fallback: find slide files and sort numerically
         slides = [n for n in zf.namelist() if n.startswith("ppt/slides/slide") and n.endswith(".xml")]
-        import re as _re
-        slides.sort(key=lambda s: int(_re.search(r'(\d+)', s).group(1)) if _re.search(r'(\d+)', s) else 0)
+
+        def slide_num(s):
+            m = _SLIDE_NUM_RE.search(s)
+            return int(m.group(1)) if m else 0
+
+        slides.sort(key=slide_num)
         return slides
 
 
+def _parse_slides(zf, slide_paths):
+    """Parse slide XML files concurrently, returning {path: tree or None}.
+
+    The zip entries are read serially first — ZipFile serializes concurrent
+    member reads through a shared-file lock anyway, so threading them only
+    adds contention — then the XML parses fan out across a thread pool,
+    where the parser releases the GIL.
+    """
+    def read_one(sp):
+        try:
+            return zf.read(sp)
+        except Exception:
+            return None
+
+    def parse_one(args):
+        sp, data = args
+        if data is None:
+            return sp, None
+        try:
+            return sp, etree.ElementTree(etree.fromstring(data))
+        except Exception:
+            return sp, None
+
+    blobs = [(sp, read_one(sp)) for sp in slide_paths]
+    if len(slide_paths) <= 1:
+        return dict(parse_one(b) for b in blobs)
+    workers = min(8, os.cpu_count() or 1, len(slide_paths))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        return dict(pool.map(parse_one, blobs))
+
+
+def _slide_inventory(zf):
+    """Memoized (slide_paths, trees) for an archive.
+
+    The text, image, and title passes all run against the same ZipFile
+    (see _open_pptx); caching the slide order and parsed trees on it means
+    each slide is inflated and parsed exactly once per upload instead of
+    once per pass."""
+    inv = getattr(zf, "_slide_inventory_cache", None)
+    if inv is None:
+        slide_paths = _pptx_slide_order(zf)
+        inv = zf._slide_inventory_cache = (slide_paths, _parse_slides(zf, slide_paths))
+    return inv
+
+
+def _slide_rels_tree(zf, slide_path):
+    """Memoized parse of a slide's .rels file, or None if absent.
+
+    Notes resolution and image-rel mapping both need the same rels XML;
+    sharing one parse halves that work."""
+    cache = getattr(zf, "_rels_tree_cache", None)
+    if cache is None:
+        cache = zf._rels_tree_cache = {}
+    if slide_path not in cache:
+        rels_path = slide_path.replace("slides/", "slides/_rels/") + ".rels"
+        try:
+            cache[slide_path] = etree.parse(zf.open(rels_path))
+        except Exception:
+            cache[slide_path] = None
+    return cache[slide_path]
+
+
+def _resolve_slide_rel(target):
+    """Resolve a slide-relative rels target to a full archive path.
+
+    Real decks only ever use "../media/…", "../notesSlides/…", absolute
+    "/ppt/…", or plain relative targets, so three prefix checks replace a
+    generic posixpath.normpath per rel; anything stranger still falls back
+    to normpath."""
+    if target.startswith("../"):
+        return "ppt/" + target[3:]
+    if target.startswith("/"):
+        return target[1:]
+    if "../" in target:
+        return posixpath.normpath("ppt/slides/" + target)
+    return "ppt/slides/" + target
+
+
 def _get_slide_texts(slide_tree):
-    """Extract all text runs from a slide XML tree, returns (title, all_texts)."""
+    """Extract all text runs from a slide XML tree.
+
+    Returns (title, all_texts, title_idx) where title_idx is the position
+    of the title inside all_texts, or -1 — callers that want the body text
+    skip that index instead of string-comparing every run against the
+    title."""
     texts = []
     title = ""
-    for sp in slide_tree.iter("{http://schemas.openxmlformats.org/presentationml/2006/main}sp"):
+    title_idx = -1
+    for sp in slide_tree.iter(_SP_TAG):
         # Check if this is a title shape
         ph = sp.find(".//p:nvSpPr/p:nvPr/p:ph", _NS)
         is_title = ph is not None and ph.get("type", "") in ("title", "ctrTitle", "")
         shape_text_parts = []
-        for t_elem in sp.iter("{http://schemas.openxmlformats.org/drawingml/2006/main}t"):
+        for t_elem in sp.iter(_T_TAG):
             if t_elem.text:
                 shape_text_parts.append(t_elem.text)
         shape_text = "".join(shape_text_parts).strip()
         if shape_text:
-            texts.append(shape_text)
             if is_title and not title:
                 title = shape_text
+                title_idx = len(texts)
+            texts.append(shape_text)
     # Also get text from tables
-    for tbl in slide_tree.iter("{http://schemas.openxmlformats.org/drawingml/2006/main}tbl"):
+    for tbl in slide_tree.iter(_TBL_TAG):
         for tr in tbl.findall("a:tr", _NS):
             cells = []
             for tc in tr.findall("a:tc", _NS):
                 cell_parts = []
-                for t_elem in tc.iter("{http://schemas.openxmlformats.org/drawingml/2006/main}t"):
+                for t_elem in tc.iter(_T_TAG):
                     if t_elem.text:
                         cell_parts.append(t_elem.text)
                 cell_text = "".join(cell_parts).strip()
@@ -115,28 +306,50 @@ def _get_slide_texts(slide_tree):
                     cells.append(cell_text)
             if cells:
                 texts.append("[Table row] " + " | ".join(cells))
-    return title, texts
+    return title, texts, title_idx
+
+
+def _slide_text_bundle(zf, slide_path, slide_tree):
+    """Memoized _get_slide_texts, keyed per archive and slide path.
+
+    The text and image passes share one ZipFile (see _open_pptx), so the
+    shape/table walk runs once per slide instead of once per pass."""
+    cache = getattr(zf, "_text_bundle_cache", None)
+    if cache is None:
+        cache = zf._text_bundle_cache = {}
+    if slide_path not in cache:
+        cache[slide_path] = _get_slide_texts(slide_tree)
+    return cache[slide_path]
+
+
+def _stream_text_runs(fileobj):
+    """Collect a:t text runs via iterparse without keeping the full tree.
+
+    Used for single-use parses (speaker notes): each element is cleared as
+    soon as its end event fires, so peak memory stays at one element rather
+    than the whole notes DOM. Slide XML itself is NOT streamed this way —
+    those trees are shared between the text and image passes (see
+    _slide_text_bundle) and need to stay whole."""
+    parts = []
+    for _, elem in etree.iterparse(fileobj, events=("end",)):
+        if elem.tag == _T_TAG and elem.text:
+            parts.append(elem.text)
+        elem.clear()
+    return parts
 
 
 def _get_slide_notes(zf, slide_path):
     """Extract speaker notes for a slide."""
     # Notes are in ppt/notesSlides/notesSlideN.xml, linked via slide rels
-    slide_name = slide_path.split("/")[-1]
-    rels_path = slide_path.replace("slides/", "slides/_rels/") + ".rels"
+    rels_tree = _slide_rels_tree(zf, slide_path)
+    if rels_tree is None:
+        return ""
     try:
-        rels_tree = etree.parse(zf.open(rels_path))
-        for rel in rels_tree.findall("{http://schemas.openxmlformats.org/package/2006/relationships}Relationship"):
+        for rel in rels_tree.findall(_REL_TAG):
             if "notesSlide" in rel.get("Type", ""):
-                notes_path = "ppt/slides/" + rel.get("Target")
-                # Normalize path (handles ../notesSlides/notesSlide1.xml)
-                import posixpath
-                notes_path = posixpath.normpath(notes_path)
-                notes_tree = etree.parse(zf.open(notes_path))
-                parts = []
-                for t_elem in notes_tree.iter("{http://schemas.openxmlformats.org/drawingml/2006/main}t"):
-                    if t_elem.text:
-                        parts.append(t_elem.text)
-                notes = "".join(parts).strip()
+                # Resolves ../notesSlides/notesSlide1.xml and friends
+                notes_path = _resolve_slide_rel(rel.get("Target"))
+                notes = "".join(_stream_text_runs(zf.open(notes_path))).strip()
                 # Filter out slide number placeholders
                 if notes and not notes.isdigit():
                     return notes
@@ -145,48 +358,64 @@ def _get_slide_notes(zf, slide_path):
     return ""
 
 
-def extract_pptx_text(filepath):
+def extract_pptx_text(source):
     """Extract text from every slide in a PPTX, preserving slide structure."""
-    full_text = []
-    with zipfile.ZipFile(filepath, "r") as zf:
-        slide_paths = _pptx_slide_order(zf)
+    buf = io.StringIO()
+    zf, owned = _pptx_zf(source)
+    try:
+        slide_paths, trees = _slide_inventory(zf)
         for i, sp in enumerate(slide_paths):
-            try:
-                slide_tree = etree.parse(zf.open(sp))
-            except Exception:
+            slide_tree = trees.get(sp)
+            if slide_tree is None:
                 continue
-            title, texts = _get_slide_texts(slide_tree)
-            slide_texts = []
-            if title:
-                slide_texts.append(f"Title: {title}")
-            for t in texts:
-                if t != title:
-                    slide_texts.append(t)
+            title, texts, title_idx = _slide_text_bundle(zf, sp, slide_tree)
             notes = _get_slide_notes(zf, sp)
+            if not (title or texts or notes):
+                continue
+            if buf.tell():
+                buf.write("\n\n")
+            buf.write(f"--- Slide {i + 1} ---")
+            if title:
+                buf.write(f"\nTitle: {title}")
+            for j, t in enumerate(texts):
+                if j != title_idx:
+                    buf.write("\n")
+                    buf.write(t)
             if notes:
-                slide_texts.append(f"[Speaker Notes] {notes}")
-            if slide_texts:
-                full_text.append(f"--- Slide {i + 1} ---\n" + "\n".join(slide_texts))
-    return "\n\n".join(full_text)
+                buf.write(f"\n[Speaker Notes] {notes}")
+    finally:
+        if owned:
+            zf.close()
+    return buf.getvalue()
 
 
 def _get_slide_image_rels(zf, slide_path):
     """Get rId→media-path map for images referenced by a slide."""
-    rels_path = slide_path.replace("slides/", "slides/_rels/") + ".rels"
     rel_map = {}
+    rels_tree = _slide_rels_tree(zf, slide_path)
+    if rels_tree is None:
+        return rel_map
     try:
-        rels_tree = etree.parse(zf.open(rels_path))
-        for rel in rels_tree.findall("{http://schemas.openxmlformats.org/package/2006/relationships}Relationship"):
+        for rel in rels_tree.findall(_REL_TAG):
             target = rel.get("Target", "")
             if "/media/" in target or target.startswith("../media/"):
-                import posixpath
-                full = posixpath.normpath("ppt/slides/" + target)
+                full = _resolve_slide_rel(target)
                 rel_map[rel.get("Id")] = full
     except Exception:
         pass
     return rel_map
 
 
+def _data_uri(content_type, blob):
+    """Build a data URI with one bytes concat and a single decode.
+
+    The b64encode→decode→f-string chain allocates three full-size
+    intermediates per image; doing the join in bytes drops one of them.
+    (A preallocated bytearray buys nothing further: b64encode always
+    returns a fresh bytes object, so the copy count is identical.)"""
+    return (b"data:" + content_type.encode("ascii") + b";base64," + _b64encode(blob)).decode("ascii")
+
+
 def _mime_from_ext(path):
     ext = path.rsplit(".", 1)[-1].lower() if "." in path else ""
     return {"png": "image/png", "jpg": "image/jpeg", "jpeg": "image/jpeg",
@@ -195,23 +424,72 @@ def _mime_from_ext(path):
             "wmf": "image/x-wmf"}.get(ext, "image/png")
 
 
-def extract_pptx_images(filepath, max_images=50):
+try:
+    # Optional: SIMD base64 (AVX2/AVX-512) runs at several GB/s vs the
+    # stdlib's scalar loop; same bytes-in/bytes-out signature
+    from pybase64 import b64encode as _b64encode
+except ImportError:
+    _b64encode = base64.b64encode
+
+
+try:
+    # Optional: xxh3 hashes at memory speed; dedup only needs equality,
+    # not collision resistance, so a non-cryptographic hash is fine
+    import xxhash
+
+    def _blob_digest(blob):
+        return xxhash.xxh3_128_digest(blob)
+except ImportError:
+    def _blob_digest(blob):
+        # blake2b is the fastest stdlib hash; 128 bits is plenty for dedup
+        return hashlib.blake2b(blob, digest_size=16).digest()
+
+
+def extract_pptx_images(source, max_images=50):
     """Extract images from PPTX with rich contextual metadata using zipfile+lxml."""
     raw_images = []
     seen_hashes = set()
-    all_blobs = []
+    candidates = []
+    hash_counts = Counter()  # filled inline during the walk — no second pass
 
-    with zipfile.ZipFile(filepath, "r") as zf:
-        slide_paths = _pptx_slide_order(zf)
-        media_cache = {}  # cache media file reads
+    zf, owned = _pptx_zf(source)
+    try:
+        slide_paths, trees = _slide_inventory(zf)
+        digest_cache = {}  # media_path -> digest: shared images hash once
 
-        for i, sp in enumerate(slide_paths):
+        # Resolve every slide's image rels first (the rels parses are
+        # memoized), then inflate all referenced media concurrently — a blob
+        # shared by many slides is read once, and zlib releases the GIL
+        # during decompression
+        rel_maps = {sp: _get_slide_image_rels(zf, sp) for sp in slide_paths}
+        referenced = {p for m in rel_maps.values() for p in m.values()}
+
+        def read_media(p):
             try:
-                slide_tree = etree.parse(zf.open(sp))
-            except Exception:
+                return p, zf.read(p)
+            except KeyError:
+                return p, None
+
+        if len(referenced) > 1:
+            workers = min(8, os.cpu_count() or 1, len(referenced))
+            with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+                media_cache = {p: b for p, b in pool.map(read_media, referenced) if b is not None}
+        else:
+            media_cache = {p: b for p, b in map(read_media, referenced) if b is not None}
+
+        # Local bindings for the hot per-picture loop — global/attribute
+        # lookups cost per access and this loop runs per embedded image
+        blip_path, ext_path, cnvpr_path = _BLIP_PATH, _EXT_PATH, _CNVPR_PATH
+        decor_search = _DECOR_RE.search
+        blob_digest = _blob_digest
+        add_candidate = candidates.append
+
+        for i, sp in enumerate(slide_paths):
+            slide_tree = trees.get(sp)
+            if slide_tree is None:
                 continue
 
-            title, texts = _get_slide_texts(slide_tree)
+            title, texts, _ = _slide_text_bundle(zf, sp, slide_tree)
             if not title and texts:
                 for t in texts:
                     if len(t) > 3:
@@ -221,48 +499,60 @@ def extract_pptx_images(filepath, max_images=50):
             if len(slide_context) > 400:
                 slide_context = slide_context[:400] + "..."
 
-            rel_map = _get_slide_image_rels(zf, sp)
+            rel_map = rel_maps[sp]
 
             # Find all picture shapes (p:pic) in the slide
-            for pic in slide_tree.iter("{http://schemas.openxmlformats.org/presentationml/2006/main}pic"):
+            for pic in slide_tree.iter(_PIC_TAG):
                 try:
                     # Get image relationship ID — blipFill is under p: namespace
-                    blip = pic.find("p:blipFill/a:blip", _NS)
+                    blip = pic.find(blip_path)
                     if blip is None:
                         # Fallback: search anywhere under pic
-                        blip = pic.find(".//{http://schemas.openxmlformats.org/drawingml/2006/main}blip")
+                        blip = pic.find(_BLIP_ANY)
                     if blip is None:
                         continue
-                    rid = blip.get("{http://schemas.openxmlformats.org/officeDocument/2006/relationships}embed")
+                    rid = blip.get(_R_EMBED_ATTR)
                     if not rid or rid not in rel_map:
                         continue
                     media_path = rel_map[rid]
+                    blob = media_cache.get(media_path)
+                    if blob is None:
+                        continue
 
-                    # Read the image blob
-                    if media_path not in media_cache:
-                        try:
-                            media_cache[media_path] = zf.read(media_path)
-                        except KeyError:
-                            continue
-                    blob = media_cache[media_path]
+                    # Early filter: tiny blobs (icons, bullets) are skipped
+                    # before any hashing happens
+                    if len(blob) < _IMG_MIN_SIZE:
+                        continue
+
+                    # Get alt text / shape name — cNvPr is under p:nvPicPr/p:cNvPr
+                    cNvPr = pic.find(cnvpr_path)
+                    alt_text = cNvPr.get("descr", "") if cNvPr is not None else ""
+                    shape_name = cNvPr.get("name", "") if cNvPr is not None else ""
+                    if alt_text and decor_search(alt_text):
+                        continue
 
                     # Get dimensions (EMU) — spPr is under p: namespace, xfrm/ext under a:
-                    ext_elem = pic.find("p:spPr/a:xfrm/a:ext", _NS)
+                    ext_elem = pic.find(ext_path)
                     if ext_elem is None:
-                        ext_elem = pic.find(".//{http://schemas.openxmlformats.org/drawingml/2006/main}ext")
+                        ext_elem = pic.find(_EXT_ANY)
+                    # Raw inches here; rounding waits until we know the image is kept
                     w_inches = h_inches = 0.0
                     if ext_elem is not None:
-                        w_inches = round(int(ext_elem.get("cx", 0)) / EMU_PER_INCH, 1)
-                        h_inches = round(int(ext_elem.get("cy", 0)) / EMU_PER_INCH, 1)
-
-                    # Get alt text / shape name — cNvPr is under p:nvPicPr/p:cNvPr
-                    cNvPr = pic.find("p:nvPicPr/p:cNvPr", _NS)
-                    alt_text = cNvPr.get("descr", "") if cNvPr is not None else ""
-                    shape_name = cNvPr.get("name", "") if cNvPr is not None else ""
+                        w_inches = int(ext_elem.get("cx", 0)) * _EMU_TO_IN
+                        h_inches = int(ext_elem.get("cy", 0)) * _EMU_TO_IN
+                    if h_inches > 0 and w_inches / h_inches > 5:
+                        continue
 
-                    all_blobs.append({
+                    # Dedup at the package-part level: a deck reusing one
+                    # logo/header across N slides hashes its bytes once
+                    digest = digest_cache.get(media_path)
+                    if digest is None:
+                        digest = blob_digest(blob)
+                        digest_cache[media_path] = digest
+                    hash_counts[digest] += 1
+                    add_candidate({
                         "blob": blob,
-                        "hash": hashlib.md5(blob).hexdigest(),
+                        "hash": digest,
                         "size": len(blob),
                         "content_type": _mime_from_ext(media_path),
                         "slide": i + 1,
@@ -275,39 +565,27 @@ def extract_pptx_images(filepath, max_images=50):
                     })
                 except Exception:
                     pass
+    finally:
+        if owned:
+            zf.close()
 
-    # Count repeats
-    hash_counts = {}
-    for b in all_blobs:
-        hash_counts[b["hash"]] = hash_counts.get(b["hash"], 0) + 1
-
-    # Filter and keep meaningful images
-    MIN_SIZE = 15_000
-    MAX_REPEATS = 3
-
-    for b in all_blobs:
+    # Drop over-repeated (decorative) blobs, dedup, and encode the keepers —
+    # the per-blob filters already ran during the walk
+    for b in candidates:
         if len(raw_images) >= max_images:
             break
-        if b["size"] < MIN_SIZE:
-            continue
-        if hash_counts[b["hash"]] > MAX_REPEATS:
+        if hash_counts[b["hash"]] > _IMG_MAX_REPEATS:
             continue
         if b["hash"] in seen_hashes:
             continue
-        alt_lower = (b.get("alt_text") or "").lower()
-        if any(skip in alt_lower for skip in ["rasterized", "gradient", "background", "/tmp/"]):
-            continue
-        w_in, h_in = b["width_inches"], b["height_inches"]
-        if h_in > 0 and w_in / h_in > 5:
-            continue
         seen_hashes.add(b["hash"])
 
-        b64 = base64.b64encode(b["blob"]).decode("utf-8")
-        data_uri = f"data:{b['content_type']};base64,{b64}"
+        data_uri = _data_uri(b["content_type"], b["blob"])
 
         # Classify image type
         sn = b["shape_name"].lower()
-        w, h = b["width_inches"], b["height_inches"]
+        w = round(b["width_inches"], 1)
+        h = round(b["height_inches"], 1)
         area = w * h
         if "chart" in sn: img_type = "chart/graph"
         elif "diagram" in sn: img_type = "diagram"
@@ -338,7 +616,7 @@ def extract_pptx_images(filepath, max_images=50):
         })
 
     raw_images.sort(key=lambda x: (x["page"], -x["size"]))
-    print(f"  PPTX image extraction: {len(all_blobs)} total → {len(raw_images)} kept")
+    print(f"  PPTX image extraction: {len(candidates)} candidates → {len(raw_images)} kept")
     for idx, img in enumerate(raw_images):
         print(f"    [{idx}] {img['desc'][:120]}")
     return raw_images
@@ -346,19 +624,98 @@ def extract_pptx_images(filepath, max_images=50):
 
 # ==================== PDF EXTRACTION (kept for backwards compat) ====================
 
-def extract_pdf_text(filepath):
-    """Extract text from PDF using pypdf."""
-    full_text = []
+def _pdf_text_worker(args):
+    """Extract text for a contiguous page range — top-level so it pickles.
+
+    Each worker process opens its own document handle (never share one
+    across workers) and uses PyMuPDF when installed, else pypdf."""
+    filepath, idxs = args
+    if fitz is not None:
+        doc = fitz.open(filepath)
+        try:
+            return [doc[i].get_text("text").strip("\n") for i in idxs]
+        finally:
+            doc.close()
     reader = PdfReader(filepath)
-    for i, page in enumerate(reader.pages):
-        text = page.extract_text()
+    return [reader.pages[i].extract_text() or "" for i in idxs]
+
+
+def extract_pdf_text(filepath):
+    """Extract text from PDF (PyMuPDF when installed, else pypdf).
+
+    MuPDF parses content streams in C and runs an order of magnitude
+    faster than pypdf's pure-Python extract_text; on large documents the
+    pages additionally fan out over a process pool in contiguous chunks,
+    same as extract_pdf_page_titles. Small PDFs run inline to skip the
+    fork overhead."""
+    try:
+        if fitz is not None:
+            with fitz.open(filepath) as doc:
+                n = doc.page_count
+        else:
+            n = len(PdfReader(filepath).pages)
+    except Exception:
+        n = 0
+
+    texts = None
+    workers = min(8, os.cpu_count() or 1, n or 1)
+    if n >= 16 and workers > 1:
+        step = -(-n // workers)
+        chunks = [(filepath, list(range(s, min(n, s + step)))) for s in range(0, n, step)]
+        try:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+                texts = [t for out in pool.map(_pdf_text_worker, chunks) for t in out]
+        except (OSError, concurrent.futures.process.BrokenProcessPool):
+            texts = None
+    if texts is None:
+        texts = _pdf_text_worker((filepath, list(range(n)))) if n else []
+
+    buf = io.StringIO()
+    for i, text in enumerate(texts):
         if text:
-            full_text.append(f"--- Page {i + 1} ---\n{text}")
-    return "\n\n".join(full_text)
+            if buf.tell():
+                buf.write("\n\n")
+            buf.write(f"--- Page {i + 1} ---\n")
+            buf.write(text)
+    return buf.getvalue()
+
+
+def _extract_pdf_images_fitz(filepath, max_images=30):
+    """Extract embedded images with PyMuPDF — original compressed bytes, no rasterizing."""
+    images = []
+    doc = None
+    try:
+        doc = fitz.open(filepath)
+        for i, page in enumerate(doc):
+            if len(images) >= max_images:
+                break
+            for img in page.get_images(full=True):
+                if len(images) >= max_images:
+                    break
+                try:
+                    info = doc.extract_image(img[0])
+                    data = info["image"]
+                    if len(data) < 5000:
+                        continue  # skip tiny images
+                    images.append({
+                        "page": i + 1,
+                        "data_uri": _data_uri(f"image/{info['ext']}", data),
+                        "desc": f"Image from page {i + 1}"
+                    })
+                except Exception:
+                    pass
+    except Exception as e:
+        print(f"PDF image extraction warning: {e}")
+    finally:
+        if doc is not None:
+            doc.close()
+    return images
 
 
 def extract_pdf_images(filepath, max_images=30):
-    """Extract embedded images from PDF pages using pypdf."""
+    """Extract embedded images from PDF pages (PyMuPDF when installed, else pypdf)."""
+    if fitz is not None:
+        return _extract_pdf_images_fitz(filepath, max_images)
     images = []
     try:
         reader = PdfReader(filepath)
@@ -375,22 +732,24 @@ def extract_pdf_images(filepath, max_images=30):
                 if obj.get("/Subtype") == "/Image":
                     try:
                         data = obj.get_data()
-                        # Determine image format
+                        # Determine image format — pass natively-renderable
+                        # compressed streams through unchanged; raw FlateDecode
+                        # pixel data is not a PNG and would need a re-encode
                         filters = obj.get("/Filter", "")
                         if isinstance(filters, list):
                             filters = filters[0] if filters else ""
-                        if "/DCTDecode" in str(filters):
+                        filters = str(filters)
+                        if "/DCTDecode" in filters:
                             mime = "image/jpeg"
-                        elif "/FlateDecode" in str(filters):
-                            mime = "image/png"
+                        elif "/JPXDecode" in filters:
+                            mime = "image/jp2"
                         else:
-                            mime = "image/png"
+                            continue
                         if len(data) < 5000:
                             continue  # skip tiny images
-                        b64 = base64.b64encode(data).decode("utf-8")
                         images.append({
                             "page": i + 1,
-                            "data_uri": f"data:{mime};base64,{b64}",
+                            "data_uri": _data_uri(mime, data),
                             "desc": f"Image from page {i + 1}"
                         })
                     except Exception:
@@ -411,16 +770,49 @@ def process_uploaded_images(files):
             continue
         blob = f.read()
         content_type = f.content_type or f"image/{ext}"
-        b64 = base64.b64encode(blob).decode("utf-8")
         images.append({
             "page": 0,
-            "data_uri": f"data:{content_type};base64,{b64}",
+            "data_uri": _data_uri(content_type, blob),
             "desc": f"Uploaded: {f.filename}",
             "source": "upload"
         })
     return images
 
 
+def externalize_images(images):
+    """Write image blobs to disk and swap their data URIs for /img/ URLs.
+
+    Base64 data URIs inflate every blob by 33% and get copied through
+    json.dumps and the response body. When the client opts out of inline
+    embedding (embed_images=0) we store blobs once in the upload folder and
+    reference them by short URL instead. Inline stays the default because
+    downloaded lessons must remain self-contained."""
+    for img in images:
+        uri = img.get("data_uri", "")
+        if not uri.startswith("data:"):
+            continue
+        try:
+            header, b64 = uri.split(",", 1)
+            mime = header[5:].split(";", 1)[0]
+            ext = mime.split("/")[-1].split("+")[0] or "png"
+            fname = f"img_{uuid.uuid4().hex}.{ext}"
+            with open(os.path.join(app.config["UPLOAD_FOLDER"], fname), "wb") as f:
+                f.write(base64.b64decode(b64))
+            img["data_uri"] = f"/img/{fname}"
+        except Exception:
+            pass
+    return images
+
+
+@app.route("/img/<filename>")
+def image_asset(filename):
+    resp = send_from_directory(app.config["UPLOAD_FOLDER"], secure_filename(filename))
+    # Filenames embed a per-blob uuid, so the content behind a URL never
+    # changes: let browsers cache forever instead of revalidating per view
+    resp.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    return resp
+
+
 # Ask Claude ONLY for structured JSON slides — NOT the whole HTML
 SLIDES_SYSTEM_PROMPT = r"""You are a world-class instructional designer who creates visually engaging, easy-to-understand lessons. You transform dense source material into clear, visual, memorable learning experiences — like the best TED talks and Duolingo courses combined.
 
@@ -557,7 +949,10 @@ OUTPUT ONLY THE JSON ARRAY. No other text."""
 
 
 def generate_slides_json(pdf_text, api_key, course_title=None, images_info=None, slide_text_notes=None):
-    """Ask Claude to generate ONLY the slides JSON data."""
+    """Ask Claude to generate ONLY the slides JSON data.
+
+    images_info is a flat list of image descriptions indexed by image_idx;
+    slide_text_notes is an int-keyed dict of per-slide user notes."""
     # Don't truncate - send as much as possible (Sonnet has 200K context)
     if len(pdf_text) > 150000:
         pdf_text = pdf_text[:150000] + "\n\n[... Content truncated for context window ...]"
@@ -565,22 +960,25 @@ def generate_slides_json(pdf_text, api_key, course_title=None, images_info=None,
     title_instruction = f'Course Title: "{course_title}". Use this exact name for the course. ' if course_title else "Derive a clear, specific course title from the content (e.g. 'Investor Pitch Deck Masterclass', not 'Interactive Lesson'). "
 
     # Build image info section with rich context for intelligent placement
-    images_section = ""
+    images_parts = []
     if images_info:
-        images_section = "\n\nAVAILABLE IMAGES — You MUST use ALL of these. Place each in the lesson slide matching its source topic:\n"
-        for i, img in enumerate(images_info):
-            images_section += f"  - image_idx {i}: {img['desc']}\n"
-        images_section += "\nREMINDER: Match each image to the lesson content that covers the same topic. Write specific alt text describing what the image shows.\n"
+        images_parts.append("\n\nAVAILABLE IMAGES — You MUST use ALL of these. Place each in the lesson slide matching its source topic:\n")
+        for i, desc in enumerate(images_info):
+            images_parts.append(f"  - image_idx {i}: {desc}\n")
+        images_parts.append("\nREMINDER: Match each image to the lesson content that covers the same topic. Write specific alt text describing what the image shows.\n")
 
     # Build per-slide text notes section
-    notes_section = ""
+    notes_parts = []
     if slide_text_notes:
-        notes_section = "\n\nUSER-ADDED NOTES FOR SPECIFIC SLIDES — incorporate these into the relevant lesson slides:\n"
+        notes_parts.append("\n\nUSER-ADDED NOTES FOR SPECIFIC SLIDES — incorporate these into the relevant lesson slides:\n")
         for slide_idx in sorted(slide_text_notes.keys()):
-            notes_section += f"  - Slide {slide_idx + 1}: {slide_text_notes[slide_idx]}\n"
-        notes_section += "\nThese are additional details the user wants included in the lesson. Weave them naturally into the content for the corresponding slide topics.\n"
+            notes_parts.append(f"  - Slide {slide_idx + 1}: {slide_text_notes[slide_idx]}\n")
+        notes_parts.append("\nThese are additional details the user wants included in the lesson. Weave them naturally into the content for the corresponding slide topics.\n")
 
-    user_content = f"""{title_instruction}Transform this source material into an engaging, visual lesson.
+    # One join builds the message body — no giant f-string re-copying pdf_text
+    user_content = "".join((
+        title_instruction,
+        """Transform this source material into an engaging, visual lesson.
 
 APPROACH:
 - Study how the original material is structured — its flow, its groupings, its visual hierarchy — and MIRROR that in your lesson design.
@@ -590,20 +988,22 @@ APPROACH:
 - Write text blocks as 1-3 SHORT sentences max. Use analogies and real-world examples.
 - Make titles specific and engaging: "3 Ways to X" not just "X Overview".
 - Include ALL content — every detail, every example, every concept. Create as many slides as needed.
-{images_section}{notes_section}
-SOURCE CONTENT:
-{pdf_text}
-
-Return ONLY the JSON array. No markdown, no explanation."""
+""",
+        *images_parts,
+        *notes_parts,
+        "\nSOURCE CONTENT:\n",
+        pdf_text,
+        "\n\nReturn ONLY the JSON array. No markdown, no explanation.",
+    ))
 
     # Use streaming to avoid timeout on long generations
-    payload = json.dumps({
+    payload = _json_dumps_bytes({
         "model": "claude-sonnet-4-20250514",
         "max_tokens": 32000,
         "stream": True,
         "system": SLIDES_SYSTEM_PROMPT,
         "messages": [{"role": "user", "content": user_content}],
-    }).encode("utf-8")
+    })
 
     req = urllib.request.Request(
         "https://api.anthropic.com/v1/messages",
@@ -616,58 +1016,91 @@ Return ONLY the JSON array. No markdown, no explanation."""
         method="POST",
     )
 
-    raw_chunks = []
+    # Parse the SSE stream at the bytes level: splitting on b"\n" can never
+    # land inside a multibyte character (unlike decoding fixed 4096-byte
+    # reads), and deleting consumed bytes from one bytearray avoids the
+    # str-concat + split(…, 1) rebuild of the whole unread remainder
+    buf = bytearray()
     with urllib.request.urlopen(req, timeout=600) as resp:
-        buffer = ""
-        for chunk in iter(lambda: resp.read(4096).decode("utf-8", errors="replace"), ""):
-            buffer += chunk
-            while "\n" in buffer:
-                line, buffer = buffer.split("\n", 1)
-                line = line.strip()
-                if line.startswith("data: "):
-                    data_str = line[6:]
-                    if data_str == "[DONE]":
+        sse = bytearray()
+        while True:
+            chunk = resp.read(8192)
+            if not chunk:
+                break
+            sse += chunk
+            while True:
+                nl = sse.find(b"\n")
+                if nl < 0:
+                    break
+                line = bytes(sse[:nl]).strip()
+                del sse[:nl + 1]
+                if line.startswith(b"data: "):
+                    data = line[6:]
+                    if data == b"[DONE]":
                         break
+                    # Most stream events (ping, message_start, block start/
+                    # stop, message_delta) carry no text — skip their JSON
+                    # parse entirely with one substring probe
+                    if b'"content_block_delta"' not in data:
+                        continue
                     try:
-                        evt = json.loads(data_str)
+                        evt = _json_loads(data)
                         if evt.get("type") == "content_block_delta":
                             delta = evt.get("delta", {})
                             text = delta.get("text", "")
                             if text:
-                                raw_chunks.append(text)
-                    except json.JSONDecodeError:
+                                buf += text.encode("utf-8")
+                    except ValueError:
                         pass
 
-    raw = "".join(raw_chunks).strip()
-
-    # Strip markdown fences if present
-    if raw.startswith("```"):
-        lines = raw.split("\n")
-        lines = lines[1:]  # remove opening fence
-        if lines and lines[-1].strip().startswith("```"):
-            lines = lines[:-1]
-        raw = "\n".join(lines)
-
-    return json.loads(raw)
-
-
-def generate_slide_narration_text(slide):
-    """Extract the narration text for a slide (mirrors JS slideText logic)."""
-    text = slide.get("narration", "") or (slide.get("title", "") + ". " + slide.get("subtitle", ""))
-    # Check if slide has video
+    # Deltas were accumulated straight into a bytes buffer, so the document
+    # reaches the JSON parser with no list-join and no str round trip.
+    # Locate the payload bounds first and slice once — bytes(buf).strip()
+    # would copy the whole response twice
+    i, j = 0, len(buf)
+    while i < j and buf[i] in b" \t\r\n":
+        i += 1
+    while j > i and buf[j - 1] in b" \t\r\n":
+        j -= 1
+    raw = bytes(memoryview(buf)[i:j])
+
+    # Strip markdown fences if present (byte-level slices, no split/join)
+    if raw.startswith(b"```"):
+        nl = raw.find(b"\n")
+        raw = raw[nl + 1:] if nl != -1 else b""
+        tail = raw.rfind(b"\n")
+        if tail != -1 and raw[tail + 1:].strip().startswith(b"```"):
+            raw = raw[:tail]
+
+    return _json_loads(raw)
+
+
+def generate_slide_narration_text(slide, images=None):
+    """Extract the narration text for a slide.
+
+    Must stay byte-identical to the JS slideText() synthesis — both sides
+    hash this text into the persistent TTS cache key, so any drift serves
+    the wrong audio. Slides use the short keys t/s, and the video
+    transition sentence only applies when the referenced media really is a
+    data:video/ URI (mirrors slideHasVideo/isVideo client-side)."""
+    text = slide.get("narration") or slide.get("narr") or (
+        (slide.get("t") or "") + ". " + (slide.get("s") or "")
+    )
     body = slide.get("body", {})
     blocks = body.get("blocks", []) if isinstance(body, dict) else []
-    has_video = any(
+    has_video = images is not None and any(
         b.get("kind", b.get("type", "")) == "image"
-        and b.get("image_idx") is not None
+        and isinstance(b.get("image_idx"), int)
+        and 0 <= b["image_idx"] < len(images)
+        and images[b["image_idx"]].get("data_uri", "").startswith("data:video/")
         for b in blocks if isinstance(b, dict)
     )
     if has_video and not any(w in text.lower() for w in ["video", "watch", "demo", "action", "look at"]):
-        text = text.strip() + " Now, let's watch the video to see this in action."
-    return text.strip()
+        text = text + " Now, let's watch the video to see this in action."
+    return text
 
 
-def pre_generate_audio(slides_data, elevenlabs_key, elevenlabs_voice="EXAVITQu4vr4xnSDxMaL"):
+def pre_generate_audio(slides_data, elevenlabs_key, elevenlabs_voice="EXAVITQu4vr4xnSDxMaL", images=None):
     """Call ElevenLabs TTS for each slide and return dict of {index: base64_mp3}."""
     if not elevenlabs_key:
         return {}
@@ -692,7 +1125,7 @@ def pre_generate_audio(slides_data, elevenlabs_key, elevenlabs_voice="EXAVITQu4v
             })
             with urllib.request.urlopen(req, timeout=30) as resp:
                 audio_bytes = resp.read()
-            return idx, base64.b64encode(audio_bytes).decode("ascii")
+            return idx, _b64encode(audio_bytes).decode("ascii")
         except Exception as e:
             print(f"  Audio gen slide {idx}: {e}")
             return idx, None
@@ -700,7 +1133,7 @@ def pre_generate_audio(slides_data, elevenlabs_key, elevenlabs_voice="EXAVITQu4v
     # Generate narration text for each slide
     tasks = []
     for i, slide in enumerate(slides_data):
-        text = generate_slide_narration_text(slide)
+        text = generate_slide_narration_text(slide, images)
         if text:
             tasks.append((i, text))
 
@@ -716,48 +1149,18 @@ def pre_generate_audio(slides_data, elevenlabs_key, elevenlabs_voice="EXAVITQu4v
     return audio_cache
 
 
-def build_html(slides_data, course_title, elevenlabs_key="", elevenlabs_voice="EXAVITQu4vr4xnSDxMaL", images=None, audio_cache=None):
-    """Wrap the slides JSON in the complete, guaranteed-working HTML shell."""
-
-    # Derive title if not provided — use first content slide's title
-    if not course_title:
-        for s in slides_data:
-            if s.get("type") == "content" and s.get("t"):
-                course_title = s["t"]
-                break
-        if not course_title:
-            course_title = slides_data[0].get("t", "Lesson") if slides_data else "Lesson"
-
-    # Build the welcome subtitle from first content slide
-    welcome_sub = "Master the key concepts through interactive lessons, quizzes, and hands-on activities."
-    for s in slides_data:
-        if s.get("type") == "content" and s.get("s"):
-            welcome_sub = s["s"]
-            break
-
-    slides_json = json.dumps(slides_data, ensure_ascii=False)
-
-    # Build images lookup: index -> data_uri
-    images_dict = {}
-    if images:
-        for i, img in enumerate(images):
-            images_dict[i] = img["data_uri"]
-    images_json = json.dumps(images_dict, ensure_ascii=False)
-
-    # Build pre-generated audio lookup: index -> base64 mp3
-    audio_dict = audio_cache if audio_cache else {}
-    audio_json = json.dumps(audio_dict, ensure_ascii=False)
-
-    return f'''<!DOCTYPE html>
-<html lang="en">
-<head>
-<meta charset="UTF-8">
-<meta name="viewport" content="width=device-width, initial-scale=1, maximum-scale=1, user-scalable=no">
-<title>{course_title}</title>
+# The viewer shell is almost entirely static. Everything below lives in
+# two plain-string module constants built once at import — no per-call
+# re-join of ~100KB of CSS/JS and no f-string brace doubling — while
+# build_html_parts keeps yielding chunks so the multi-MB JSON payloads
+# are never spliced into the markup. Only the handful of interpolated
+# lines (title, narration hashes, voice id) stay in small f-strings.
+_HTML_STATIC_HEAD = '''
 <link href="https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700&display=swap" rel="stylesheet">
+<link rel="preconnect" href="https://api.elevenlabs.io" crossorigin>
 <style>
-*{{margin:0;padding:0;box-sizing:border-box}}
-:root{{
+*{margin:0;padding:0;box-sizing:border-box}
+:root{
   --b:#4E83FF;--b06:#4E83FF10;--b12:#4E83FF1f;--b25:#4E83FF40;
   --g:#16A34A;--g08:#16A34A14;--r:#DC2626;--r08:#DC262614;
   --y:#CA8A04;--y08:#CA8A0414;--gold:#F59E0B;
@@ -765,771 +1168,1351 @@ def build_html(slides_data, course_title, elevenlabs_key="", elevenlabs_voice="E
   --s0:#FAFBFC;--s1:#F4F5F7;--s2:#E5E7EB;--s3:#D1D5DB;
   --c1:#111827;--c2:#4B5563;--c3:#9CA3AF;--c4:#C9CDD3;
   --rd:12px;
-}}
-body{{font-family:'Inter',system-ui,sans-serif;background:#fff;color:var(--c1);-webkit-font-smoothing:antialiased;font-weight:400;letter-spacing:-.01em;line-height:1.6;font-size:15px;overflow:hidden;height:100vh;overflow-wrap:break-word;word-wrap:break-word}}
-
-@keyframes up{{from{{opacity:0;transform:translateY(24px)}}to{{opacity:1;transform:translateY(0)}}}}
-@keyframes fadeIn{{from{{opacity:0}}to{{opacity:1}}}}
-@keyframes slideR{{from{{opacity:0;transform:translateX(-20px)}}to{{opacity:1;transform:translateX(0)}}}}
-@keyframes pop{{from{{opacity:0;transform:scale(.9)}}to{{opacity:1;transform:scale(1)}}}}
-@keyframes slideDown{{from{{opacity:0;transform:translateY(-10px)}}to{{opacity:1;transform:translateY(0)}}}}
-@keyframes xpFloat{{0%{{opacity:1;transform:translateY(0) scale(1)}}60%{{opacity:1;transform:translateY(-40px) scale(1.1)}}100%{{opacity:0;transform:translateY(-70px) scale(.9)}}}}
-@keyframes xpPulse{{0%{{transform:scale(1)}}50%{{transform:scale(1.25)}}100%{{transform:scale(1)}}}}
-@keyframes shake{{0%,100%{{transform:translateX(0)}}20%,60%{{transform:translateX(-4px)}}40%,80%{{transform:translateX(4px)}}}}
-@keyframes glow{{0%,100%{{box-shadow:0 0 0 0 rgba(78,131,255,0)}}50%{{box-shadow:0 0 0 8px rgba(78,131,255,.15)}}}}
-@keyframes correctBounce{{0%{{transform:scale(1)}}25%{{transform:scale(1.05)}}50%{{transform:scale(.97)}}75%{{transform:scale(1.02)}}100%{{transform:scale(1)}}}}
-@keyframes wrongShake{{0%,100%{{transform:translateX(0)}}10%,50%,90%{{transform:translateX(-6px)}}30%,70%{{transform:translateX(6px)}}}}
-@keyframes flashScreen{{0%{{opacity:.3}}100%{{opacity:0}}}}
-@keyframes particle{{0%{{opacity:1;transform:translate(0,0) scale(1) rotate(0deg)}}100%{{opacity:0;transform:translate(var(--dx),var(--dy)) scale(0) rotate(var(--dr))}}}}
-@keyframes starPop{{0%{{opacity:0;transform:scale(0) rotate(-30deg)}}50%{{opacity:1;transform:scale(1.4) rotate(5deg)}}100%{{opacity:0;transform:scale(.3) rotate(20deg) translateY(-20px)}}}}
-@keyframes xpBoom{{0%{{transform:scale(1)}}30%{{transform:scale(1.5)}}60%{{transform:scale(.9)}}100%{{transform:scale(1)}}}}
-@keyframes checkDraw{{to{{stroke-dashoffset:0}}}}
-
-.an{{opacity:0}}.an.go{{animation:up .55s cubic-bezier(.16,1,.3,1) both}}
-.an2{{opacity:0}}.an2.go{{animation:fadeIn .5s ease both}}
-.an3{{opacity:0}}.an3.go{{animation:slideR .5s cubic-bezier(.16,1,.3,1) both}}
-.an4{{opacity:0}}.an4.go{{animation:pop .45s cubic-bezier(.16,1,.3,1) both}}
-.an5{{opacity:0}}.an5.go{{animation:slideDown .4s cubic-bezier(.16,1,.3,1) both}}
-
-.app{{max-width:600px;margin:0 auto;height:100vh;display:flex;flex-direction:column;position:relative;overflow:hidden}}
-.hd{{padding:16px 24px;display:flex;align-items:center;justify-content:space-between;background:rgba(255,255,255,.9);backdrop-filter:blur(16px);-webkit-backdrop-filter:blur(16px);z-index:50;border-bottom:1px solid var(--s2);flex-shrink:0}}
-.hd-l{{display:flex;align-items:center;gap:12px}}
-.ham{{background:none;border:none;cursor:pointer;padding:6px;border-radius:6px;transition:background .2s;display:flex;align-items:center}}
-.ham:hover{{background:var(--s1)}}
-.hd-cat{{font-size:13px;font-weight:500;color:var(--b);text-transform:uppercase;letter-spacing:1.5px}}
-.hd-r{{display:flex;align-items:center;gap:14px}}
-.hd-n{{font-size:12.5px;color:var(--c3)}}
-
-.xp-badge{{display:flex;align-items:center;gap:5px;background:linear-gradient(135deg,#FEF3C7,#FDE68A);border:1px solid #FCD34D;border-radius:20px;padding:4px 12px 4px 8px;font-size:12.5px;color:#92400E;font-weight:500;position:relative;transition:all .3s}}
-.xp-badge svg{{flex-shrink:0}}
-.coin-icon{{display:inline-flex;align-items:center;justify-content:center;width:20px;height:20px;flex-shrink:0}}
-.xp-toast{{position:absolute;top:-8px;right:-4px;font-size:12px;color:var(--gold);font-weight:500;pointer-events:none;animation:xpFloat 1.2s cubic-bezier(.16,1,.3,1) both;white-space:nowrap}}
-.xp-pulse{{animation:xpPulse .4s cubic-bezier(.16,1,.3,1)}}
-
-.bar{{height:2px;background:var(--s1);flex-shrink:0}}
-.bar-f{{height:2px;background:var(--b);transition:width .6s cubic-bezier(.16,1,.3,1)}}
-
-.ct{{flex:1;padding:28px 20px 24px;overflow-x:hidden;overflow-y:auto;-webkit-overflow-scrolling:touch}}
-.ct.entering{{animation:slideEnter .4s cubic-bezier(.16,1,.3,1) both}}
-@keyframes slideEnter{{from{{opacity:0;transform:translateX(30px)}}to{{opacity:1;transform:translateX(0)}}}}
-@keyframes slideEnterBack{{from{{opacity:0;transform:translateX(-30px)}}to{{opacity:1;transform:translateX(0)}}}}
-.ct.entering-back{{animation:slideEnterBack .4s cubic-bezier(.16,1,.3,1) both}}
-.ct h1{{font-size:24px;font-weight:600;text-align:left;color:var(--c1);letter-spacing:-.3px;line-height:1.25;margin-bottom:6px}}
-.ct .sub{{font-size:14px;color:var(--c2);line-height:1.6;margin-bottom:24px;text-align:left}}
-
-.ft{{padding:16px 24px;background:rgba(255,255,255,.9);backdrop-filter:blur(16px);-webkit-backdrop-filter:blur(16px);z-index:50;border-top:1px solid var(--s2);display:flex;justify-content:space-between;align-items:center;flex-shrink:0}}
-.bk{{background:none;border:none;font-size:14px;font-weight:500;color:var(--b);cursor:pointer;font-family:inherit;padding:8px 0;transition:opacity .2s}}
-.bk:disabled{{color:var(--s3);cursor:default}}
-.nx{{background:var(--nv);color:#fff;border:none;font-size:14px;font-weight:600;border-radius:12px;padding:12px 28px;cursor:pointer;font-family:inherit;transition:all .25s cubic-bezier(.16,1,.3,1)}}
-.nx:hover{{transform:translateY(-1px);box-shadow:0 4px 12px rgba(0,0,0,.12)}}
-.nx:disabled{{background:var(--s2);color:var(--c4);cursor:default;transform:none;box-shadow:none}}
-.dots{{display:flex;gap:3px;align-items:center}}
-.dt{{height:4px;border-radius:2px;transition:all .35s cubic-bezier(.16,1,.3,1);cursor:pointer}}
-.dt.on{{width:16px;background:var(--b)}}
-.dt.dn{{width:4px;background:var(--b25)}}
-.dt.of{{width:4px;background:var(--s2)}}
-
-.ov{{position:fixed;inset:0;background:rgba(0,0,0,.15);z-index:100;opacity:0;pointer-events:none;transition:opacity .25s}}
-.ov.open{{opacity:1;pointer-events:auto}}
-.dw{{position:fixed;top:0;left:0;bottom:0;width:264px;background:#fff;z-index:101;padding:28px 0;overflow-y:auto;transform:translateX(-100%);transition:transform .35s cubic-bezier(.16,1,.3,1)}}
-.dw.open{{transform:translateX(0)}}
-.dw-h{{padding:0 24px 20px;font-size:14px;font-weight:500;color:var(--c1)}}
-.dw-c{{padding:12px 24px 4px;font-size:11px;font-weight:500;color:var(--c3);text-transform:uppercase;letter-spacing:1.5px}}
-.dw-i{{display:flex;align-items:center;gap:8px;width:100%;padding:9px 24px 9px 28px;font-size:13.5px;color:var(--c2);background:transparent;border:none;text-align:left;cursor:pointer;font-family:inherit;transition:all .15s}}
-.dw-i:hover{{background:var(--s0);color:var(--c1)}}
-.dw-i.on{{color:var(--b);background:var(--b06)}}
-.dw-i .dw-ico{{font-size:14px;width:20px;text-align:center}}
-
-.crd{{background:#fff;border-radius:16px;border:1px solid var(--s2);padding:28px;max-width:480px;box-shadow:0 1px 3px rgba(0,0,0,.04);text-align:left;margin:0 auto}}
-.ib{{border-radius:10px;padding:16px 20px;font-size:13px;line-height:1.65;text-align:left;max-width:440px;margin:14px auto}}
-.ib.bl{{background:var(--b06);color:var(--c2)}}
-.ib.gn{{background:var(--g08);color:var(--c2)}}
-.ib.yw{{background:var(--y08);color:var(--c2)}}
-.g2{{display:grid;grid-template-columns:1fr 1fr;gap:10px;max-width:100%}}
-.pill{{border:none;border-radius:10px;padding:9px 16px;font-size:12.5px;font-weight:500;cursor:pointer;font-family:inherit;transition:all .2s}}
-.pill.on{{background:var(--nv);color:#fff}}
-.pill.of{{background:var(--s1);color:var(--c2)}}
-.pill.of:hover{{background:var(--s2)}}
-
-.qo{{background:var(--s0);border:1.5px solid var(--s2);border-radius:12px;padding:14px 18px;font-size:13.5px;color:var(--c1);text-align:left;cursor:pointer;font-family:inherit;width:100%;transition:all .25s cubic-bezier(.16,1,.3,1)}}
-.qo:hover:not(:disabled){{border-color:var(--b);background:var(--b06)}}
-.qo.ok{{background:var(--g08);border-color:var(--g);animation:correctBounce .5s cubic-bezier(.16,1,.3,1)}}
-.qo.no{{background:var(--r08);border-color:var(--r);animation:wrongShake .5s ease}}
-.xp-reward{{display:inline-flex;align-items:center;gap:4px;background:linear-gradient(135deg,#FEF3C7,#FDE68A);border-radius:20px;padding:3px 10px;font-size:12.5px;color:#92400E;font-weight:500;margin-left:6px}}
-
-.cele-flash{{position:fixed;inset:0;pointer-events:none;z-index:200;animation:flashScreen .6s ease both}}
-.cele-flash.green{{background:radial-gradient(circle at center,rgba(22,163,74,.25),transparent 70%)}}
-.cele-flash.red{{background:radial-gradient(circle at center,rgba(220,38,38,.2),transparent 70%)}}
-.particle{{position:fixed;pointer-events:none;z-index:201;border-radius:50%;animation:particle var(--dur) cubic-bezier(.16,1,.3,1) both}}
-.particle.square{{border-radius:2px}}
-.star-particle{{position:fixed;pointer-events:none;z-index:201;animation:starPop var(--dur) cubic-bezier(.16,1,.3,1) both}}
-
-.check-circle{{display:inline-block;vertical-align:middle;margin-right:6px}}
-.check-circle svg .check-path{{stroke-dasharray:20;stroke-dashoffset:20;animation:checkDraw .4s .2s ease both}}
-.check-circle svg .circle-path{{stroke-dasharray:100;stroke-dashoffset:100;animation:checkDraw .5s ease both}}
-
-.fas{{min-width:38px;height:38px;border-radius:50%;border:none;font-weight:500;font-size:13px;cursor:pointer;font-family:inherit;transition:all .3s cubic-bezier(.16,1,.3,1)}}
-.fas.dn{{background:var(--g);color:#fff}}
-.fas.nw{{background:var(--nv);color:#fff;animation:glow 2s ease infinite}}
-.fas.wt{{background:var(--s1);color:var(--c3)}}
-
-.tbb{{display:flex;gap:3px;background:var(--s1);border-radius:10px;padding:3px}}
-.tbn{{flex:1;background:transparent;border:none;border-radius:8px;padding:9px 0;font-weight:500;font-size:12px;cursor:pointer;font-family:inherit;transition:all .25s cubic-bezier(.16,1,.3,1);color:var(--c3)}}
-.tbn.on{{background:#fff;box-shadow:0 1px 4px rgba(0,0,0,.05);color:var(--c1)}}
-
-.po{{background:#fff;color:var(--c2);border:1.5px solid var(--s2);border-radius:10px;padding:8px 14px;font-size:12px;cursor:pointer;font-family:inherit;transition:all .25s cubic-bezier(.16,1,.3,1)}}
-.po:hover{{border-color:var(--b)}}
-.po.on{{background:var(--nv);color:#fff;border-color:var(--nv)}}
-
-
-.listen-badge{{display:flex;align-items:center;gap:5px;background:#F0FDFA;border:1px solid #99F6E4;border-radius:16px;padding:3px 10px 3px 6px;font-size:13px;color:#0D9488;font-weight:500;cursor:pointer;transition:all .2s}}
-.listen-badge:hover{{background:#CCFBF1}}
-.listen-badge .eq{{display:flex;align-items:flex-end;gap:1.5px;height:10px}}
-.listen-badge .eq i{{width:2.5px;background:#0D9488;border-radius:1px;animation:eqBar .8s ease infinite alternate}}
-.listen-badge .eq i:nth-child(2){{animation-delay:.2s}}
-.listen-badge .eq i:nth-child(3){{animation-delay:.4s}}
-@keyframes eqBar{{from{{height:3px}}to{{height:10px}}}}
-.listen-badge.off .eq i{{animation:none;height:3px}}
-.listen-badge.off{{background:var(--s1);border-color:var(--s2);color:var(--c3)}}
-.voice-gear{{background:none;border:none;cursor:pointer;font-size:14px;padding:2px 4px;opacity:.4;transition:opacity .2s;display:none}}
-.voice-gear:hover{{opacity:1}}
-body[data-edit] .voice-gear{{display:inline-block}}
-.voice-modal-bg{{position:fixed;top:0;left:0;right:0;bottom:0;background:rgba(0,0,0,.4);z-index:10000;display:flex;align-items:center;justify-content:center}}
-.voice-modal{{background:#fff;border-radius:16px;padding:24px;max-width:380px;width:90%;box-shadow:0 20px 60px rgba(0,0,0,.2)}}
-.voice-modal h3{{margin:0 0 4px;font-size:16px}}
-.voice-modal p{{margin:0 0 16px;font-size:13px;color:var(--c3)}}
-.voice-modal label{{display:block;font-size:12px;font-weight:600;margin-bottom:4px;color:var(--c2)}}
-.voice-modal input{{width:100%;padding:8px 10px;border:1px solid var(--s2);border-radius:8px;font-size:13px;box-sizing:border-box;margin-bottom:12px}}
-.voice-modal .vm-btns{{display:flex;gap:8px;justify-content:flex-end}}
-.voice-modal .vm-btn{{padding:6px 16px;border-radius:8px;font-size:13px;cursor:pointer;border:1px solid var(--s2);background:none;color:var(--c2)}}
-.voice-modal .vm-btn.primary{{background:var(--b);color:#fff;border-color:var(--b)}}
-.voice-modal .vm-status{{font-size:11px;margin-bottom:8px;padding:6px 8px;border-radius:6px}}
-
-.edit-btn{{background:none;border:1px solid var(--s2);border-radius:8px;padding:3px 8px;font-size:12px;color:var(--c3);cursor:pointer;display:none;align-items:center;gap:4px;transition:all .2s}}
-body[data-edit] .edit-btn{{display:flex}}
-.dl-btn{{background:none;border:1px solid var(--s2);border-radius:8px;padding:3px 8px;font-size:12px;color:var(--c3);cursor:pointer;display:none;align-items:center;gap:4px;transition:all .2s}}
-.dl-btn:hover{{border-color:var(--b);color:var(--b)}}
-body[data-edit] .dl-btn{{display:flex}}
-.undo-btn{{background:none;border:1px solid var(--s2);border-radius:8px;padding:3px 8px;font-size:12px;color:var(--c3);cursor:pointer;display:none;align-items:center;gap:4px;transition:all .2s;opacity:.35}}
-.undo-btn:hover{{border-color:var(--b);color:var(--b)}}
-body[data-edit] .undo-btn{{display:flex}}
-.edit-btn:hover{{border-color:var(--b);color:var(--b)}}
-.edit-panel{{position:fixed;inset:0;z-index:400;display:none}}
-.edit-panel.open{{display:flex}}
-.edit-ov{{position:absolute;inset:0;background:rgba(0,0,0,.3);backdrop-filter:blur(4px)}}
-.edit-drawer{{position:absolute;right:0;top:0;bottom:0;width:min(440px,92vw);background:#fff;box-shadow:-4px 0 24px rgba(0,0,0,.12);overflow-y:auto;animation:editIn .3s ease both;display:flex;flex-direction:column}}
-@keyframes editIn{{from{{transform:translateX(100%)}}to{{transform:translateX(0)}}}}
-.edit-drawer h3{{font-size:15px;font-weight:600;color:var(--c1);padding:20px 20px 0;margin:0}}
-.edit-section{{padding:14px 20px;border-bottom:1px solid var(--s1)}}
-.edit-section:last-child{{border-bottom:none}}
-.edit-label{{font-size:11px;font-weight:600;color:var(--c3);text-transform:uppercase;letter-spacing:1px;margin-bottom:6px}}
-.edit-input{{width:100%;padding:8px 12px;border:1px solid var(--s2);border-radius:8px;font-size:13px;font-family:inherit;color:var(--c1);resize:vertical;transition:border-color .2s}}
-.edit-input:focus{{outline:none;border-color:var(--b)}}
-.edit-img-slot{{width:100%;min-height:60px;border:2px dashed var(--s2);border-radius:10px;display:flex;align-items:center;justify-content:center;cursor:pointer;transition:all .2s;overflow:hidden;position:relative;margin-top:6px}}
-.edit-img-slot:hover{{border-color:var(--b);background:var(--b06)}}
-.edit-img-slot img{{max-width:100%;max-height:200px;object-fit:contain}}
-.edit-img-slot .placeholder{{font-size:12px;color:var(--c3);text-align:center;padding:12px}}
-.edit-save{{margin:16px 20px;padding:10px;background:var(--b);color:#fff;border:none;border-radius:10px;font-size:14px;font-weight:600;cursor:pointer;font-family:inherit}}
-.edit-save:hover{{opacity:.9}}
-.edit-insert-media{{text-align:center;padding:4px 0;opacity:.4;transition:opacity .2s}}
-.edit-insert-media:hover{{opacity:1}}
-.edit-insert-btn{{background:none;border:1px dashed var(--s2);border-radius:6px;padding:4px 12px;font-size:10px;color:var(--c3);cursor:pointer;font-family:inherit;transition:all .15s;display:inline-flex;align-items:center;gap:4px}}
-.edit-insert-btn:hover{{border-color:var(--b);color:var(--b);background:var(--b06)}}
-.edit-action-btn{{background:none;border:1px solid var(--s1);border-radius:6px;padding:4px 10px;font-size:11px;color:var(--c2);cursor:pointer;font-family:inherit;transition:all .15s;display:flex;align-items:center;gap:3px}}
-.edit-action-btn:hover{{background:var(--b06);border-color:var(--b);color:var(--b)}}
-.edit-action-btn:disabled{{opacity:.35;cursor:not-allowed}}
-.edit-action-btn:disabled:hover{{background:none;border-color:var(--s1);color:var(--c2)}}
-.edit-block{{background:var(--s0);border:1px solid var(--s1);border-radius:10px;padding:12px;margin-bottom:10px}}
-.edit-block-kind{{font-size:10px;font-weight:600;color:var(--b);text-transform:uppercase;letter-spacing:1px;margin-bottom:6px}}
-.edit-img-actions{{display:flex;gap:6px;margin-top:6px}}
-.edit-img-del{{background:none;border:1px solid #ef4444;border-radius:6px;padding:4px 10px;font-size:11px;color:#ef4444;cursor:pointer;font-family:inherit;transition:all .2s}}
-.edit-img-del:hover{{background:#ef4444;color:#fff}}
-.ai-suggest-wrap{{padding:14px 20px;border-bottom:1px solid var(--s1);background:linear-gradient(135deg,rgba(79,70,229,.04),rgba(168,85,247,.04));display:none}}
-body[data-edit] .ai-suggest-wrap{{display:block}}
-.ai-suggest-row{{display:flex;gap:6px;margin-top:8px}}
-.ai-suggest-input{{flex:1;padding:8px 12px;border:1px solid var(--s2);border-radius:8px;font-size:13px;font-family:inherit;color:var(--c1);resize:none;transition:border-color .2s}}
-.ai-suggest-input:focus{{outline:none;border-color:#7c3aed}}
-.ai-suggest-btn{{padding:8px 14px;background:linear-gradient(135deg,#7c3aed,#6366f1);color:#fff;border:none;border-radius:8px;font-size:12px;font-weight:600;cursor:pointer;font-family:inherit;white-space:nowrap;transition:opacity .2s;display:flex;align-items:center;gap:5px}}
-.ai-suggest-btn:hover{{opacity:.9}}
-.ai-suggest-btn:disabled{{opacity:.5;cursor:not-allowed}}
-.ai-suggest-hint{{font-size:11px;color:var(--c3);margin-top:6px}}
-.ai-suggest-error{{font-size:12px;color:#ef4444;margin-top:6px;display:none}}
-.narr-header{{display:flex;align-items:center;justify-content:space-between}}
-.narr-regen{{background:none;border:1px solid #7c3aed;border-radius:6px;padding:3px 10px;font-size:11px;color:#7c3aed;cursor:pointer;font-family:inherit;transition:all .2s;display:none;align-items:center;gap:4px}}
-body[data-edit] .narr-regen{{display:inline-flex}}
-.narr-regen:hover{{background:#7c3aed;color:#fff}}
-.narr-regen:disabled{{opacity:.5;cursor:not-allowed}}
-.edit-add-img{{display:flex;align-items:center;gap:6px;padding:10px 14px;border:1.5px dashed var(--s2);border-radius:10px;background:none;cursor:pointer;font-size:12px;font-weight:500;color:var(--c3);font-family:inherit;width:100%;transition:all .2s;margin-top:8px;justify-content:center}}
-.edit-add-img:hover{{border-color:var(--b);color:var(--b);background:var(--b06)}}
-
-@keyframes modalIn{{from{{opacity:0;transform:scale(.92) translateY(12px)}}to{{opacity:1;transform:scale(1) translateY(0)}}}}
-@keyframes modalBgIn{{from{{opacity:0}}to{{opacity:1}}}}
-.modal-bg{{position:fixed;inset:0;background:rgba(0,0,0,.25);backdrop-filter:blur(8px);-webkit-backdrop-filter:blur(8px);z-index:300;display:flex;align-items:center;justify-content:center;animation:modalBgIn .3s ease both}}
-.modal{{background:#fff;border-radius:20px;padding:36px 28px;max-width:360px;width:90%;text-align:center;animation:modalIn .45s cubic-bezier(.16,1,.3,1) both;box-shadow:0 24px 60px rgba(0,0,0,.12)}}
-.modal h2{{font-size:18px;font-weight:500;color:var(--c1);margin-bottom:6px}}
-.modal p{{font-size:13px;color:var(--c2);line-height:1.6;margin-bottom:24px}}
-.modal-btn{{width:100%;border:none;border-radius:12px;padding:14px;font-size:14px;font-weight:500;cursor:pointer;font-family:inherit;transition:all .25s cubic-bezier(.16,1,.3,1);margin-bottom:10px;display:flex;align-items:center;justify-content:center;gap:10px}}
-.modal-btn:hover{{transform:translateY(-1px);box-shadow:0 4px 16px rgba(0,0,0,.1)}}
-.modal-btn.primary{{background:var(--nv);color:#fff}}
-.modal-btn.secondary{{background:var(--s1);color:var(--c2)}}
-.modal-btn .btn-icon{{font-size:18px}}
-
-.img-frame{{border:1px solid var(--s2);border-radius:var(--rd);overflow:hidden;margin:14px 0;background:var(--s0)}}
-.img-frame img{{width:100%;display:block}}
-.img-frame-label{{padding:8px 14px;font-size:12px;color:var(--c3);border-top:1px solid var(--s1)}}
-
-@media(max-width:480px){{.g2{{grid-template-columns:1fr}}.ct{{padding:24px 18px 20px}}.hd,.ft{{padding:12px 18px}}}}
+}
+body{font-family:'Inter',system-ui,sans-serif;background:#fff;color:var(--c1);-webkit-font-smoothing:antialiased;font-weight:400;letter-spacing:-.01em;line-height:1.6;font-size:15px;overflow:hidden;height:100vh;overflow-wrap:break-word;word-wrap:break-word}
+
+@keyframes up{from{opacity:0;transform:translateY(24px)}to{opacity:1;transform:translateY(0)}}
+@keyframes fadeIn{from{opacity:0}to{opacity:1}}
+@keyframes slideR{from{opacity:0;transform:translateX(-20px)}to{opacity:1;transform:translateX(0)}}
+@keyframes pop{from{opacity:0;transform:scale(.9)}to{opacity:1;transform:scale(1)}}
+@keyframes slideDown{from{opacity:0;transform:translateY(-10px)}to{opacity:1;transform:translateY(0)}}
+@keyframes xpFloat{0%{opacity:1;transform:translateY(0) scale(1)}60%{opacity:1;transform:translateY(-40px) scale(1.1)}100%{opacity:0;transform:translateY(-70px) scale(.9)}}
+@keyframes xpPulse{0%{transform:scale(1)}50%{transform:scale(1.25)}100%{transform:scale(1)}}
+@keyframes shake{0%,100%{transform:translateX(0)}20%,60%{transform:translateX(-4px)}40%,80%{transform:translateX(4px)}}
+@keyframes glow{0%,100%{box-shadow:0 0 0 0 rgba(78,131,255,0)}50%{box-shadow:0 0 0 8px rgba(78,131,255,.15)}}
+@keyframes correctBounce{0%{transform:scale(1)}25%{transform:scale(1.05)}50%{transform:scale(.97)}75%{transform:scale(1.02)}100%{transform:scale(1)}}
+@keyframes wrongShake{0%,100%{transform:translateX(0)}10%,50%,90%{transform:translateX(-6px)}30%,70%{transform:translateX(6px)}}
+@keyframes flashScreen{0%{opacity:.3}100%{opacity:0}}
+@keyframes particle{0%{opacity:1;transform:translate(0,0) scale(1) rotate(0deg)}100%{opacity:0;transform:translate(var(--dx),var(--dy)) scale(0) rotate(var(--dr))}}
+@keyframes starPop{0%{opacity:0;transform:scale(0) rotate(-30deg)}50%{opacity:1;transform:scale(1.4) rotate(5deg)}100%{opacity:0;transform:scale(.3) rotate(20deg) translateY(-20px)}}
+@keyframes xpBoom{0%{transform:scale(1)}30%{transform:scale(1.5)}60%{transform:scale(.9)}100%{transform:scale(1)}}
+@keyframes checkDraw{to{stroke-dashoffset:0}}
+
+.an{opacity:0}.an.go{animation:up .55s cubic-bezier(.16,1,.3,1) both}
+.an2{opacity:0}.an2.go{animation:fadeIn .5s ease both}
+.an3{opacity:0}.an3.go{animation:slideR .5s cubic-bezier(.16,1,.3,1) both}
+.an4{opacity:0}.an4.go{animation:pop .45s cubic-bezier(.16,1,.3,1) both}
+.an5{opacity:0}.an5.go{animation:slideDown .4s cubic-bezier(.16,1,.3,1) both}
+
+.app{max-width:600px;margin:0 auto;height:100vh;display:flex;flex-direction:column;position:relative;overflow:hidden}
+.hd{padding:16px 24px;display:flex;align-items:center;justify-content:space-between;background:rgba(255,255,255,.9);backdrop-filter:blur(16px);-webkit-backdrop-filter:blur(16px);z-index:50;border-bottom:1px solid var(--s2);flex-shrink:0}
+.hd-l{display:flex;align-items:center;gap:12px}
+.ham{background:none;border:none;cursor:pointer;padding:6px;border-radius:6px;transition:background .2s;display:flex;align-items:center}
+.ham:hover{background:var(--s1)}
+.hd-cat{font-size:13px;font-weight:500;color:var(--b);text-transform:uppercase;letter-spacing:1.5px}
+.hd-r{display:flex;align-items:center;gap:14px}
+.hd-n{font-size:12.5px;color:var(--c3)}
+
+.xp-badge{display:flex;align-items:center;gap:5px;background:linear-gradient(135deg,#FEF3C7,#FDE68A);border:1px solid #FCD34D;border-radius:20px;padding:4px 12px 4px 8px;font-size:12.5px;color:#92400E;font-weight:500;position:relative;transition:background .3s,color .3s,border-color .3s,box-shadow .3s,transform .3s,opacity .3s}
+.xp-badge svg{flex-shrink:0}
+.coin-icon{display:inline-flex;align-items:center;justify-content:center;width:20px;height:20px;flex-shrink:0}
+.xp-toast{position:absolute;top:-8px;right:-4px;font-size:12px;color:var(--gold);font-weight:500;pointer-events:none;animation:xpFloat 1.2s cubic-bezier(.16,1,.3,1) both;white-space:nowrap}
+.xp-pulse{animation:xpPulse .4s cubic-bezier(.16,1,.3,1)}
+
+.bar{height:2px;background:var(--s1);flex-shrink:0}
+.bar-f{height:2px;background:var(--b);transition:width .6s cubic-bezier(.16,1,.3,1)}
+
+.ct{flex:1;padding:28px 20px 24px;overflow-x:hidden;overflow-y:auto;-webkit-overflow-scrolling:touch}
+.ct.entering{animation:slideEnter .4s cubic-bezier(.16,1,.3,1) both}
+@keyframes slideEnter{from{opacity:0;transform:translateX(30px)}to{opacity:1;transform:translateX(0)}}
+@keyframes slideEnterBack{from{opacity:0;transform:translateX(-30px)}to{opacity:1;transform:translateX(0)}}
+.ct.entering-back{animation:slideEnterBack .4s cubic-bezier(.16,1,.3,1) both}
+.ct h1{font-size:24px;font-weight:600;text-align:left;color:var(--c1);letter-spacing:-.3px;line-height:1.25;margin-bottom:6px}
+.ct .sub{font-size:14px;color:var(--c2);line-height:1.6;margin-bottom:24px;text-align:left}
+
+.ft{padding:16px 24px;background:rgba(255,255,255,.9);backdrop-filter:blur(16px);-webkit-backdrop-filter:blur(16px);z-index:50;border-top:1px solid var(--s2);display:flex;justify-content:space-between;align-items:center;flex-shrink:0}
+.bk{background:none;border:none;font-size:14px;font-weight:500;color:var(--b);cursor:pointer;font-family:inherit;padding:8px 0;transition:opacity .2s}
+.bk:disabled{color:var(--s3);cursor:default}
+.nx{background:var(--nv);color:#fff;border:none;font-size:14px;font-weight:600;border-radius:12px;padding:12px 28px;cursor:pointer;font-family:inherit;transition:background .25s cubic-bezier(.16,1,.3,1),color .25s cubic-bezier(.16,1,.3,1),border-color .25s cubic-bezier(.16,1,.3,1),box-shadow .25s cubic-bezier(.16,1,.3,1),transform .25s cubic-bezier(.16,1,.3,1),opacity .25s cubic-bezier(.16,1,.3,1)}
+.nx:hover{transform:translateY(-1px);box-shadow:0 4px 12px rgba(0,0,0,.12)}
+.nx:disabled{background:var(--s2);color:var(--c4);cursor:default;transform:none;box-shadow:none}
+.dots{display:flex;gap:3px;align-items:center}
+.dt{height:4px;border-radius:2px;transition:width .35s cubic-bezier(.16,1,.3,1),background .35s cubic-bezier(.16,1,.3,1);cursor:pointer}
+.dt.on{width:16px;background:var(--b)}
+.dt.dn{width:4px;background:var(--b25)}
+.dt.of{width:4px;background:var(--s2)}
+
+.ov{position:fixed;inset:0;background:rgba(0,0,0,.15);z-index:100;opacity:0;pointer-events:none;transition:opacity .25s}
+.ov.open{opacity:1;pointer-events:auto}
+.dw{position:fixed;top:0;left:0;bottom:0;width:264px;background:#fff;z-index:101;padding:28px 0;overflow-y:auto;transform:translateX(-100%);transition:transform .35s cubic-bezier(.16,1,.3,1)}
+.dw.open{transform:translateX(0)}
+.dw-h{padding:0 24px 20px;font-size:14px;font-weight:500;color:var(--c1)}
+.dw-c{padding:12px 24px 4px;font-size:11px;font-weight:500;color:var(--c3);text-transform:uppercase;letter-spacing:1.5px}
+.dw-i{display:flex;align-items:center;gap:8px;width:100%;padding:9px 24px 9px 28px;font-size:13.5px;color:var(--c2);background:transparent;border:none;text-align:left;cursor:pointer;font-family:inherit;transition:background .15s,color .15s,border-color .15s,box-shadow .15s,transform .15s,opacity .15s}
+.dw-i:hover{background:var(--s0);color:var(--c1)}
+.dw-i.on{color:var(--b);background:var(--b06)}
+.dw-i .dw-ico{font-size:14px;width:20px;text-align:center}
+
+.crd{background:#fff;border-radius:16px;border:1px solid var(--s2);padding:28px;max-width:480px;box-shadow:0 1px 3px rgba(0,0,0,.04);text-align:left;margin:0 auto;contain:layout paint}
+.ib{border-radius:10px;padding:16px 20px;font-size:13px;line-height:1.65;text-align:left;max-width:440px;margin:14px auto}
+.ib.bl{background:var(--b06);color:var(--c2)}
+.ib.gn{background:var(--g08);color:var(--c2)}
+.ib.yw{background:var(--y08);color:var(--c2)}
+.g2{display:grid;grid-template-columns:1fr 1fr;gap:10px;max-width:100%}
+
+/* content-block classes — renderBlock emits these instead of inline styles */
+.blk-text{font-size:13.5px;color:var(--c2);line-height:1.7;margin-bottom:12px}
+.blk-sec{margin-bottom:14px}
+.blk-bullets{font-size:13.5px;color:var(--c2);line-height:1.7;padding-left:20px;margin-bottom:14px}
+.blk-bullets li{margin-bottom:6px}
+.blk-icon-row{display:flex;align-items:flex-start;gap:10px;margin-bottom:10px}
+.blk-icon{font-size:18px;flex-shrink:0}
+.blk-icon-label{font-size:13.5px;color:var(--c2);line-height:1.6;font-weight:500}
+.blk-icon-desc{font-size:12.5px;color:var(--c3);line-height:1.5;margin-top:2px}
+.blk-step-row{display:flex;align-items:flex-start;gap:12px;margin-bottom:12px}
+.blk-step-n{min-width:28px;height:28px;border-radius:50%;background:var(--b);color:#fff;display:flex;align-items:center;justify-content:center;font-size:12px;font-weight:600;flex-shrink:0}
+.blk-step-label{font-size:13.5px;color:var(--c2);line-height:1.6;padding-top:4px}
+.blk-table-wrap{overflow-x:auto;margin-bottom:14px}
+.blk-table-wrap table{width:100%;border-collapse:collapse;background:#fff;border:1px solid var(--s2);border-radius:10px;overflow:hidden}
+.blk-table-wrap th{padding:10px 14px;text-align:left;font-size:12px;font-weight:500;color:var(--c3);text-transform:uppercase;letter-spacing:.5px;border-bottom:1px solid var(--s2)}
+.blk-table-wrap td{padding:10px 14px;font-size:13px;color:var(--c2);border-bottom:1px solid var(--s1)}
+.blk-code{background:var(--nv);color:#e2e8f0;border-radius:10px;padding:18px;font-size:12.5px;line-height:1.6;overflow-x:auto;font-family:'Fira Code',monospace}
+.blk-cmp{border-radius:10px;padding:14px 16px;font-size:13px;color:var(--c2);line-height:1.6}
+.blk-cmp.gd{background:var(--g08)}
+.blk-cmp.bd{background:var(--r08)}
+.blk-heading{font-size:16px;font-weight:600;color:var(--c1);margin:18px 0 8px}
+.blk-divider{border:none;border-top:1px solid var(--s2);margin:16px 0}
+.pill{border:none;border-radius:10px;padding:9px 16px;font-size:12.5px;font-weight:500;cursor:pointer;font-family:inherit;transition:background .2s,color .2s,border-color .2s,box-shadow .2s,transform .2s,opacity .2s}
+.pill.on{background:var(--nv);color:#fff}
+.pill.of{background:var(--s1);color:var(--c2)}
+.pill.of:hover{background:var(--s2)}
+
+.qo{background:var(--s0);border:1.5px solid var(--s2);border-radius:12px;padding:14px 18px;font-size:13.5px;color:var(--c1);text-align:left;cursor:pointer;font-family:inherit;width:100%;transition:background .25s cubic-bezier(.16,1,.3,1),color .25s cubic-bezier(.16,1,.3,1),border-color .25s cubic-bezier(.16,1,.3,1),box-shadow .25s cubic-bezier(.16,1,.3,1),transform .25s cubic-bezier(.16,1,.3,1),opacity .25s cubic-bezier(.16,1,.3,1)}
+.qo:hover:not(:disabled){border-color:var(--b);background:var(--b06)}
+.qo.ok{background:var(--g08);border-color:var(--g);animation:correctBounce .5s cubic-bezier(.16,1,.3,1)}
+.qo.no{background:var(--r08);border-color:var(--r);animation:wrongShake .5s ease}
+.xp-reward{display:inline-flex;align-items:center;gap:4px;background:linear-gradient(135deg,#FEF3C7,#FDE68A);border-radius:20px;padding:3px 10px;font-size:12.5px;color:#92400E;font-weight:500;margin-left:6px}
+
+.cele-flash{position:fixed;inset:0;pointer-events:none;z-index:200;animation:flashScreen .6s ease both;will-change:opacity}
+.cele-flash.green{background:radial-gradient(circle at center,rgba(22,163,74,.25),transparent 70%)}
+.cele-flash.red{background:radial-gradient(circle at center,rgba(220,38,38,.2),transparent 70%)}
+.particle{position:fixed;pointer-events:none;z-index:201;border-radius:50%;animation:particle var(--dur) cubic-bezier(.16,1,.3,1) both;will-change:transform,opacity}
+.particle.square{border-radius:2px}
+.star-particle{position:fixed;pointer-events:none;z-index:201;animation:starPop var(--dur) cubic-bezier(.16,1,.3,1) both;will-change:transform,opacity}
+
+.check-circle{display:inline-block;vertical-align:middle;margin-right:6px}
+.check-circle svg .check-path{stroke-dasharray:20;stroke-dashoffset:20;animation:checkDraw .4s .2s ease both}
+.check-circle svg .circle-path{stroke-dasharray:100;stroke-dashoffset:100;animation:checkDraw .5s ease both}
+
+.fas{min-width:38px;height:38px;border-radius:50%;border:none;font-weight:500;font-size:13px;cursor:pointer;font-family:inherit;transition:background .3s cubic-bezier(.16,1,.3,1),color .3s cubic-bezier(.16,1,.3,1),border-color .3s cubic-bezier(.16,1,.3,1),box-shadow .3s cubic-bezier(.16,1,.3,1),transform .3s cubic-bezier(.16,1,.3,1),opacity .3s cubic-bezier(.16,1,.3,1)}
+.fas.dn{background:var(--g);color:#fff}
+.fas.nw{background:var(--nv);color:#fff;animation:glow 2s ease infinite}
+.fas.wt{background:var(--s1);color:var(--c3)}
+
+.tbb{display:flex;gap:3px;background:var(--s1);border-radius:10px;padding:3px}
+.tbn{flex:1;background:transparent;border:none;border-radius:8px;padding:9px 0;font-weight:500;font-size:12px;cursor:pointer;font-family:inherit;transition:background .25s cubic-bezier(.16,1,.3,1),color .25s cubic-bezier(.16,1,.3,1),border-color .25s cubic-bezier(.16,1,.3,1),box-shadow .25s cubic-bezier(.16,1,.3,1),transform .25s cubic-bezier(.16,1,.3,1),opacity .25s cubic-bezier(.16,1,.3,1);color:var(--c3)}
+.tbn.on{background:#fff;box-shadow:0 1px 4px rgba(0,0,0,.05);color:var(--c1)}
+
+.po{background:#fff;color:var(--c2);border:1.5px solid var(--s2);border-radius:10px;padding:8px 14px;font-size:12px;cursor:pointer;font-family:inherit;transition:background .25s cubic-bezier(.16,1,.3,1),color .25s cubic-bezier(.16,1,.3,1),border-color .25s cubic-bezier(.16,1,.3,1),box-shadow .25s cubic-bezier(.16,1,.3,1),transform .25s cubic-bezier(.16,1,.3,1),opacity .25s cubic-bezier(.16,1,.3,1)}
+.po:hover{border-color:var(--b)}
+.po.on{background:var(--nv);color:#fff;border-color:var(--nv)}
+
+
+.listen-badge{display:flex;align-items:center;gap:5px;background:#F0FDFA;border:1px solid #99F6E4;border-radius:16px;padding:3px 10px 3px 6px;font-size:13px;color:#0D9488;font-weight:500;cursor:pointer;transition:background .2s,color .2s,border-color .2s,box-shadow .2s,transform .2s,opacity .2s}
+.listen-badge:hover{background:#CCFBF1}
+.listen-badge .eq{display:flex;align-items:flex-end;gap:1.5px;height:10px}
+.listen-badge .eq i{width:2.5px;background:#0D9488;border-radius:1px;animation:eqBar .8s ease infinite alternate}
+.listen-badge .eq i:nth-child(2){animation-delay:.2s}
+.listen-badge .eq i:nth-child(3){animation-delay:.4s}
+@keyframes eqBar{from{height:3px}to{height:10px}}
+.listen-badge.off .eq i{animation:none;height:3px}
+.listen-badge.off{background:var(--s1);border-color:var(--s2);color:var(--c3)}
+.voice-gear{background:none;border:none;cursor:pointer;font-size:14px;padding:2px 4px;opacity:.4;transition:opacity .2s;display:none}
+.voice-gear:hover{opacity:1}
+body[data-edit] .voice-gear{display:inline-block}
+.voice-modal-bg{position:fixed;top:0;left:0;right:0;bottom:0;background:rgba(0,0,0,.4);z-index:10000;display:flex;align-items:center;justify-content:center}
+.voice-modal{background:#fff;border-radius:16px;padding:24px;max-width:380px;width:90%;box-shadow:0 20px 60px rgba(0,0,0,.2)}
+.voice-modal h3{margin:0 0 4px;font-size:16px}
+.voice-modal p{margin:0 0 16px;font-size:13px;color:var(--c3)}
+.voice-modal label{display:block;font-size:12px;font-weight:600;margin-bottom:4px;color:var(--c2)}
+.voice-modal input{width:100%;padding:8px 10px;border:1px solid var(--s2);border-radius:8px;font-size:13px;box-sizing:border-box;margin-bottom:12px}
+.voice-modal .vm-btns{display:flex;gap:8px;justify-content:flex-end}
+.voice-modal .vm-btn{padding:6px 16px;border-radius:8px;font-size:13px;cursor:pointer;border:1px solid var(--s2);background:none;color:var(--c2)}
+.voice-modal .vm-btn.primary{background:var(--b);color:#fff;border-color:var(--b)}
+.voice-modal .vm-status{font-size:11px;margin-bottom:8px;padding:6px 8px;border-radius:6px}
+
+.edit-btn{background:none;border:1px solid var(--s2);border-radius:8px;padding:3px 8px;font-size:12px;color:var(--c3);cursor:pointer;display:none;align-items:center;gap:4px;transition:background .2s,color .2s,border-color .2s,box-shadow .2s,transform .2s,opacity .2s}
+body[data-edit] .edit-btn{display:flex}
+.dl-btn{background:none;border:1px solid var(--s2);border-radius:8px;padding:3px 8px;font-size:12px;color:var(--c3);cursor:pointer;display:none;align-items:center;gap:4px;transition:background .2s,color .2s,border-color .2s,box-shadow .2s,transform .2s,opacity .2s}
+.dl-btn:hover{border-color:var(--b);color:var(--b)}
+body[data-edit] .dl-btn{display:flex}
+.undo-btn{background:none;border:1px solid var(--s2);border-radius:8px;padding:3px 8px;font-size:12px;color:var(--c3);cursor:pointer;display:none;align-items:center;gap:4px;transition:background .2s,color .2s,border-color .2s,box-shadow .2s,transform .2s,opacity .2s;opacity:.35}
+.undo-btn:hover{border-color:var(--b);color:var(--b)}
+body[data-edit] .undo-btn{display:flex}
+.edit-btn:hover{border-color:var(--b);color:var(--b)}
+.edit-panel{position:fixed;inset:0;z-index:400;display:none}
+.edit-panel.open{display:flex}
+.edit-ov{position:absolute;inset:0;background:rgba(0,0,0,.3);backdrop-filter:blur(4px)}
+.edit-drawer{position:absolute;right:0;top:0;bottom:0;width:min(440px,92vw);background:#fff;box-shadow:-4px 0 24px rgba(0,0,0,.12);overflow-y:auto;animation:editIn .3s ease both;display:flex;flex-direction:column}
+@keyframes editIn{from{transform:translateX(100%)}to{transform:translateX(0)}}
+.edit-drawer h3{font-size:15px;font-weight:600;color:var(--c1);padding:20px 20px 0;margin:0}
+.edit-section{padding:14px 20px;border-bottom:1px solid var(--s1)}
+.edit-section:last-child{border-bottom:none}
+.edit-label{font-size:11px;font-weight:600;color:var(--c3);text-transform:uppercase;letter-spacing:1px;margin-bottom:6px}
+.edit-input{width:100%;padding:8px 12px;border:1px solid var(--s2);border-radius:8px;font-size:13px;font-family:inherit;color:var(--c1);resize:vertical;transition:border-color .2s}
+.edit-input:focus{outline:none;border-color:var(--b)}
+.edit-img-slot{width:100%;min-height:60px;border:2px dashed var(--s2);border-radius:10px;display:flex;align-items:center;justify-content:center;cursor:pointer;transition:background .2s,color .2s,border-color .2s,box-shadow .2s,transform .2s,opacity .2s;overflow:hidden;position:relative;margin-top:6px}
+.edit-img-slot:hover{border-color:var(--b);background:var(--b06)}
+.edit-img-slot img{max-width:100%;max-height:200px;object-fit:contain}
+.edit-img-slot .placeholder{font-size:12px;color:var(--c3);text-align:center;padding:12px}
+.edit-save{margin:16px 20px;padding:10px;background:var(--b);color:#fff;border:none;border-radius:10px;font-size:14px;font-weight:600;cursor:pointer;font-family:inherit}
+.edit-save:hover{opacity:.9}
+.edit-insert-media{text-align:center;padding:4px 0;opacity:.4;transition:opacity .2s}
+.edit-insert-media:hover{opacity:1}
+.edit-insert-btn{background:none;border:1px dashed var(--s2);border-radius:6px;padding:4px 12px;font-size:10px;color:var(--c3);cursor:pointer;font-family:inherit;transition:background .15s,color .15s,border-color .15s,box-shadow .15s,transform .15s,opacity .15s;display:inline-flex;align-items:center;gap:4px}
+.edit-insert-btn:hover{border-color:var(--b);color:var(--b);background:var(--b06)}
+.edit-action-btn{background:none;border:1px solid var(--s1);border-radius:6px;padding:4px 10px;font-size:11px;color:var(--c2);cursor:pointer;font-family:inherit;transition:background .15s,color .15s,border-color .15s,box-shadow .15s,transform .15s,opacity .15s;display:flex;align-items:center;gap:3px}
+.edit-action-btn:hover{background:var(--b06);border-color:var(--b);color:var(--b)}
+.edit-action-btn:disabled{opacity:.35;cursor:not-allowed}
+.edit-action-btn:disabled:hover{background:none;border-color:var(--s1);color:var(--c2)}
+.edit-block{background:var(--s0);border:1px solid var(--s1);border-radius:10px;padding:12px;margin-bottom:10px}
+.edit-block-kind{font-size:10px;font-weight:600;color:var(--b);text-transform:uppercase;letter-spacing:1px;margin-bottom:6px}
+.edit-img-actions{display:flex;gap:6px;margin-top:6px}
+.edit-img-del{background:none;border:1px solid #ef4444;border-radius:6px;padding:4px 10px;font-size:11px;color:#ef4444;cursor:pointer;font-family:inherit;transition:background .2s,color .2s,border-color .2s,box-shadow .2s,transform .2s,opacity .2s}
+.edit-img-del:hover{background:#ef4444;color:#fff}
+.ai-suggest-wrap{padding:14px 20px;border-bottom:1px solid var(--s1);background:linear-gradient(135deg,rgba(79,70,229,.04),rgba(168,85,247,.04));display:none}
+body[data-edit] .ai-suggest-wrap{display:block}
+.ai-suggest-row{display:flex;gap:6px;margin-top:8px}
+.ai-suggest-input{flex:1;padding:8px 12px;border:1px solid var(--s2);border-radius:8px;font-size:13px;font-family:inherit;color:var(--c1);resize:none;transition:border-color .2s}
+.ai-suggest-input:focus{outline:none;border-color:#7c3aed}
+.ai-suggest-btn{padding:8px 14px;background:linear-gradient(135deg,#7c3aed,#6366f1);color:#fff;border:none;border-radius:8px;font-size:12px;font-weight:600;cursor:pointer;font-family:inherit;white-space:nowrap;transition:opacity .2s;display:flex;align-items:center;gap:5px}
+.ai-suggest-btn:hover{opacity:.9}
+.ai-suggest-btn:disabled{opacity:.5;cursor:not-allowed}
+.ai-suggest-hint{font-size:11px;color:var(--c3);margin-top:6px}
+.ai-suggest-error{font-size:12px;color:#ef4444;margin-top:6px;display:none}
+.narr-header{display:flex;align-items:center;justify-content:space-between}
+.narr-regen{background:none;border:1px solid #7c3aed;border-radius:6px;padding:3px 10px;font-size:11px;color:#7c3aed;cursor:pointer;font-family:inherit;transition:background .2s,color .2s,border-color .2s,box-shadow .2s,transform .2s,opacity .2s;display:none;align-items:center;gap:4px}
+body[data-edit] .narr-regen{display:inline-flex}
+.narr-regen:hover{background:#7c3aed;color:#fff}
+.narr-regen:disabled{opacity:.5;cursor:not-allowed}
+.edit-add-img{display:flex;align-items:center;gap:6px;padding:10px 14px;border:1.5px dashed var(--s2);border-radius:10px;background:none;cursor:pointer;font-size:12px;font-weight:500;color:var(--c3);font-family:inherit;width:100%;transition:background .2s,color .2s,border-color .2s,box-shadow .2s,transform .2s,opacity .2s;margin-top:8px;justify-content:center}
+.edit-add-img:hover{border-color:var(--b);color:var(--b);background:var(--b06)}
+
+@keyframes modalIn{from{opacity:0;transform:scale(.92) translateY(12px)}to{opacity:1;transform:scale(1) translateY(0)}}
+@keyframes modalBgIn{from{opacity:0}to{opacity:1}}
+.modal-bg{position:fixed;inset:0;background:rgba(0,0,0,.25);backdrop-filter:blur(8px);-webkit-backdrop-filter:blur(8px);z-index:300;display:flex;align-items:center;justify-content:center;animation:modalBgIn .3s ease both}
+.modal{background:#fff;border-radius:20px;padding:36px 28px;max-width:360px;width:90%;text-align:center;animation:modalIn .45s cubic-bezier(.16,1,.3,1) both;box-shadow:0 24px 60px rgba(0,0,0,.12);will-change:transform,opacity;contain:layout paint}
+.modal h2{font-size:18px;font-weight:500;color:var(--c1);margin-bottom:6px}
+.modal p{font-size:13px;color:var(--c2);line-height:1.6;margin-bottom:24px}
+.modal-btn{width:100%;border:none;border-radius:12px;padding:14px;font-size:14px;font-weight:500;cursor:pointer;font-family:inherit;transition:background .25s cubic-bezier(.16,1,.3,1),color .25s cubic-bezier(.16,1,.3,1),border-color .25s cubic-bezier(.16,1,.3,1),box-shadow .25s cubic-bezier(.16,1,.3,1),transform .25s cubic-bezier(.16,1,.3,1),opacity .25s cubic-bezier(.16,1,.3,1);margin-bottom:10px;display:flex;align-items:center;justify-content:center;gap:10px}
+.modal-btn:hover{transform:translateY(-1px);box-shadow:0 4px 16px rgba(0,0,0,.1)}
+.modal-btn.primary{background:var(--nv);color:#fff}
+.modal-btn.secondary{background:var(--s1);color:var(--c2)}
+.modal-btn .btn-icon{font-size:18px}
+
+.img-frame{border:1px solid var(--s2);border-radius:var(--rd);overflow:hidden;margin:14px 0;background:var(--s0);contain:layout paint}
+.img-frame img{width:100%;display:block}
+.img-frame-label{padding:8px 14px;font-size:12px;color:var(--c3);border-top:1px solid var(--s1)}
+
+@media(max-width:480px){.g2{grid-template-columns:1fr}.ct{padding:24px 18px 20px}.hd,.ft{padding:12px 18px}}
 </style>
 </head>
 <body data-edit="1">
 <div class="app" id="app"></div>
+<template id="welcome-tpl">
+<div class="modal-bg" id="welcome-modal"><div class="modal">
+  <h2 style="margin-top:8px" data-slot="title"></h2>
+  <p data-slot="sub"></p>
+  <button class="modal-btn primary" data-listen onclick="startListenMode()">Listen Along<span style="font-size:12.5px;color:rgba(255,255,255,.6);margin-left:4px">&#183; auto-play</span></button>
+  <button class="modal-btn secondary" data-read onclick="closeWelcome()">Read at My Pace</button>
+  <div style="font-size:12px;color:var(--c3);margin-top:6px" data-slot="meta"></div>
+</div></div>
+</template>
 <script>
 // ── DATA ──
-/*SDATA*/const slidesData={slides_json};/*EDATA*/
-/*SIMGS*/const IMAGES={images_json};/*EIMGS*/
-/*SAUDIO*/const PREGEN_AUDIO={audio_json};/*EAUDIO*/
-const COURSE_TITLE=`{course_title}`;
+/*SDATA*/const slidesData='''
 
+_VIEWER_JS = '''
 // ── VIDEO BLOB CACHE ──
-const _blobCache={{}};
-function mediaSrc(idx){{
+// Videos decode through fetch(dataURI).blob() — the browser's native
+// base64 decoder — instead of a JS atob + charCodeAt copy loop. The
+// decode is async, so mediaSrc hands back the data URI (which <video>
+// plays directly) until the object URL is ready; boot warms the cache
+// so video slides normally render with the blob URL already built.
+const _blobCache={},_blobPending={};
+function mediaSrc(idx){
   if(idx===undefined||!IMAGES[idx])return'';
   const d=IMAGES[idx];
   if(!d.startsWith('data:video/'))return d;
   if(_blobCache[idx])return _blobCache[idx];
-  try{{
-    const parts=d.split(',');const mime=parts[0].match(/:(.*?);/)[1];
-    const raw=atob(parts[1]);const arr=new Uint8Array(raw.length);
-    for(let i=0;i<raw.length;i++)arr[i]=raw.charCodeAt(i);
-    const url=URL.createObjectURL(new Blob([arr],{{type:mime}}));
-    _blobCache[idx]=url;return url;
-  }}catch(e){{return d}}
-}}
-function isVideo(idx){{return idx!==undefined&&IMAGES[idx]&&IMAGES[idx].startsWith('data:video/')}}
+  if(!_blobPending[idx]){
+    _blobPending[idx]=1;
+    fetch(d).then(r=>r.blob()).then(b=>{_blobCache[idx]=URL.createObjectURL(b);delete _blobPending[idx]}).catch(()=>{delete _blobPending[idx]});
+  }
+  return d;
+}
+for(const k in IMAGES)mediaSrc(k);
+function isVideo(idx){return idx!==undefined&&IMAGES[idx]&&IMAGES[idx].startsWith('data:video/')}
 
 // ── SVG CONSTANTS ──
 const coinSvg=`<svg width="18" height="18" viewBox="0 0 512 512" fill="none" xmlns="http://www.w3.org/2000/svg"><circle cx="256" cy="256" r="256" fill="none"/><path d="M35.27 78.8c2.85-5.62 5.81-11 11.04-14.75 14.26-10.22 35.08-10.9 52.02-9.29 46.82 4.44 94 23.1 135.53 44.37 24.51 12.57 48.09 26.87 70.56 42.8 5.77 4.11 14.44 10.22 19.8 14.72 3.41 2.98 7.41 5.66 10.79 8.74.79.72 2.94 2.63 3.77 3.11 6.32-2.9 13.85-5.04 20.46-7.02 20.64-6.18 42.63-11.06 64.21-11.49 18.58-.37 42.62 2.35 51.44 21.3.42.91 1.03 2.01 1.58 2.84 1.16 1.63 1.72 3.15 2.72 4.7 2.76 4.32 5.09 8.81 7.67 13.22l14.16 24.5c7.32 12.75 12.81 19.38 9.89 35.2-2.42 13.12-8.08 22.62-14.88 33.76-3.01 4.63-8.02 11.83-11.83 15.75-1.05 1.59-1.97 2.57-3.19 4-9.51 11.12-20.16 21.58-30.91 31.49-2.32 2.1-11.93 10.76-14.06 11.69-1.55 1.46-3.23 2.87-4.93 4.16-10.66 8.1-21.8 17.08-33.01 24.4-2.14 1.31-13.78 9.3-15.06 9.68-12.55 7.9-27.52 16.94-40.76 23.58-1.34.97-14.13 7.46-16.12 8.2-11.28 5.28-22.46 10.62-34.09 15.1-3.17 1.23-6.46 2.43-9.57 3.77-2.5 1.29-14.06 5.12-17.05 6.02-17.53 5.31-29.48 8.78-47.93 11.97-3.89.8-16.46 2.39-20.02 2.08-10.47.66-18.56.24-28.86-1.82-21.21-4.24-25.55-15.37-35.34-32.4l-10.85-18.79c-3.36-5.91-7.09-12.75-10.67-18.43-.44-.98-2.43-4.3-3.13-5.4-3.06-4.87-4.53-10.34-4.59-16.11-.25-22.59 20.09-51.4 35.14-65.9-.63-.87-3.48-2.38-4.51-2.95-1.9-1.37-3.6-2.36-5.59-3.55-5.15-3.13-10.2-6.42-15.14-9.87-1.87-1.51-5.08-3.56-7.11-4.95-3.57-2.44-7.08-4.95-10.54-7.55-4.44-3.31-8.84-6.68-13.2-10.09-2.57-2.01-4.69-3.96-7.43-5.77-3.23-2.52-11.18-9.35-13.84-12.15-2.2-1.68-5.42-4.92-7.49-6.88-7.44-7.06-14.93-14.54-21.53-22.4-1.87-2.24-3.27-3.31-5.05-5.91-2.76-3.4-9.63-11.68-11.5-15.47C7.44 177.87-3.22 154.45 1.48 139.25c2.38-7.67 9.62-18.87 13.92-26.23 6.54-11.19 12.99-23.3 19.87-34.22z" fill="#FECD3E"/><path d="M35.27 78.8c2.85-5.62 5.81-11 11.04-14.75 14.26-10.22 35.08-10.9 52.02-9.29 46.82 4.44 94 23.1 135.53 44.37 24.51 12.57 48.09 26.87 70.56 42.8 5.77 4.11 14.44 10.22 19.8 14.72-.89.84-6.55 3.4-8.01 4.1-5.83 2.81-11.63 5.7-17.37 8.68-1.72.88-7.61 3.9-8.97 4.93l-.32-.05c-10.9 6.24-22.33 12.41-32.99 19.03-13.92 8.67-27.53 17.83-40.82 27.46l-.23.05c-8.65 6.57-17.38 12.94-25.67 19.97-1.25 1.06-3.03 2.68-4.37 3.51l.01.09c-11.52 9.16-25.39 22.71-35.5 33.24-2.78 2.95-5.5 5.96-8.14 9.04-1.43 1.65-5.68 6.97-7.15 7.9-1.89-1.36-3.59-2.36-5.59-3.55-5.15-3.13-10.2-6.42-15.14-9.87-1.87-1.51-5.08-3.56-7.11-4.95-3.57-2.44-7.08-4.95-10.54-7.55-4.44-3.31-8.84-6.68-13.2-10.09-2.57-2.01-4.69-3.96-7.43-5.77-3.23-2.52-11.18-9.35-13.84-12.15-2.2-1.68-5.42-4.92-7.49-6.88-7.44-7.06-14.93-14.54-21.53-22.4-1.87-2.24-3.27-3.31-5.05-5.91-2.76-3.4-9.63-11.68-11.5-15.47C7.44 177.87-3.22 154.45 1.48 139.25c2.38-7.67 9.62-18.87 13.92-26.23 6.54-11.19 12.99-23.3 19.87-34.22z" fill="#FECD3E"/><path d="M16.27 190.03C7.44 177.87-3.22 154.45 1.48 139.25c2.38-7.67 9.62-18.87 13.92-26.22 6.54-11.19 12.99-23.3 19.87-34.23.02.09.05.19.07.28.62 2.66-.23 5.47-.32 8.17-.2 6.4 1.41 13.03 3.54 19.02 16.66 46.69 80.87 96.59 122.47 123.15 5.06 3.23 10.16 6.39 15.32 9.46 2.79 1.66 6.5 3.7 9.14 5.46l.01.09c-11.52 9.16-25.39 22.71-35.5 33.24-2.78 2.95-5.5 5.96-8.14 9.04-1.43 1.65-5.68 6.97-7.15 7.9-1.89-1.36-3.59-2.36-5.59-3.55-5.15-3.13-10.2-6.42-15.14-9.87-1.87-1.51-5.08-3.56-7.11-4.95-3.57-2.44-7.08-4.95-10.54-7.54-4.44-3.32-8.84-6.68-13.2-10.09-2.57-2.01-4.69-3.96-7.43-5.77-3.23-2.52-11.18-9.36-13.84-12.15-2.2-1.68-5.42-4.92-7.49-6.88-7.44-7.06-14.93-14.54-21.53-22.4-1.87-2.24-3.27-3.31-5.05-5.9-2.76-3.4-9.63-11.68-11.5-15.48z" fill="#FEA02C"/><path d="M411.19 183.65c6.6-.63 16.5-.65 22.07 3.63 2.39 1.84 3.5 4.26 3.83 7.21.95 8.69-7.95 21.12-13.25 27.44C377.19 277.48 240.24 357.73 169.56 364.44c-6.71.41-16.38.66-21.82-4.11-2.09-1.83-3.36-4.41-3.54-7.18-.63-9.82 8.8-21.96 15.06-29.12C203.63 273.3 298.49 218.85 361.87 196.04c15.11-5.44 33.23-11.3 49.32-12.39z" fill="#FEA02C"/><path d="M365.18 81.86c1.6-.04 3.19-.11 4.79-.18-.12 5.9.19 12.78-.14 18.48 5.89-.2 12.35-.12 18.28-.16-.24 4.44-.06 10.24-.06 14.75-4.49-.02-14.6.24-18.45-.14.6 5.09.21 12.93.45 18.49-3.06-.14-6.62-.07-9.71-.08l-5.34.08c-.01-4.87-.25-14.01.18-18.57-5.18.71-12.45-.16-18.21.5-.07-5-.09-10.01-.05-15 5.66.15 12.94-.22 18.28.18-.43-4.49-.22-13.32-.24-18.17 3.4.03 6.79-.01 10.18-.11h.04zM34.1 298.96c4.86.14 10.09.03 14.98.02-.21 5.85.22 12.65-.19 18.27 5.69-.12 12.7.26 18.24-.26-.19 3.96-.19 11.19.13 15.04-5.31-.23-13.76.19-18.45-.22.2 1.91.45 17.16.13 18.4-4.45-.33-10.27-.13-14.82-.06-.08-1.3-.03-2.6-.01-3.9.1-4.85-.04-9.71.12-14.56-1.87.3-5.27.22-7.28.22-3.65-.02-7.29.03-10.94.15-.09-4.94-.03-10.13-.04-15.09 4.98.64 13.04.12 18.38.3-.35-3.48-.37-14.57-.28-18.3z" fill="#FEA02C"/></svg>`;
 const logoSvg=`<svg width="28" height="28" viewBox="0 0 40 40" fill="none"><rect width="40" height="40" rx="10" fill="#4E83FF"/><path d="M10 28L20 12L30 28" stroke="#fff" stroke-width="2.5" stroke-linecap="round" stroke-linejoin="round"/><path d="M15 22L20 14L25 22" stroke="#fff" stroke-width="1.5" stroke-linecap="round" opacity=".5"/><circle cx="20" cy="10" r="2" fill="#fff"/></svg>`;
 const animCheck=`<span class="check-circle"><svg width="20" height="20" viewBox="0 0 24 24" fill="none"><circle class="circle-path" cx="12" cy="12" r="10" stroke="#16A34A" stroke-width="2"/><path class="check-path" d="M8 12.5l2.5 3 5.5-6" stroke="#16A34A" stroke-width="2" stroke-linecap="round" stroke-linejoin="round"/></svg></span>`;
+// Parse the big SVG literals once into templates; render paths emit tiny
+// <span data-coin>/<span data-check> placeholders and get clones appended
+// after innerHTML, instead of re-tokenizing kilobytes of markup per render
+const coinTpl=document.createElement('template');coinTpl.innerHTML=coinSvg;
+const checkTpl=document.createElement('template');checkTpl.innerHTML=animCheck;
+function fillSvgSlots(root){
+  root.querySelectorAll('[data-coin]').forEach(n=>{if(!n.firstChild)n.appendChild(coinTpl.content.firstChild.cloneNode(true))});
+  root.querySelectorAll('[data-check]').forEach(n=>{if(!n.firstChild)n.appendChild(checkTpl.content.firstChild.cloneNode(true))});
+}
 
 // ── XP ──
 let xp=0;
 const COLORS=['#4E83FF','#003D5B','#FF6B35','#16A34A','#8B5CF6','#06B6D4','#EC4899'];
-function addXP(n){{
+function addXP(n){
   xp+=n;
   const badge=document.getElementById('xp-val');
   const wrap=document.getElementById('xp-wrap');
-  if(badge){{badge.textContent=xp;wrap.classList.remove('xp-pulse');void wrap.offsetWidth;wrap.classList.add('xp-pulse')}}
-  const toast=document.createElement('div');toast.className='xp-toast';toast.textContent=`+${{n}}`;
-  if(wrap){{wrap.appendChild(toast);setTimeout(()=>toast.remove(),1300)}}
-}}
-function celebrate(originEl){{
-  const flash=document.createElement('div');flash.className='cele-flash green';document.body.appendChild(flash);setTimeout(()=>flash.remove(),700);
+  if(badge){badge.textContent=xp;wrap.classList.remove('xp-pulse');void wrap.offsetWidth;wrap.classList.add('xp-pulse')}
+  const toast=document.createElement('div');toast.className='xp-toast';toast.textContent=`+${n}`;
+  if(wrap){wrap.appendChild(toast);setTimeout(()=>toast.remove(),1300)}
+}
+// Collapse DOM writes from effects firing in the same tick into one frame
+let _rafCbs=null;
+function rafBatch(cb){
+  if(!_rafCbs){_rafCbs=[];requestAnimationFrame(()=>{const cbs=_rafCbs;_rafCbs=null;cbs.forEach(f=>f())})}
+  _rafCbs.push(cb);
+}
+// Staggered entrance animation driven by one rAF loop: all elements whose
+// delay has elapsed flip in the same frame, instead of N independent timers
+// each forcing their own style recalc
+let _stgGen=0;
+function stagger(els,step=70){
+  const gen=++_stgGen,t0=performance.now();
+  let next=0;
+  function tick(now){
+    if(gen!==_stgGen)return;
+    while(next<els.length&&now-t0>=next*step){els[next].classList.add('go');next++}
+    if(next<els.length)requestAnimationFrame(tick);
+  }
+  requestAnimationFrame(tick);
+}
+// Prebuilt effect nodes: cloneNode skips per-particle createElement +
+// className work, and direct style writes skip re-parsing a cssText blob
+const particleTpl=document.createElement('div');particleTpl.className='particle';
+const starTpl=document.createElement('div');starTpl.className='star-particle';
+starTpl.innerHTML='<svg width="16" height="16" viewBox="0 0 32 32"><ellipse cx="16" cy="16" rx="12" ry="10"/></svg>';
+// Per-particle trajectories computed once at load: evenly spaced angles at
+// three distance rings, size/duration/spin cycled deterministically. A burst
+// only adds one random jitter, so the per-celebration trig and RNG calls
+// collapse to table lookups.
+const P_N=24,P_DX=new Float32Array(P_N),P_DY=new Float32Array(P_N),P_SIZE=new Float32Array(P_N),P_DUR=new Float32Array(P_N),P_DR=new Float32Array(P_N),P_COLOR=[];
+for(let i=0;i<P_N;i++){
+  const ang=i*(Math.PI*2/P_N),dist=60+(i%3)*45;
+  P_DX[i]=Math.cos(ang)*dist;P_DY[i]=Math.sin(ang)*dist-40;
+  P_SIZE[i]=3+(i%5)*1.6;P_DUR[i]=.5+(i%4)*.12;P_DR[i]=((i*83)%400)-200;
+  P_COLOR.push(COLORS[i%COLORS.length]);
+}
+const S_N=5,S_OX=new Float32Array(S_N),S_OY=new Float32Array(S_N),S_DUR=new Float32Array(S_N),S_COLOR=[];
+for(let i=0;i<S_N;i++){
+  S_OX[i]=(i/(S_N-1)-.5)*120;S_OY[i]=((i*2)%S_N/(S_N-1)-.5)*80-20;S_DUR[i]=.4+(i%3)*.1;
+  S_COLOR.push(COLORS[(i+3)%COLORS.length]);
+}
+const P_MAXMS=Math.max(700,Math.max(...P_DUR)*1000+50);
+function celebrate(originEl){
   let cx=window.innerWidth/2,cy=window.innerHeight/2;
-  if(originEl){{const r=originEl.getBoundingClientRect();cx=r.left+r.width/2;cy=r.top+r.height/2}}
-  for(let i=0;i<24;i++){{const p=document.createElement('div');p.className='particle'+(Math.random()>.5?' square':'');const size=Math.random()*7+3;const angle=Math.random()*Math.PI*2;const dist=Math.random()*140+60;const dx=Math.cos(angle)*dist;const dy=Math.sin(angle)*dist-40;const dur=Math.random()*.4+.5;p.style.cssText=`left:${{cx}}px;top:${{cy}}px;width:${{size}}px;height:${{size}}px;background:${{COLORS[i%COLORS.length]}};--dx:${{dx}}px;--dy:${{dy}}px;--dr:${{Math.random()*400-200}}deg;--dur:${{dur}}s;`;document.body.appendChild(p);setTimeout(()=>p.remove(),dur*1000+50)}}
-  for(let i=0;i<5;i++){{const s=document.createElement('div');s.className='star-particle';const ox=(Math.random()-.5)*120;const oy=(Math.random()-.5)*80-20;const dur=Math.random()*.3+.4;s.style.cssText=`left:${{cx+ox}}px;top:${{cy+oy}}px;--dur:${{dur}}s;`;s.innerHTML=`<svg width="16" height="16" viewBox="0 0 32 32" fill="${{COLORS[(i+3)%COLORS.length]}}"><ellipse cx="16" cy="16" rx="12" ry="10"/></svg>`;document.body.appendChild(s);setTimeout(()=>s.remove(),dur*1000+50)}}
-}}
-function wrongFlash(){{const flash=document.createElement('div');flash.className='cele-flash red';document.body.appendChild(flash);setTimeout(()=>flash.remove(),600)}}
+  if(originEl){const r=originEl.getBoundingClientRect();cx=r.left+r.width/2;cy=r.top+r.height/2}
+  // Assemble all 30 effect nodes off-document, append once, reap once
+  const frag=document.createDocumentFragment();
+  const nodes=[];
+  const jx=(Math.random()-.5)*30,jy=(Math.random()-.5)*30;
+  const flash=document.createElement('div');flash.className='cele-flash green';frag.appendChild(flash);nodes.push(flash);
+  for(let i=0;i<P_N;i++){
+    const p=particleTpl.cloneNode(false);
+    if(i&1)p.classList.add('square');
+    const st=p.style;
+    st.left=cx+'px';st.top=cy+'px';st.width=P_SIZE[i]+'px';st.height=P_SIZE[i]+'px';st.background=P_COLOR[i];
+    st.setProperty('--dx',(P_DX[i]+jx)+'px');st.setProperty('--dy',(P_DY[i]+jy)+'px');st.setProperty('--dr',P_DR[i]+'deg');st.setProperty('--dur',P_DUR[i]+'s');
+    frag.appendChild(p);nodes.push(p);
+  }
+  for(let i=0;i<S_N;i++){
+    const s=starTpl.cloneNode(true);
+    const st=s.style;
+    st.left=(cx+S_OX[i]+jx)+'px';st.top=(cy+S_OY[i]+jy)+'px';st.setProperty('--dur',S_DUR[i]+'s');
+    s.firstChild.setAttribute('fill',S_COLOR[i]);
+    frag.appendChild(s);nodes.push(s);
+  }
+  rafBatch(()=>{document.body.appendChild(frag);setTimeout(()=>nodes.forEach(n=>n.remove()),P_MAXMS)});
+}
+function wrongFlash(){const flash=document.createElement('div');flash.className='cele-flash red';rafBatch(()=>{document.body.appendChild(flash);setTimeout(()=>flash.remove(),600)})}
 
 // ── BUILD SLIDES ARRAY ──
-function renderBlock(b){{
-  if(!b) return '';
-  if(typeof b==='string') return `<div class="an" style="font-size:13.5px;color:var(--c2);line-height:1.7;margin-bottom:12px">${{b}}</div>`;
-  const k=b.kind||b.type||'';
-  if(k==='text') return `<div class="an" style="font-size:13.5px;color:var(--c2);line-height:1.7;margin-bottom:12px">${{b.html||b.text||b.content||''}}</div>`;
-  if(k==='bullets'){{
-    const items=(b.items||[]).map(x=>`<li style="margin-bottom:6px">${{x}}</li>`).join('');
-    return `<ul class="an" style="font-size:13.5px;color:var(--c2);line-height:1.7;padding-left:20px;margin-bottom:14px">${{items}}</ul>`;
-  }}
-  if(k==='icons'){{
-    const items=(b.items||[]).map(x=>{{
+// Rendered-HTML cache keyed on the slide data object itself: lookup is a
+// reference compare (never a stringify), and swapping/reordering slides
+// keeps their entries alive. Mutation paths delete the entry instead.
+const renderCache=new WeakMap();
+// Same idea one level down: blocks shared between slides (or re-rendered
+// after a cache miss at the slide level) format once per object
+const blockCache=new WeakMap();
+function renderBlock(b){
+  if(!b)return '';
+  if(typeof b!=='object')return renderBlockUncached(b);
+  let h=blockCache.get(b);
+  if(h===undefined){h=renderBlockUncached(b);blockCache.set(b,h)}
+  return h;
+}
+// One tight renderer per block kind: the per-block dispatch is a direct
+// call through b.__render instead of walking a 12-branch if-chain, and
+// each callsite stays monomorphic for the JIT
+const RENDERERS={
+  text:b=>`<div class="an blk-text">${b.html||b.text||b.content||''}</div>`,
+  bullets(b){
+    const parts=['<ul class="an blk-bullets">'];
+    const items=b.items||[];
+    for(let i=0;i<items.length;i++)parts.push('<li>',items[i],'</li>');
+    parts.push('</ul>');
+    return parts.join('');
+  },
+  icons(b){
+    const parts=['<div class="an blk-sec">'];
+    const items=b.items||[];
+    for(let i=0;i<items.length;i++){
+      const x=items[i];
       const label=x.label||x.text||x;
       const desc=x.desc||x.description||'';
       const icon=x.icon||x.emoji||'•';
-      return `<div style="display:flex;align-items:flex-start;gap:10px;margin-bottom:10px"><span style="font-size:18px;flex-shrink:0">${{icon}}</span><div><div style="font-size:13.5px;color:var(--c2);line-height:1.6;font-weight:500">${{label}}</div>${{desc?`<div style="font-size:12.5px;color:var(--c3);line-height:1.5;margin-top:2px">${{desc}}</div>`:''}}</div></div>`;
-    }}).join('');
-    return `<div class="an" style="margin-bottom:14px">${{items}}</div>`;
-  }}
-  if(k==='steps'){{
-    const items=(b.items||[]).map((x,i)=>{{
-      const label=x.label||x.text||x;
-      return `<div style="display:flex;align-items:flex-start;gap:12px;margin-bottom:12px"><div style="min-width:28px;height:28px;border-radius:50%;background:var(--b);color:#fff;display:flex;align-items:center;justify-content:center;font-size:12px;font-weight:600;flex-shrink:0">${{i+1}}</div><div style="font-size:13.5px;color:var(--c2);line-height:1.6;padding-top:4px">${{label}}</div></div>`;
-    }}).join('');
-    return `<div class="an" style="margin-bottom:14px">${{items}}</div>`;
-  }}
-  if(k==='tip'||k==='info'){{
+      parts.push('<div class="blk-icon-row"><span class="blk-icon">',icon,'</span><div><div class="blk-icon-label">',label,'</div>');
+      if(desc)parts.push('<div class="blk-icon-desc">',desc,'</div>');
+      parts.push('</div></div>');
+    }
+    parts.push('</div>');
+    return parts.join('');
+  },
+  steps(b){
+    const parts=['<div class="an blk-sec">'];
+    const items=b.items||[];
+    for(let i=0;i<items.length;i++){
+      const label=items[i].label||items[i].text||items[i];
+      parts.push('<div class="blk-step-row"><div class="blk-step-n">',i+1,'</div><div class="blk-step-label">',label,'</div></div>');
+    }
+    parts.push('</div>');
+    return parts.join('');
+  },
+  tip(b){
     const cls=b.style==='green'?'gn':b.style==='yellow'?'yw':'bl';
     const icon=b.icon||b.emoji||(cls==='gn'?'\\u2705':cls==='yw'?'\\uD83D\\uDCA1':'\\u2139\\uFE0F');
-    return `<div class="ib ${{cls}} an">${{icon}} &nbsp;${{b.text||b.content||''}}</div>`;
-  }}
-  if(k==='table'){{
-    const hdr=(b.headers||[]).map(h=>`<th style="padding:10px 14px;text-align:left;font-size:12px;font-weight:500;color:var(--c3);text-transform:uppercase;letter-spacing:.5px;border-bottom:1px solid var(--s2)">${{h}}</th>`).join('');
-    const rows=(b.rows||[]).map(row=>`<tr>${{row.map(cell=>`<td style="padding:10px 14px;font-size:13px;color:var(--c2);border-bottom:1px solid var(--s1)">${{cell}}</td>`).join('')}}</tr>`).join('');
-    return `<div class="an" style="overflow-x:auto;margin-bottom:14px"><table style="width:100%;border-collapse:collapse;background:#fff;border:1px solid var(--s2);border-radius:10px;overflow:hidden"><thead><tr>${{hdr}}</tr></thead><tbody>${{rows}}</tbody></table></div>`;
-  }}
-  if(k==='code'){{
-    return `<div class="an" style="margin-bottom:14px"><pre style="background:var(--nv);color:#e2e8f0;border-radius:10px;padding:18px;font-size:12.5px;line-height:1.6;overflow-x:auto;font-family:'Fira Code',monospace">${{b.code||b.text||b.content||''}}</pre></div>`;
-  }}
-  if(k==='compare'){{
-    if(b.good!==undefined||b.bad!==undefined){{
+    return `<div class="ib ${cls} an">${icon} &nbsp;${b.text||b.content||''}</div>`;
+  },
+  table(b){
+    const parts=['<div class="an blk-table-wrap"><table><thead><tr>'];
+    const headers=b.headers||[];
+    for(let i=0;i<headers.length;i++)parts.push('<th>',headers[i],'</th>');
+    parts.push('</tr></thead><tbody>');
+    const rows=b.rows||[];
+    for(let i=0;i<rows.length;i++){
+      parts.push('<tr>');
+      for(let j=0;j<rows[i].length;j++)parts.push('<td>',rows[i][j],'</td>');
+      parts.push('</tr>');
+    }
+    parts.push('</tbody></table></div>');
+    return parts.join('');
+  },
+  code:b=>`<div class="an blk-sec"><pre class="blk-code">${b.code||b.text||b.content||''}</pre></div>`,
+  compare(b){
+    if(b.good!==undefined||b.bad!==undefined){
       const gLabel=b.good_label||'Do This';const bLabel=b.bad_label||'Not This';
-      return `<div class="g2 an" style="margin-bottom:14px"><div style="background:var(--g08);border-radius:10px;padding:14px 16px;font-size:13px;color:var(--c2);line-height:1.6"><strong>\\u2705 ${{gLabel}}</strong><br>${{b.good||''}}</div><div style="background:var(--r08);border-radius:10px;padding:14px 16px;font-size:13px;color:var(--c2);line-height:1.6"><strong>\\u274C ${{bLabel}}</strong><br>${{b.bad||''}}</div></div>`;
-    }}
-    const items=(b.items||[]).map(x=>{{
+      return `<div class="g2 an blk-sec"><div class="blk-cmp gd"><strong>\\u2705 ${gLabel}</strong><br>${b.good||''}</div><div class="blk-cmp bd"><strong>\\u274C ${bLabel}</strong><br>${b.bad||''}</div></div>`;
+    }
+    const parts=['<div class="g2 an blk-sec">'];
+    const items=b.items||[];
+    for(let i=0;i<items.length;i++){
+      const x=items[i];
       const bg=x.color==='green'?'var(--g08)':x.color==='red'?'var(--r08)':'var(--b06)';
       const icon=x.icon||x.emoji||(x.color==='green'?'\\u2705':'\\u274C');
-      return `<div style="background:${{bg}};border-radius:10px;padding:14px 16px;font-size:13px;color:var(--c2);line-height:1.6"><strong>${{icon}} ${{x.label||''}}</strong><br>${{x.text||x.content||''}}</div>`;
-    }}).join('');
-    return `<div class="g2 an" style="margin-bottom:14px">${{items}}</div>`;
-  }}
-  if(k==='image'){{
+      parts.push('<div class="blk-cmp" style="background:',bg,'"><strong>',icon,' ',x.label||'','</strong><br>',x.text||x.content||'','</div>');
+    }
+    parts.push('</div>');
+    return parts.join('');
+  },
+  image(b){
     const idx=b.image_idx;
-    if(idx!==undefined && IMAGES[idx]){{
+    if(idx!==undefined && IMAGES[idx]){
       const alt=b.alt||b.caption||'';
       const src=mediaSrc(idx);
-      if(isVideo(idx)){{
-        return `<div class="img-frame an slide-video-wrap"><video src="${{src}}" controls playsinline class="slide-video" style="width:100%;display:block"></video>${{alt?`<div class="img-frame-label">${{alt}}</div>`:''}}</div>`;
-      }}
-      return `<div class="img-frame an"><img src="${{src}}" alt="${{alt}}" loading="lazy">${{alt?`<div class="img-frame-label">${{alt}}</div>`:''}}</div>`;
-    }}
+      if(isVideo(idx)){
+        return `<div class="img-frame an slide-video-wrap"><video src="${src}" controls playsinline class="slide-video" style="width:100%;display:block"></video>${alt?`<div class="img-frame-label">${alt}</div>`:''}</div>`;
+      }
+      return `<div class="img-frame an"><img src="${src}" alt="${alt}" loading="lazy" decoding="async" fetchpriority="low">${alt?`<div class="img-frame-label">${alt}</div>`:''}</div>`;
+    }
     return '';
-  }}
-  if(k==='heading') return `<div class="an" style="font-size:16px;font-weight:600;color:var(--c1);margin:18px 0 8px">${{b.text||b.content||''}}</div>`;
-  if(k==='divider') return `<hr class="an" style="border:none;border-top:1px solid var(--s2);margin:16px 0">`;
-  // fallback: render any text-like content
-  if(b.text||b.content) return `<div class="an" style="font-size:13.5px;color:var(--c2);line-height:1.7;margin-bottom:12px">${{b.text||b.content}}</div>`;
-  return '';
-}}
-
-function buildContentSlide(d){{
-  let html='<div style="max-width:100%">';
+  },
+  heading:b=>`<div class="an blk-heading">${b.text||b.content||''}</div>`,
+  divider:()=>`<hr class="an blk-divider">`,
+  fallback:b=>(b.text||b.content)?`<div class="an blk-text">${b.text||b.content}</div>`:'',
+};
+RENDERERS.info=RENDERERS.tip;
+function renderBlockUncached(b){
+  if(!b) return '';
+  if(typeof b==='string') return `<div class="an blk-text">${b}</div>`;
+  let f=b.__render;
+  if(!f){
+    f=RENDERERS[b.kind||b.type||'']||RENDERERS.fallback;
+    Object.defineProperty(b,'__render',{value:f,writable:true,configurable:true});
+  }
+  return f(b);
+}
+
+// Flatten the array-or-object body shape once per slide; the result is
+// attached non-enumerably so undo snapshots and downloads never see it
+function normBlocks(d){
   const blocks=(d.body&&d.body.blocks)||d.body||[];
-  if(Array.isArray(blocks)){{
-    // Render non-video blocks first, then video blocks at the end
-    const nonVideo=[];const videoBlocks=[];
-    blocks.forEach(b=>{{
-      const k=b&&(b.kind||b.type||'');
-      if(k==='image'&&b.image_idx!==undefined&&isVideo(b.image_idx))videoBlocks.push(b);
-      else nonVideo.push(b);
-    }});
-    nonVideo.forEach(b=>{{ html+=renderBlock(b); }});
-    videoBlocks.forEach(b=>{{ html+=renderBlock(b); }});
-  }} else if(typeof blocks==='object'){{
-    Object.values(blocks).forEach(b=>{{ if(Array.isArray(b))b.forEach(x=>{{html+=renderBlock(x)}}); }});
-  }}
-  html+='</div>';
-  return html;
-}}
-
-const S=slidesData.map((d,idx)=>{{
-  const obj={{cat:d.cat||'Lesson',t:d.t||'',s:d.s||'',narr:d.narration||''}};
+  const flat=Array.isArray(blocks)?blocks:(blocks&&typeof blocks==='object'?Object.values(blocks).flatMap(v=>Array.isArray(v)?v:[]):[]);
+  Object.defineProperty(d,'__blocks',{value:flat,writable:true,configurable:true});
+  return flat;
+}
+
+function buildContentSlide(d){
+  const out=['<div style="max-width:100%">'];
+  const blocks=d.__blocks||normBlocks(d);
+  // Render non-video blocks first, then video blocks at the end
+  const videoBlocks=[];
+  for(let i=0;i<blocks.length;i++){
+    const b=blocks[i];
+    const k=b&&(b.kind||b.type||'');
+    if(k==='image'&&b.image_idx!==undefined&&isVideo(b.image_idx))videoBlocks.push(b);
+    else out.push(renderBlock(b));
+  }
+  for(let i=0;i<videoBlocks.length;i++)out.push(renderBlock(videoBlocks[i]));
+  out.push('</div>');
+  return out.join('');
+}
+
+// Uniform slide records: every entry has the same shape (one hidden class,
+// no per-slide closures pinning captured state); rendering and widget init
+// dispatch on the type tag instead
+function buildSlide(d,idx){
   const tp=d.type||'content';
+  if(tp==='content')normBlocks(d);
+  const obj={cat:d.cat||'Lesson',t:d.t||'',s:d.s||'',type:tp,d:d,idx:idx};
+  // Narration resolves lazily: the title+subtitle fallback string is only
+  // built (and then cached) if listen mode actually asks for it
+  Object.defineProperty(obj,'narr',{get(){return d.narration||d.narr||(this._n??=this.t+'. '+(this.s||''))},configurable:true});
+  return obj;
+}
 
-  if(tp==='content'){{
-    obj.r=function(){{return buildContentSlide(d)}};
-  }}
-  else if(tp==='quiz'){{
-    const qid='q'+idx;
-    const opts=d.options||(d.body&&d.body.options)||[];
-    const ci=d.correct!==undefined?d.correct:(d.body&&d.body.correct!==undefined?d.body.correct:0);
-    const q=d.question||(d.body&&d.body.question)||d.t;
-    const exObj=d.explanations||(d.body&&d.body.explanations)||null;
-    const ex=exObj?(typeof exObj==='string'?exObj:((exObj.correct||'')+(exObj.wrong?' '+exObj.wrong:''))):(d.explanation||(d.body&&d.body.explanation)||'');
-    obj.r=function(){{return `<div id="${{qid}}" class="an"></div>`}};
-    obj.i=function(){{QZ(qid,q,opts,ci,ex,true)}};
-  }}
-  else if(tp==='matching'){{
-    const mid='m'+idx;
-    const pairs=d.pairs||(d.body&&d.body.pairs)||[];
-    obj.r=function(){{return `<div id="${{mid}}" class="an"></div>`}};
-    obj.i=function(){{MATCH(mid,pairs)}};
-  }}
-  else if(tp==='ordering'){{
-    const oid='o'+idx;
-    const items=d.items||(d.body&&d.body.correct_order)||(d.body&&d.body.items)||[];
-    obj.r=function(){{return `<div id="${{oid}}" class="an"></div>`}};
-    obj.i=function(){{ORDER(oid,items)}};
-  }}
-  else if(tp==='prompt_builder'){{
-    const pbid='pb'+idx;
-    const rawParts=d.parts||(d.body&&d.body.parts)||[];
-    const parts=(d.body&&d.body.chips)?[{{l:d.body.instructions||'Build your response',o:d.body.chips}}]:rawParts;
-    obj.r=function(){{return `<div id="${{pbid}}" class="an"></div>`}};
-    obj.i=function(){{PBUILD(pbid,parts)}};
-  }}
-  else if(tp==='milestone'){{
-    const mMsg=d.s||(d.body&&d.body.message)||'Great progress! Keep going.';
-    obj.r=function(){{
-      return `<div style="text-align:center;padding:20px 0">
-        <div class="an" style="font-size:20px;font-weight:600;color:var(--c1);margin-bottom:8px">${{d.t}}</div>
-        <div class="an" style="font-size:14px;color:var(--c2);line-height:1.6;max-width:320px;margin:0 auto 20px">${{mMsg}}</div>
-        <div class="an" style="display:inline-flex;align-items:center;gap:6px;background:linear-gradient(135deg,#FEF3C7,#FDE68A);border-radius:20px;padding:8px 20px;font-size:14px;color:#92400E;font-weight:500"><span class="coin-icon">${{coinSvg}}</span> ${{xp}} XP earned</div>
-      </div>`;
-    }};
-  }}
-  else if(tp==='completion'){{
-    const cMsg=d.s||(d.body&&d.body.message)||'You have completed the lesson. Well done!';
-    obj.r=function(){{
-      return `<div style="text-align:center;padding:20px 0">
-        <div class="an" style="font-size:22px;font-weight:600;color:var(--c1);margin-bottom:8px">${{d.t||'Lesson Complete!'}}</div>
-        <div class="an" style="font-size:14px;color:var(--c2);line-height:1.6;max-width:340px;margin:0 auto 24px">${{cMsg}}</div>
-        <div class="an" style="display:inline-flex;align-items:center;gap:8px;background:linear-gradient(135deg,#FEF3C7,#FDE68A);border:2px solid #FCD34D;border-radius:24px;padding:12px 28px;font-size:18px;color:#92400E;font-weight:600"><span class="coin-icon">${{coinSvg}}</span> ${{xp}} XP</div>
+// Milestone/completion static markup, built once per slide object; only
+// the live XP count is spliced at render time
+const msCache=new WeakMap();
+function msParts(d,tp){
+  let p=msCache.get(d);
+  if(!p){
+    if(tp==='milestone'){
+      const mMsg=d.s||(d.body&&d.body.message)||'Great progress! Keep going.';
+      p={pre:`<div style="text-align:center;padding:20px 0">
+        <div class="an" style="font-size:20px;font-weight:600;color:var(--c1);margin-bottom:8px">${d.t}</div>
+        <div class="an" style="font-size:14px;color:var(--c2);line-height:1.6;max-width:320px;margin:0 auto 20px">${mMsg}</div>
+        <div class="an" style="display:inline-flex;align-items:center;gap:6px;background:linear-gradient(135deg,#FEF3C7,#FDE68A);border-radius:20px;padding:8px 20px;font-size:14px;color:#92400E;font-weight:500"><span class="coin-icon" data-coin></span> `,tail:` XP earned</div>
+      </div>`};
+    }else{
+      const cMsg=d.s||(d.body&&d.body.message)||'You have completed the lesson. Well done!';
+      p={pre:`<div style="text-align:center;padding:20px 0">
+        <div class="an" style="font-size:22px;font-weight:600;color:var(--c1);margin-bottom:8px">${d.t||'Lesson Complete!'}</div>
+        <div class="an" style="font-size:14px;color:var(--c2);line-height:1.6;max-width:340px;margin:0 auto 24px">${cMsg}</div>
+        <div class="an" style="display:inline-flex;align-items:center;gap:8px;background:linear-gradient(135deg,#FEF3C7,#FDE68A);border:2px solid #FCD34D;border-radius:24px;padding:12px 28px;font-size:18px;color:#92400E;font-weight:600"><span class="coin-icon" data-coin></span> `,tail:` XP</div>
         <div class="an" style="margin-top:20px;font-size:12.5px;color:var(--c3)">Share your achievement or revisit any slide from the menu</div>
-      </div>`;
-    }};
-  }}
-  else{{
-    obj.r=function(){{return buildContentSlide(d)}};
-  }}
-  return obj;
-}});
+      </div>`};
+    }
+    msCache.set(d,p);
+  }
+  return p;
+}
+
+function renderSlide(s){
+  const d=s.d;
+  switch(s.type){
+    case 'quiz':return `<div id="q${s.idx}" class="an"></div>`;
+    case 'matching':return `<div id="m${s.idx}" class="an"></div>`;
+    case 'ordering':return `<div id="o${s.idx}" class="an"></div>`;
+    case 'prompt_builder':return `<div id="pb${s.idx}" class="an"></div>`;
+    case 'milestone':
+    case 'completion':{const p=msParts(d,s.type);return p.pre+xp+p.tail}
+    default:{let h=renderCache.get(d);if(h===undefined){h=buildContentSlide(d);renderCache.set(d,h)}return h}
+  }
+}
+
+function initSlide(s){
+  const d=s.d,idx=s.idx;
+  switch(s.type){
+    case 'quiz':{
+      const opts=d.options||(d.body&&d.body.options)||[];
+      const ci=d.correct!==undefined?d.correct:(d.body&&d.body.correct!==undefined?d.body.correct:0);
+      const q=d.question||(d.body&&d.body.question)||d.t;
+      const exObj=d.explanations||(d.body&&d.body.explanations)||null;
+      const ex=exObj?(typeof exObj==='string'?exObj:((exObj.correct||'')+(exObj.wrong?' '+exObj.wrong:''))):(d.explanation||(d.body&&d.body.explanation)||'');
+      QZ('q'+idx,q,opts,ci,ex,true);
+      break;
+    }
+    case 'matching':MATCH('m'+idx,d.pairs||(d.body&&d.body.pairs)||[]);break;
+    case 'ordering':ORDER('o'+idx,d.items||(d.body&&d.body.correct_order)||(d.body&&d.body.items)||[]);break;
+    case 'prompt_builder':{
+      const rawParts=d.parts||(d.body&&d.body.parts)||[];
+      const parts=(d.body&&d.body.chips)?[{l:d.body.instructions||'Build your response',o:d.body.chips}]:rawParts;
+      PBUILD('pb'+idx,parts);
+      break;
+    }
+  }
+}
+
+const S=slidesData.map(buildSlide);
 
 // ── STATE ──
 let cur=0,prevCur=0;
 let listenMode=false,speaking=false,autoTimer=null;
 
 // ── NAVIGATION ──
-function go(i){{prevCur=cur;document.querySelectorAll('.slide-video').forEach(v=>{{v.pause()}});cur=Math.max(0,Math.min(S.length-1,i));stopAudio();R();if(listenMode)speakSlide()}}
+// Coalesce rapid prev/next taps: only the last target is rendered, once
+// per frame, so TTS isn't cancelled/restarted per intermediate slide
+let navPending=false,navTarget=0;
+function go(i){
+  navTarget=i;
+  if(navPending)return;
+  navPending=true;
+  requestAnimationFrame(()=>{
+    navPending=false;
+    prevCur=cur;
+    document.querySelectorAll('.slide-video').forEach(v=>{v.pause()});
+    cur=Math.max(0,Math.min(S.length-1,navTarget));
+    stopAudio();R();
+    if(listenMode)speakSlide();
+  });
+}
 
 // ── FOLLOW-ALONG STEPS ──
-function FA(id,steps){{const el=document.getElementById(id);if(!el)return;let st=0;
-  function r(){{const s=steps[st];el.innerHTML=`<div style="max-width:100%"><div style="display:flex;gap:8px;margin-bottom:20px;overflow-x:auto;padding-bottom:4px">${{steps.map((_,i)=>`<button class="fas ${{i<st?'dn':i===st?'nw':'wt'}}" onclick="window._f${{id}}(${{i}})">${{i<st?'\\u2713':i+1}}</button>`).join('')}}</div><div class="an4" style="background:var(--s0);border:1px solid var(--s2);border-radius:14px;padding:26px 22px"><div style="font-size:13px;font-weight:500;color:var(--b);text-transform:uppercase;letter-spacing:1.5px;margin-bottom:8px">Step ${{st+1}}</div><div style="font-size:15px;font-weight:500;color:var(--c1);margin-bottom:10px">${{s.t}}</div><div style="font-size:13px;color:var(--c2);line-height:1.65">${{s.d}}</div>${{s.p?`<div class="ib yw" style="margin-top:14px">\\uD83D\\uDCA1 &nbsp;${{s.p}}</div>`:''}}</div><div style="display:flex;justify-content:space-between;margin-top:16px"><button class="bk" onclick="window._f${{id}}(${{st-1}})" ${{st===0?'disabled':''}}>\\u2190 Previous</button><button class="nx" onclick="window._f${{id}}(${{st+1}})" ${{st===steps.length-1?'disabled':''}}>Next Step \\u2192</button></div></div>`;setTimeout(()=>{{const a=el.querySelector('.an4');if(a)a.classList.add('go')}},20)}}
-  window['_f'+id]=function(i){{st=Math.max(0,Math.min(steps.length-1,i));r()}};r()}}
+function FA(id,steps){const el=document.getElementById(id);if(!el)return;let st=0;
+  // Render the skeleton once; step changes only swap classes on the step
+  // circles and the text of the card fields
+  const h=['<div style="max-width:100%"><div style="display:flex;gap:8px;margin-bottom:20px;overflow-x:auto;padding-bottom:4px">'];
+  for(let i=0;i<steps.length;i++)h.push('<button class="fas wt" data-i="',i,'">',i+1,'</button>');
+  h.push('</div><div class="an4" style="background:var(--s0);border:1px solid var(--s2);border-radius:14px;padding:26px 22px"><div style="font-size:13px;font-weight:500;color:var(--b);text-transform:uppercase;letter-spacing:1.5px;margin-bottom:8px" data-n></div><div style="font-size:15px;font-weight:500;color:var(--c1);margin-bottom:10px" data-t></div><div style="font-size:13px;color:var(--c2);line-height:1.65" data-d></div><div class="ib yw" style="margin-top:14px;display:none" data-tip></div></div><div style="display:flex;justify-content:space-between;margin-top:16px"><button class="bk" data-i="0">\\u2190 Previous</button><button class="nx" data-i="0">Next Step \\u2192</button></div></div>');
+  el.innerHTML=h.join('');
+  const circ=el.querySelectorAll('.fas'),card=el.querySelector('.an4'),nEl=el.querySelector('[data-n]'),tEl=el.querySelector('[data-t]'),dEl=el.querySelector('[data-d]'),tipEl=el.querySelector('[data-tip]'),bk=el.querySelector('.bk'),nx=el.querySelector('.nx');
+  function setStep(i){
+    st=Math.max(0,Math.min(steps.length-1,i));
+    const s=steps[st];
+    for(let j=0;j<circ.length;j++){
+      circ[j].className='fas '+(j<st?'dn':j===st?'nw':'wt');
+      circ[j].textContent=j<st?'\\u2713':j+1;
+    }
+    nEl.textContent='Step '+(st+1);
+    tEl.innerHTML=s.t;dEl.innerHTML=s.d;
+    if(s.p){tipEl.style.display='';tipEl.innerHTML='\\uD83D\\uDCA1 &nbsp;'+s.p}else tipEl.style.display='none';
+    bk.dataset.i=st-1;bk.disabled=st===0;
+    nx.dataset.i=st+1;nx.disabled=st===steps.length-1;
+    card.classList.remove('go');void card.offsetWidth;
+    setTimeout(()=>card.classList.add('go'),20);
+  }
+  el.addEventListener('click',e=>{const b=e.target.closest('button[data-i]');if(!b||b.disabled)return;setStep(+b.dataset.i)});
+  setStep(0)}
 
 // ── PROMPT BUILDER ──
-function PBUILD(id,parts){{const el=document.getElementById(id);if(!el)return;
-  const pa=parts.map(p=>({{l:p.label||p.l||'Option',o:p.options||p.o||[]}}));
+function PBUILD(id,parts){const el=document.getElementById(id);if(!el)return;
+  const pa=parts.map(p=>({l:p.label||p.l||'Option',o:p.options||p.o||[]}));
   let se=pa.map(()=>null);
-  function r(){{const dn=se.every(s=>s!==null);el.innerHTML=`<div style="max-width:100%">${{pa.map((p,pi)=>`<div style="margin-bottom:18px"><div style="font-size:13px;font-weight:500;color:var(--b);text-transform:uppercase;letter-spacing:1.5px;margin-bottom:8px">${{p.l}}</div><div style="display:flex;gap:8px;flex-wrap:wrap">${{p.o.map((o,oi)=>`<button class="po${{se[pi]===oi?' on':''}}" onclick="window._pb${{id}}(${{pi}},${{oi}})">${{o}}</button>`).join('')}}</div></div>`).join('')}}${{dn?`<div class="an4 go" style="background:var(--s0);border:1px solid var(--s2);border-radius:10px;padding:18px"><div style="font-size:13px;font-weight:500;color:var(--c3);margin-bottom:6px;text-transform:uppercase;letter-spacing:1.5px">Your prompt</div><div style="font-size:13.5px;color:var(--c1);line-height:1.6;font-style:italic">"${{pa.map((p,i)=>p.o[se[i]]).join(', ')}}"</div></div>`:''}}</div>`}}
-  window['_pb'+id]=function(p,o){{se[p]=o;r()}};r()}}
+  // Mount once; selecting a chip only toggles .on on the two pill buttons
+  // involved and, once every part has a pick, fills the prompt line
+  const h=['<div style="max-width:100%">'];
+  for(let pi=0;pi<pa.length;pi++){
+    h.push('<div style="margin-bottom:18px"><div style="font-size:13px;font-weight:500;color:var(--b);text-transform:uppercase;letter-spacing:1.5px;margin-bottom:8px">',pa[pi].l,'</div><div style="display:flex;gap:8px;flex-wrap:wrap">');
+    const o=pa[pi].o;
+    for(let oi=0;oi<o.length;oi++)h.push('<button class="po" data-p="',pi,'" data-o="',oi,'">',o[oi],'</button>');
+    h.push('</div></div>');
+  }
+  h.push('<div class="an4" style="display:none;background:var(--s0);border:1px solid var(--s2);border-radius:10px;padding:18px"><div style="font-size:13px;font-weight:500;color:var(--c3);margin-bottom:6px;text-transform:uppercase;letter-spacing:1.5px">Your prompt</div><div style="font-size:13.5px;color:var(--c1);line-height:1.6;font-style:italic" data-prompt></div></div></div>');
+  el.innerHTML=h.join('');
+  const out=el.querySelector('.an4'),promptOut=el.querySelector('[data-prompt]');
+  el.addEventListener('click',e=>{
+    const b=e.target.closest('button[data-p]');if(!b)return;
+    const pi=+b.dataset.p;
+    if(se[pi]!==null){const prev=el.querySelector('.po.on[data-p="'+pi+'"]');if(prev)prev.classList.remove('on')}
+    se[pi]=+b.dataset.o;b.classList.add('on');
+    if(se.every(s=>s!==null)){
+      const sel=[];for(let i=0;i<pa.length;i++)sel.push(pa[i].o[se[i]]);
+      promptOut.textContent='"'+sel.join(', ')+'"';
+      out.style.display='';out.classList.add('go');
+    }
+  });
+}
+
+// Uniform single-pass shuffle; sort(()=>Math.random()-.5) is biased and
+// hands V8 a non-transitive comparator
+function fyShuffle(a){
+  for(let i=a.length-1;i>0;i--){const j=(Math.random()*(i+1))|0;const t=a[i];a[i]=a[j];a[j]=t}
+  return a;
+}
 
 // ── MATCHING ──
-function MATCH(id,pairs){{const el=document.getElementById(id);if(!el)return;
-  const left=pairs.map((p,i)=>({{idx:i,text:p.left||p[0]||p.term||''}}));
-  const right=pairs.map((p,i)=>({{idx:i,text:p.right||p[1]||p.def||''}}));
+function MATCH(id,pairs){const el=document.getElementById(id);if(!el)return;
+  const left=pairs.map((p,i)=>({idx:i,text:p.left||p[0]||p.term||''}));
+  const right=pairs.map((p,i)=>({idx:i,text:p.right||p[1]||p.def||''}));
   // shuffle right side
-  const shuffled=[...right].sort(()=>Math.random()-.5);
-  let selL=null,matched={{}},wrongPair=null;
-  function r(){{
+  const shuffled=fyShuffle(right.slice());
+  let selL=null,matched={};
+  const matchedRight=new Set();
+  // Build the grid once; clicks patch classes on the two affected buttons
+  // instead of rewriting the whole innerHTML (up to 4x per wrong attempt)
+  function mount(){
     el.innerHTML=`<div class="crd"><div style="font-size:14px;font-weight:500;color:var(--c1);margin-bottom:16px">Match each item on the left with its pair on the right</div>
-    <div style="display:grid;grid-template-columns:1fr 1fr;gap:10px">${{left.map((l,li)=>{{
-      const isMatched=matched[l.idx]!==undefined;
-      const isSelL=selL===li;
-      const isWrongL=wrongPair&&wrongPair[0]===li;
-      let cls='qo';if(isMatched)cls+=' ok';else if(isSelL)cls=' qo';else if(isWrongL)cls+=' no';
-      let st=isSelL&&!isMatched?'border-color:var(--b);background:var(--b06)':'';
-      return `<button class="${{cls}}" style="${{st}}" onclick="window._ml${{id}}(${{li}})" ${{isMatched?'disabled':''}}>${{isMatched?animCheck:''}}${{l.text}}</button>`;
-    }}).join('')}}${{shuffled.map((r,ri)=>{{
-      const isMatched=Object.values(matched).includes(ri);
-      const isWrongR=wrongPair&&wrongPair[1]===ri;
-      let cls='qo';if(isMatched)cls+=' ok';else if(isWrongR)cls+=' no';
-      return `<button class="${{cls}}" onclick="window._mr${{id}}(${{ri}})" ${{isMatched?'disabled':''}}>${{r.text}}</button>`;
-    }}).join('')}}</div>
-    ${{Object.keys(matched).length===pairs.length?`<div class="an go" style="margin-top:14px;padding:14px;background:var(--g08);border-radius:10px;font-size:13px;color:var(--c1);text-align:center">${{animCheck}} All matched! <span class="xp-reward"><span class="coin-icon">${{coinSvg}}</span> +20</span></div>`:''}}
+    <div style="display:grid;grid-template-columns:1fr 1fr;gap:10px">${left.map((l,li)=>`<button class="qo" data-l="${li}">${l.text}</button>`).join('')}${shuffled.map((r,ri)=>`<button class="qo" data-r="${ri}">${r.text}</button>`).join('')}</div>
     </div>`;
-  }}
-  window['_ml'+id]=function(li){{if(matched[left[li].idx]!==undefined)return;selL=li;r()}};
-  window['_mr'+id]=function(ri){{
+  }
+  const lBtn=li=>el.querySelector('[data-l="'+li+'"]');
+  const rBtn=ri=>el.querySelector('[data-r="'+ri+'"]');
+  function pickL(li){
+    if(matched[left[li].idx]!==undefined)return;
+    if(selL!==null){const prev=lBtn(selL);if(prev&&!prev.disabled)prev.style.cssText=''}
+    selL=li;const b=lBtn(li);if(b)b.style.cssText='border-color:var(--b);background:var(--b06)';
+  }
+  function pickR(ri){
     if(selL===null)return;
-    if(Object.values(matched).includes(ri))return;
-    if(left[selL].idx===shuffled[ri].idx){{
-      matched[left[selL].idx]=ri;selL=null;wrongPair=null;r();
-      if(Object.keys(matched).length===pairs.length){{addXP(20);setTimeout(()=>celebrate(el),100)}}
-    }}else{{
-      wrongPair=[selL,ri];wrongFlash();r();setTimeout(()=>{{wrongPair=null;r()}},600);
-    }}
+    if(matchedRight.has(ri))return;
+    const lb=lBtn(selL),rb=rBtn(ri);
+    if(left[selL].idx===shuffled[ri].idx){
+      matched[left[selL].idx]=ri;matchedRight.add(ri);
+      if(lb){lb.style.cssText='';lb.classList.add('ok');lb.disabled=true;lb.insertAdjacentHTML('afterbegin','<span data-check></span>')}
+      if(rb){rb.classList.add('ok');rb.disabled=true}
+      if(matchedRight.size===pairs.length){
+        el.querySelector('.crd').insertAdjacentHTML('beforeend',`<div class="an go" style="margin-top:14px;padding:14px;background:var(--g08);border-radius:10px;font-size:13px;color:var(--c1);text-align:center"><span data-check></span> All matched! <span class="xp-reward"><span class="coin-icon" data-coin></span> +20</span></div>`);
+        addXP(20);setTimeout(()=>celebrate(el),100);
+      }
+      fillSvgSlots(el);
+    }else{
+      wrongFlash();
+      if(lb){lb.style.cssText='';lb.classList.add('no')}
+      if(rb)rb.classList.add('no');
+      setTimeout(()=>{if(lb)lb.classList.remove('no');if(rb)rb.classList.remove('no')},600);
+    }
     selL=null;
-  }};
-  r()}}
+  }
+  // One delegated listener instead of per-button global window._* handlers
+  el.addEventListener('click',e=>{
+    const b=e.target.closest('button');if(!b||b.disabled)return;
+    if(b.dataset.l!==undefined)pickL(+b.dataset.l);
+    else if(b.dataset.r!==undefined)pickR(+b.dataset.r);
+  });
+  mount()}
 
 // ── ORDERING ──
-function ORDER(id,items){{const el=document.getElementById(id);if(!el)return;
+function ORDER(id,items){const el=document.getElementById(id);if(!el)return;
   const correct=items.map((x,i)=>i);
-  let current=[...correct].sort(()=>Math.random()-.5);
+  let current=fyShuffle(correct.slice());
   let selIdx=null,done=false;
-  function r(){{
+  const itemText=ci=>typeof items[ci]==='string'?items[ci]:(items[ci].text||items[ci].label||items[ci]);
+  // Mount once; swaps rewrite only the two affected list buttons
+  function mount(){
     el.innerHTML=`<div class="crd"><div style="font-size:14px;font-weight:500;color:var(--c1);margin-bottom:16px">Put these in the correct order</div>
-    <div style="display:flex;flex-direction:column;gap:8px">${{current.map((ci,pos)=>{{
-      const isSel=selIdx===pos;
-      const item=typeof items[ci]==='string'?items[ci]:(items[ci].text||items[ci].label||items[ci]);
-      let cls='qo';if(isSel)cls+=' ';
-      let st=isSel?'border-color:var(--b);background:var(--b06)':'';
-      if(done){{cls='qo ok';st='';}}
-      return `<button class="${{cls}}" style="${{st}}" onclick="window._ord${{id}}(${{pos}})">${{done?animCheck:''}}${{pos+1}}. ${{item}}</button>`;
-    }}).join('')}}</div>
-    ${{done?`<div class="an go" style="margin-top:14px;padding:14px;background:var(--g08);border-radius:10px;font-size:13px;color:var(--c1);text-align:center">${{animCheck}} Correct order! <span class="xp-reward"><span class="coin-icon">${{coinSvg}}</span> +20</span></div>`:
-    `<button class="nx" style="margin-top:14px;width:100%" onclick="window._ordChk${{id}}()">Check Order</button>`}}
+    <div style="display:flex;flex-direction:column;gap:8px">${current.map((ci,pos)=>`<button class="qo" data-p="${pos}">${pos+1}. ${itemText(ci)}</button>`).join('')}</div>
+    <button class="nx" style="margin-top:14px;width:100%" data-chk>Check Order</button>
     </div>`;
-  }}
-  window['_ord'+id]=function(pos){{
+  }
+  const pBtn=pos=>el.querySelector('[data-p="'+pos+'"]');
+  function pick(pos){
     if(done)return;
-    if(selIdx===null){{selIdx=pos;r()}}
-    else{{const tmp=current[selIdx];current[selIdx]=current[pos];current[pos]=tmp;selIdx=null;r()}}
-  }};
-  window['_ordChk'+id]=function(){{
+    if(selIdx===null){selIdx=pos;const b=pBtn(pos);if(b)b.style.cssText='border-color:var(--b);background:var(--b06)'}
+    else{
+      const tmp=current[selIdx];current[selIdx]=current[pos];current[pos]=tmp;
+      const a=pBtn(selIdx),b=pBtn(pos);
+      if(a){a.style.cssText='';a.innerHTML=(selIdx+1)+'. '+itemText(current[selIdx])}
+      if(b)b.innerHTML=(pos+1)+'. '+itemText(current[pos]);
+      selIdx=null;
+    }
+  }
+  function check(){
     const isCorrect=current.every((c,i)=>c===i);
-    if(isCorrect){{done=true;addXP(20);r();setTimeout(()=>celebrate(el),100)}}
-    else{{wrongFlash();const el2=document.getElementById(id);if(el2)el2.style.animation='wrongShake .5s ease';setTimeout(()=>{{if(el2)el2.style.animation=''}},600)}}
-  }};
-  r()}}
+    if(isCorrect){
+      done=true;
+      for(let pos=0;pos<current.length;pos++){const b=pBtn(pos);if(b){b.style.cssText='';b.classList.add('ok');b.insertAdjacentHTML('afterbegin','<span data-check></span>')}}
+      const chk=el.querySelector('.nx');
+      if(chk)chk.outerHTML=`<div class="an go" style="margin-top:14px;padding:14px;background:var(--g08);border-radius:10px;font-size:13px;color:var(--c1);text-align:center"><span data-check></span> Correct order! <span class="xp-reward"><span class="coin-icon" data-coin></span> +20</span></div>`;
+      fillSvgSlots(el);
+      addXP(20);setTimeout(()=>celebrate(el),100);
+    }
+    else{wrongFlash();el.style.animation='wrongShake .5s ease';setTimeout(()=>{el.style.animation=''},600)}
+  }
+  el.addEventListener('click',e=>{
+    const b=e.target.closest('button');if(!b||b.disabled)return;
+    if(b.dataset.p!==undefined)pick(+b.dataset.p);
+    else if(b.dataset.chk!==undefined)check();
+  });
+  mount()}
 
 // ── QUIZ ──
-function QZ(id,q,o,ci,ex,withXP){{const el=document.getElementById(id);if(!el)return;let sl=null;
-  function r(){{const d=sl!==null;el.innerHTML=`<div class="crd" id="crd-${{id}}"><div style="display:flex;align-items:center;justify-content:space-between;margin-bottom:16px"><div style="font-size:14px;color:var(--c1);line-height:1.55;flex:1">${{q}}</div>${{withXP?`<div style="font-size:12px;color:var(--gold);font-weight:500;margin-left:12px;white-space:nowrap"><span class="coin-icon">${{coinSvg}}</span> 20</div>`:''}} </div><div style="display:flex;flex-direction:column;gap:8px">${{o.map((x,i)=>{{let c='qo';if(d&&i===ci)c+=' ok';if(d&&i===sl&&i!==ci)c+=' no';return`<button class="${{c}}" id="qo-${{id}}-${{i}}" onclick="window._q${{id}}(${{i}})" ${{d?'disabled':''}}>${{x}}</button>`}}).join('')}}</div>${{d?`<div class="an go" style="margin-top:14px;padding:14px;background:${{sl===ci?'var(--g08)':'var(--y08)'}};border-radius:10px;font-size:12.5px;color:var(--c1);line-height:1.6">${{sl===ci?`${{animCheck}} Correct! <span class="xp-reward"><span class="coin-icon">${{coinSvg}}</span> +20</span><br>`:'\\u2717 Not quite. '}}${{ex}}</div>`:''}} </div>`}}
-  window['_q'+id]=function(i){{if(sl===null){{sl=i;
-    if(sl===ci){{if(withXP)addXP(20);r();setTimeout(()=>{{const btn=document.getElementById('qo-'+id+'-'+i);celebrate(btn)}},80)}}
-    else{{wrongFlash();r()}}}}}};r()}}
+function QZ(id,q,o,ci,ex,withXP){const el=document.getElementById(id);if(!el)return;let sl=null;
+  function r(){const d=sl!==null;
+    const parts=['<div class="crd" id="crd-',id,'"><div style="display:flex;align-items:center;justify-content:space-between;margin-bottom:16px"><div style="font-size:14px;color:var(--c1);line-height:1.55;flex:1">',q,'</div>'];
+    if(withXP)parts.push('<div style="font-size:12px;color:var(--gold);font-weight:500;margin-left:12px;white-space:nowrap"><span class="coin-icon" data-coin></span> 20</div>');
+    parts.push(' </div><div style="display:flex;flex-direction:column;gap:8px">');
+    for(let i=0;i<o.length;i++){
+      let c='qo';if(d&&i===ci)c+=' ok';if(d&&i===sl&&i!==ci)c+=' no';
+      parts.push('<button class="',c,'" id="qo-',id,'-',i,'" data-i="',i,'" ',d?'disabled':'','>',o[i],'</button>');
+    }
+    parts.push('</div>');
+    if(d)parts.push('<div class="an go" style="margin-top:14px;padding:14px;background:',sl===ci?'var(--g08)':'var(--y08)',';border-radius:10px;font-size:12.5px;color:var(--c1);line-height:1.6">',sl===ci?'<span data-check></span> Correct! <span class="xp-reward"><span class="coin-icon" data-coin></span> +20</span><br>':'\\u2717 Not quite. ',ex,'</div>');
+    parts.push(' </div>');
+    el.innerHTML=parts.join('');fillSvgSlots(el)}
+  el.addEventListener('click',e=>{
+    const b=e.target.closest('button[data-i]');if(!b||b.disabled||sl!==null)return;
+    sl=+b.dataset.i;
+    if(sl===ci){if(withXP)addXP(20);r();setTimeout(()=>{const btn=document.getElementById('qo-'+id+'-'+sl);celebrate(btn)},80)}
+    else{wrongFlash();r()}
+  });
+  r()}
 
 // ── RENDER ──
-function R(){{
+// Element handles refreshed once per render: everything below the app root
+// is rebuilt by R(), so interaction paths read these instead of re-running
+// getElementById per click
+const DOM={};
+function R(){
   const s=S[cur],cats=[...new Set(S.map(x=>x.cat))],pct=((cur+1)/S.length)*100;
-  let dots='';for(let i=0;i<S.length;i++)dots+=`<div class="dt ${{i===cur?'on':i<cur?'dn':'of'}}" onclick="go(${{i}})"></div>`;
-  let nav='';cats.forEach(c=>{{nav+=`<div class="dw-c">${{c}}</div>`;S.filter(x=>x.cat===c).forEach(x=>{{const idx=S.indexOf(x);const ico=x.t.startsWith('Quick')?'\\u2726':'\\u2022';nav+=`<button class="dw-i${{idx===cur?' on':''}}" onclick="go(${{idx}});cN()"><span class="dw-ico">${{ico}}</span>${{x.t}}</button>`}})}});
+  let dots='';for(let i=0;i<S.length;i++)dots+=`<div class="dt ${i===cur?'on':i<cur?'dn':'of'}" onclick="go(${i})"></div>`;
+  let nav='';cats.forEach(c=>{nav+=`<div class="dw-c">${c}</div>`;S.filter(x=>x.cat===c).forEach(x=>{const idx=S.indexOf(x);const ico=x.t.startsWith('Quick')?'\\u2726':'\\u2022';nav+=`<button class="dw-i${idx===cur?' on':''}" onclick="go(${idx});cN()"><span class="dw-ico">${ico}</span>${x.t}</button>`})});
 
   document.getElementById('app').innerHTML=`
-    <div class="hd"><div class="hd-l"><button class="ham" onclick="oN()"><svg width="15" height="12" viewBox="0 0 15 12" fill="none"><path d="M1 1h13M1 6h9M1 11h13" stroke="var(--c1)" stroke-width="1.3" stroke-linecap="round"/></svg></button><span class="hd-cat">${{s.cat}}</span></div><div class="hd-r"><button class="undo-btn" id="undo-btn" onclick="doUndo()"><svg width="12" height="12" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2"><path stroke-linecap="round" stroke-linejoin="round" d="M3 10h10a5 5 0 015 5v2M3 10l4-4M3 10l4 4"/></svg>Undo</button><button class="edit-btn" onclick="openEdit()"><svg width="12" height="12" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2"><path d="M11 4H4a2 2 0 00-2 2v14a2 2 0 002 2h14a2 2 0 002-2v-7"/><path d="M18.5 2.5a2.121 2.121 0 013 3L12 15l-4 1 1-4 9.5-9.5z"/></svg>Edit</button><button class="dl-btn" onclick="downloadWithEdits()"><svg width="12" height="12" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2"><path stroke-linecap="round" stroke-linejoin="round" d="M4 16v1a3 3 0 003 3h10a3 3 0 003-3v-1m-4-4l-4 4m0 0l-4-4m4 4V4"/></svg>Download</button><div id="listen-toggle" class="${{listenMode?'listen-badge':'listen-badge off'}}" onclick="toggleListen()"><div class="eq"><i></i><i></i><i></i></div><span class="listen-text">${{listenMode?'Listening':'Listen'}}</span></div><button class="voice-gear" onclick="event.stopPropagation();openVoiceSettings()" title="Voice settings">\\u2699</button><div class="xp-badge" id="xp-wrap"><span class="coin-icon">${{coinSvg}}</span><span id="xp-val">${{xp}}</span></div><span class="hd-n">${{cur+1}}/${{S.length}}</span></div></div>
-    <div class="bar"><div class="bar-f" style="width:${{pct}}%"></div></div>
-    <div class="ov" id="ov" onclick="cN()"></div><div class="dw" id="dw"><div class="dw-h">Lessons</div>${{nav}}</div>
-    <div class="ct ${{cur>=prevCur?'entering':'entering-back'}}" id="cn"><h1 class="an">${{s.t}}</h1>${{s.s?`<p class="sub an">${{s.s}}</p>`:'<div style="height:20px"></div>'}}\n${{s.r()}}</div>
-    <div class="ft"><button class="bk" onclick="go(${{cur-1}})" ${{cur===0?'disabled':''}}>\\u2190 Back</button><div class="dots">${{dots}}</div><button class="nx" onclick="go(${{cur+1}})" ${{cur===S.length-1?'disabled':''}}>Next \\u2192</button></div>`;
-
-  setTimeout(()=>{{document.querySelectorAll('.an,.an2,.an3,.an4,.an5').forEach((el,i)=>{{setTimeout(()=>el.classList.add('go'),i*70)}})}},30);
-  if(s.i)s.i();
-  const cn=document.getElementById('cn');if(cn)cn.scrollTop=0;
+    <div class="hd"><div class="hd-l"><button class="ham" onclick="oN()"><svg width="15" height="12" viewBox="0 0 15 12" fill="none"><path d="M1 1h13M1 6h9M1 11h13" stroke="var(--c1)" stroke-width="1.3" stroke-linecap="round"/></svg></button><span class="hd-cat">${s.cat}</span></div><div class="hd-r"><button class="undo-btn" id="undo-btn" onclick="doUndo()"><svg width="12" height="12" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2"><path stroke-linecap="round" stroke-linejoin="round" d="M3 10h10a5 5 0 015 5v2M3 10l4-4M3 10l4 4"/></svg>Undo</button><button class="edit-btn" onclick="openEdit()"><svg width="12" height="12" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2"><path d="M11 4H4a2 2 0 00-2 2v14a2 2 0 002 2h14a2 2 0 002-2v-7"/><path d="M18.5 2.5a2.121 2.121 0 013 3L12 15l-4 1 1-4 9.5-9.5z"/></svg>Edit</button><button class="dl-btn" onclick="downloadWithEdits()"><svg width="12" height="12" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2"><path stroke-linecap="round" stroke-linejoin="round" d="M4 16v1a3 3 0 003 3h10a3 3 0 003-3v-1m-4-4l-4 4m0 0l-4-4m4 4V4"/></svg>Download</button><div id="listen-toggle" class="${listenMode?'listen-badge':'listen-badge off'}" onclick="toggleListen()"><div class="eq"><i></i><i></i><i></i></div><span class="listen-text">${listenMode?'Listening':'Listen'}</span></div><button class="voice-gear" onclick="event.stopPropagation();openVoiceSettings()" title="Voice settings">\\u2699</button><div class="xp-badge" id="xp-wrap"><span class="coin-icon" data-coin></span><span id="xp-val">${xp}</span></div><span class="hd-n">${cur+1}/${S.length}</span></div></div>
+    <div class="bar"><div class="bar-f" style="width:${pct}%"></div></div>
+    <div class="ov" id="ov" onclick="cN()"></div><div class="dw" id="dw"><div class="dw-h">Lessons</div>${nav}</div>
+    <div class="ct ${cur>=prevCur?'entering':'entering-back'}" id="cn"><h1 class="an">${s.t}</h1>${s.s?`<p class="sub an">${s.s}</p>`:'<div style="height:20px"></div>'}\n${renderSlide(s)}</div>
+    <div class="ft"><button class="bk" onclick="go(${cur-1})" ${cur===0?'disabled':''}>\\u2190 Back</button><div class="dots">${dots}</div><button class="nx" onclick="go(${cur+1})" ${cur===S.length-1?'disabled':''}>Next \\u2192</button></div>`;
+  const root=document.getElementById('app');
+  fillSvgSlots(root);
+  DOM.listenBadge=root.querySelector('#listen-toggle');
+  DOM.cn=root.querySelector('#cn');
+  DOM.ov=root.querySelector('#ov');
+  DOM.dw=root.querySelector('#dw');
+
+  rafBatch(()=>stagger(root.querySelectorAll('.an,.an2,.an3,.an4,.an5')));
+  initSlide(s);
+  if(DOM.cn)DOM.cn.scrollTop=0;
   // Auto-play videos: if listen mode is off, play video after slide animation
-  if(!listenMode){{
-    setTimeout(()=>{{
+  if(!listenMode){
+    setTimeout(()=>{
       const vids=document.querySelectorAll('.slide-video');
-      vids.forEach(v=>{{
-        v.scrollIntoView({{behavior:'smooth',block:'center'}});
+      vids.forEach(v=>{
+        v.scrollIntoView({behavior:'smooth',block:'center'});
         v.muted=true;v.currentTime=0;
-        v.play().then(()=>{{v.muted=false}}).catch(()=>{{}});
-      }});
-    }},800);
-  }}
-}}
-function oN(){{document.getElementById('ov').classList.add('open');document.getElementById('dw').classList.add('open')}}
-function cN(){{document.getElementById('ov').classList.remove('open');document.getElementById('dw').classList.remove('open')}}
+        v.play().then(()=>{v.muted=false}).catch(()=>{});
+      });
+    },800);
+  }
+}
+function oN(){DOM.ov.classList.add('open');DOM.dw.classList.add('open')}
+function cN(){DOM.ov.classList.remove('open');DOM.dw.classList.remove('open')}
 
 
 // ── TTS (Pre-generated audio > ElevenLabs API > Browser fallback) ──
-function getELKey(){{return localStorage.getItem('lf_el_key')||''}}
-function getELVoice(){{return localStorage.getItem('lf_el_voice')||'EXAVITQu4vr4xnSDxMaL'}}
+function getELKey(){return localStorage.getItem('lf_el_key')||''}
+function getELVoice(){return localStorage.getItem('lf_el_voice')||'EXAVITQu4vr4xnSDxMaL'}
 const EL_MODEL='eleven_turbo_v2_5';
-let currentAudio=null,audioCache={{}},audioUnlocked=false,elFailed=false;
+let currentAudio=null,audioCache={},audioUnlocked=false,elFailed=false;
 let ttsEpoch=0;
+// Decoded-PCM replay cache: clips the user revisits play through WebAudio
+// buffer sources instead of re-decoding the MP3 in a media element.
+// audioBlobs keeps the raw clip so decoding can happen lazily, after the
+// first user gesture has allowed an AudioContext.
+let ac=null;const pcmCache={},audioBlobs={};
+function decodePCM(idx){
+  if(!ac||pcmCache[idx]||!audioBlobs[idx])return;
+  audioBlobs[idx].arrayBuffer().then(ab=>ac.decodeAudioData(ab)).then(buf=>{pcmCache[idx]=buf}).catch(()=>{});
+}
 // Convert pre-generated base64 audio to blob URLs on load
-(function(){{if(typeof PREGEN_AUDIO==='object'){{Object.keys(PREGEN_AUDIO).forEach(k=>{{const b64=PREGEN_AUDIO[k];if(b64){{try{{const bin=atob(b64);const arr=new Uint8Array(bin.length);for(let i=0;i<bin.length;i++)arr[i]=bin.charCodeAt(i);audioCache[k]=URL.createObjectURL(new Blob([arr],{{type:'audio/mpeg'}}))}}catch(e){{}}}}}})}}}})();
+(function(){if(typeof PREGEN_AUDIO==='object'){Object.keys(PREGEN_AUDIO).forEach(k=>{const b64=PREGEN_AUDIO[k];if(b64){try{const bin=atob(b64);const arr=new Uint8Array(bin.length);for(let i=0;i<bin.length;i++)arr[i]=bin.charCodeAt(i);const blob=new Blob([arr],{type:'audio/mpeg'});audioBlobs[k]=blob;audioCache[k]=URL.createObjectURL(blob)}catch(e){}}})}})();
 
-async function unlockAudio(){{
+async function unlockAudio(){
+  if(!ac&&(window.AudioContext||window.webkitAudioContext)){try{ac=new (window.AudioContext||window.webkitAudioContext)()}catch(e){}}
   if(audioUnlocked)return;
-  try{{const s=new Audio('data:audio/wav;base64,UklGRigAAABXQVZFZm10IBIAAAABAAEARKwAAIhYAQACABAAAABkYXRhAgAAAAEA');await s.play();audioUnlocked=true}}catch(e){{}}
-}}
+  try{const s=new Audio('data:audio/wav;base64,UklGRigAAABXQVZFZm10IBIAAAABAAEARKwAAIhYAQACABAAAABkYXRhAgAAAAEA');await s.play();audioUnlocked=true}catch(e){}
+}
 
-async function elFetch(text,idx){{
+// ── IndexedDB audio cache ──
+// Synthesized clips persist across reloads keyed by SHA-256 of
+// text|voice|model, so re-opening a lesson never re-bills ElevenLabs for
+// unchanged narration. Bounded by LRU eviction; all writes happen off the
+// playback path.
+const IDB_MAX=100*1024*1024,IDB_LOW=80*1024*1024;
+let _idb=null;
+function idbOpen(){
+  if(_idb)return _idb;
+  _idb=new Promise((res,rej)=>{
+    if(!window.indexedDB)return rej(new Error('no indexedDB'));
+    const rq=indexedDB.open('lf_tts',1);
+    rq.onupgradeneeded=()=>{const st=rq.result.createObjectStore('tts',{keyPath:'hash'});st.createIndex('ts','ts')};
+    rq.onsuccess=()=>res(rq.result);
+    rq.onerror=()=>rej(rq.error);
+  });
+  return _idb;
+}
+async function ttsHash(text,idx){
+  // Build-time keys skip the digest entirely; they are nulled when a
+  // slide's narration is edited, and ignored if the user switched voices
+  if(idx!==undefined&&typeof NARR_HASH==='object'&&NARR_HASH[idx]&&getELVoice()===EL_BAKED_VOICE)return NARR_HASH[idx];
+  if(!(window.crypto&&crypto.subtle))return null;
+  try{
+    const buf=await crypto.subtle.digest('SHA-256',new TextEncoder().encode(text+'|'+getELVoice()+'|'+EL_MODEL));
+    return Array.from(new Uint8Array(buf),b=>b.toString(16).padStart(2,'0')).join('');
+  }catch(e){return null}
+}
+function idbGet(hash){
+  return idbOpen().then(db=>new Promise((res,rej)=>{
+    const rq=db.transaction('tts').objectStore('tts').get(hash);
+    rq.onsuccess=()=>res(rq.result||null);rq.onerror=()=>rej(rq.error);
+  }));
+}
+function idbTouch(hash){
+  idbOpen().then(db=>{
+    const st=db.transaction('tts','readwrite').objectStore('tts');
+    const rq=st.get(hash);
+    rq.onsuccess=()=>{const rec=rq.result;if(rec){rec.ts=Date.now();st.put(rec)}};
+  }).catch(()=>{});
+}
+function idbPut(hash,blob){
+  return idbOpen().then(db=>new Promise((res,rej)=>{
+    const tx=db.transaction('tts','readwrite');
+    tx.objectStore('tts').put({hash:hash,blob:blob,bytes:blob.size,ts:Date.now()});
+    tx.oncomplete=()=>{res();idbEvict()};tx.onerror=()=>rej(tx.error);
+  }));
+}
+// When total stored bytes pass IDB_MAX, drop oldest-played entries (the ts
+// index walks oldest-first) until under IDB_LOW
+function idbEvict(){
+  idbOpen().then(db=>{
+    const st=db.transaction('tts','readwrite').objectStore('tts');
+    let total=0;
+    st.index('ts').openCursor().onsuccess=e=>{
+      const c=e.target.result;
+      if(c){total+=c.value.bytes||0;c.continue();return}
+      if(total<=IDB_MAX)return;
+      st.index('ts').openCursor().onsuccess=e2=>{
+        const c2=e2.target.result;
+        if(!c2||total<=IDB_LOW)return;
+        total-=c2.value.bytes||0;c2.delete();c2.continue();
+      };
+    };
+  }).catch(()=>{});
+}
+
+// One pending promise per slide: concurrent callers (prefetch racing a
+// direct play) share a single synthesis instead of double-billing the API
+const ttsInflight={};
+function elFetch(text,idx,signal){
+  if(audioCache[idx])return Promise.resolve(audioCache[idx]);
+  if(ttsInflight[idx])return ttsInflight[idx];
+  const p=elFetchUncached(text,idx,signal);
+  ttsInflight[idx]=p;
+  p.then(()=>{delete ttsInflight[idx]},()=>{delete ttsInflight[idx]});
+  return p;
+}
+async function elFetchUncached(text,idx,signal){
   if(audioCache[idx])return audioCache[idx];
   const key=getELKey();
   if(!key||elFailed)return null;
-  try{{
-    const r=await fetch(`https://api.elevenlabs.io/v1/text-to-speech/${{getELVoice()}}/stream`,{{
+  const hash=await ttsHash(text,idx);
+  if(hash){
+    const hit=await idbGet(hash).catch(()=>null);
+    if(hit&&hit.blob){const url=URL.createObjectURL(hit.blob);audioBlobs[idx]=hit.blob;audioCache[idx]=url;idbTouch(hash);return url}
+  }
+  try{
+    const r=await fetch(`https://api.elevenlabs.io/v1/text-to-speech/${getELVoice()}/stream?optimize_streaming_latency=3&output_format=mp3_44100_128`,{
       method:'POST',
-      headers:{{'Content-Type':'application/json','xi-api-key':key,'Accept':'audio/mpeg'}},
-      body:JSON.stringify({{text,model_id:EL_MODEL,voice_settings:{{stability:0.5,similarity_boost:0.75,use_speaker_boost:true}}}})
-    }});
+      headers:{'Content-Type':'application/json','xi-api-key':key,'Accept':'audio/mpeg'},
+      body:JSON.stringify({text,model_id:EL_MODEL,voice_settings:{stability:0.5,similarity_boost:0.75,use_speaker_boost:true}}),
+      signal:signal
+    });
     if(!r.ok)throw new Error(r.status);
-    const url=URL.createObjectURL(await r.blob());
-    audioCache[idx]=url;return url;
-  }}catch(e){{console.warn('ElevenLabs error:',e.message,'. Using browser TTS.');elFailed=true;return null}}
-}}
+    const blob=await r.blob();
+    const url=URL.createObjectURL(blob);
+    audioBlobs[idx]=blob;
+    audioCache[idx]=url;
+    if(hash)idbPut(hash,blob).catch(()=>{});
+    decodePCM(idx);
+    return url;
+  }catch(e){
+    if(e&&e.name==='AbortError')return null;
+    console.warn('ElevenLabs error:',e.message,'. Using browser TTS.');elFailed=true;return null}
+}
+
+// Progressive playback: pipe the /stream response into a MediaSource so the
+// first MP3 frames play while the rest of the clip is still synthesizing.
+// The accumulated chunks are reassembled into a Blob afterwards so the
+// in-memory and IndexedDB caches still hold a complete clip.
+function mseOk(){return 'MediaSource' in window&&MediaSource.isTypeSupported('audio/mpeg')}
+function elStream(text,idx,hash){
+  const ms=new MediaSource();
+  const audio=new Audio();
+  audio.src=URL.createObjectURL(ms);
+  ms.addEventListener('sourceopen',async()=>{
+    try{
+      const r=await fetch(`https://api.elevenlabs.io/v1/text-to-speech/${getELVoice()}/stream?optimize_streaming_latency=3&output_format=mp3_44100_128`,{
+        method:'POST',
+        headers:{'Content-Type':'application/json','xi-api-key':getELKey(),'Accept':'audio/mpeg'},
+        body:JSON.stringify({text,model_id:EL_MODEL,voice_settings:{stability:0.5,similarity_boost:0.75,use_speaker_boost:true}})
+      });
+      if(!r.ok||!r.body)throw new Error(r.status);
+      // tee() lets the browser assemble the cache Blob from one branch while
+      // the other feeds playback, instead of us holding a second copy of
+      // every chunk in a JS array until the stream ends
+      let body=r.body,blobPromise=null;
+      if(body.tee){
+        const [pa,pb]=body.tee();
+        body=pa;
+        blobPromise=new Response(pb,{headers:{'Content-Type':'audio/mpeg'}}).blob();
+      }
+      const sb=ms.addSourceBuffer('audio/mpeg');
+      const reader=body.getReader();
+      const chunks=blobPromise?null:[];
+      while(true){
+        const {done,value}=await reader.read();
+        if(done)break;
+        if(chunks)chunks.push(value);
+        await new Promise(res=>{sb.addEventListener('updateend',res,{once:true});sb.appendBuffer(value)});
+      }
+      if(ms.readyState==='open')ms.endOfStream();
+      const blob=blobPromise?await blobPromise:new Blob(chunks,{type:'audio/mpeg'});
+      audioBlobs[idx]=blob;
+      audioCache[idx]=URL.createObjectURL(blob);
+      if(hash)idbPut(hash,blob).catch(()=>{});
+      decodePCM(idx);
+    }catch(e){
+      console.warn('ElevenLabs stream error:',e.message,'. Using browser TTS.');elFailed=true;
+      try{if(ms.readyState==='open')ms.endOfStream('network')}catch(_e){}
+    }
+  },{once:true});
+  return audio;
+}
 
-function stopAudio(){{
+function stopAudio(){
   ttsEpoch++;
-  if(currentAudio){{currentAudio.pause();currentAudio.currentTime=0;currentAudio=null}}
+  if(currentAudio){currentAudio.pause();currentAudio.currentTime=0;currentAudio=null}
+  stopKeepAlive();
   window.speechSynthesis&&window.speechSynthesis.cancel();
   speaking=false;
-  if(autoTimer){{clearTimeout(autoTimer);autoTimer=null}}
-}}
+  if(autoTimer){clearTimeout(autoTimer);autoTimer=null}
+}
 
-function slideHasVideo(idx){{
+function slideHasVideo(idx){
   const d=slidesData[idx];if(!d)return false;
   const blocks=(d.body&&d.body.blocks)||[];
   if(!Array.isArray(blocks))return false;
   return blocks.some(b=>b&&(b.kind||b.type)==='image'&&b.image_idx!==undefined&&isVideo(b.image_idx));
-}}
-function slideText(s){{
-  let text=s.narr||s.t+'. '+(s.s||'');
+}
+function slideText(s){
+  let text=s.narr;
   const idx=S.indexOf(s);
-  if(idx>=0&&slideHasVideo(idx)&&!/video|watch|demo|action|look at/i.test(text)){{
+  if(idx>=0&&slideHasVideo(idx)&&!/video|watch|demo|action|look at/i.test(text)){
     text+=' Now, let\\'s watch the video to see this in action.';
-  }}
+  }
   return text;
-}}
+}
 
-function preCache(from){{
-  for(let i=1;i<=3;i++){{const idx=from+i;if(idx<S.length&&!audioCache[idx])elFetch(slideText(S[idx]),idx).catch(()=>{{}})}}
-}}
+// Sliding-window prefetch: keep slides cur+1..cur+4 warming, abort anything
+// in flight that fell out of the window (e.g. the user jumped backwards),
+// and cap concurrency at 2 so we never saturate the account's request quota
+const prefetching=new Map();
+let pfActive=0;const pfQueue=[];
+function pfNext(){
+  while(pfActive<2&&pfQueue.length){
+    const job=pfQueue.shift();
+    if(job.ctl.signal.aborted)continue;
+    pfActive++;
+    elFetch(job.text,job.idx,job.ctl.signal).catch(()=>{}).then(()=>{pfActive--;prefetching.delete(job.idx);pfNext()});
+  }
+}
+function preCache(from){
+  if(!getELKey()||elFailed)return;
+  const lo=from+1,hi=Math.min(S.length-1,from+4);
+  for(const [idx,job] of prefetching){
+    if(idx<lo||idx>hi){job.ctl.abort();prefetching.delete(idx)}
+  }
+  for(let idx=lo;idx<=hi;idx++){
+    if(audioCache[idx]||prefetching.has(idx))continue;
+    const job={idx:idx,ctl:new AbortController(),text:slideText(S[idx])};
+    prefetching.set(idx,job);pfQueue.push(job);
+  }
+  pfNext();
+}
 
-function onTTSEnd(ep,myCur,s){{
+function onTTSEnd(ep,myCur,s){
   if(ep!==ttsEpoch)return;
   speaking=false;currentAudio=null;
   if(!listenMode||cur!==myCur)return;
   const interactive=s.t.startsWith('Quick Check')||s.t==='Build a Prompt';
   const hasVideo=document.querySelector('.slide-video');
-  if(hasVideo){{
-    hasVideo.scrollIntoView({{behavior:'smooth',block:'center'}});
+  if(hasVideo){
+    hasVideo.scrollIntoView({behavior:'smooth',block:'center'});
     hasVideo.currentTime=0;
     hasVideo.muted=true;
-    hasVideo.play().then(()=>{{hasVideo.muted=false}}).catch(()=>{{}});
-    hasVideo.onended=()=>{{if(ep===ttsEpoch&&cur===myCur&&listenMode&&cur<S.length-1)autoTimer=setTimeout(()=>go(cur+1),800)}};
+    hasVideo.play().then(()=>{hasVideo.muted=false}).catch(()=>{});
+    hasVideo.onended=()=>{if(ep===ttsEpoch&&cur===myCur&&listenMode&&cur<S.length-1)autoTimer=setTimeout(()=>go(cur+1),800)};
     return;
-  }}
+  }
   if(!interactive&&cur<S.length-1)autoTimer=setTimeout(()=>go(cur+1),800);
-}}
+}
 
-function speakBrowser(text,myCur,s,setTxt,ep){{
-  if(!window.speechSynthesis){{setTxt('Error');speaking=false;return}}
-  window.speechSynthesis.cancel();
-  const utter=new SpeechSynthesisUtterance(text);
+// Two-threshold chunker for browser TTS: Chrome silently cuts off long
+// utterances, so anything over LAMBDA_HI is split at sentence (or, for
+// unpunctuated runs, word) boundaries, and fragments under LAMBDA_LO are
+// merged forward so playback doesn't sound staccato
+function wordSplit(str,hi,seg){
+  const out=[];let buf='';
+  if(seg){
+    for(const w of seg.segment(str)){
+      buf+=w.segment;
+      if(buf.length>=hi*0.9){out.push(buf);buf=''}
+    }
+  }else{
+    for(const w of str.split(' ')){
+      buf+=(buf?' ':'')+w;
+      if(buf.length>=hi*0.9){out.push(buf);buf=''}
+    }
+  }
+  if(buf)out.push(buf);
+  return out;
+}
+function splitTextForTTS(text){
+  const LAMBDA_HI=200,LAMBDA_LO=60;
+  if(text.length<LAMBDA_HI)return [text];
+  const sentRe=/[^.!?]+[.!?]+/g;
+  let sents=text.match(sentRe)||[];
+  const tail=text.replace(sentRe,'').trim();
+  if(tail)sents.push(tail);
+  const seg=('Segmenter' in Intl)?new Intl.Segmenter('en',{granularity:'word'}):null;
+  sents=sents.flatMap(x=>x.length<=LAMBDA_HI?[x]:wordSplit(x,LAMBDA_HI,seg));
+  const out=[];let buf='';
+  for(const x of sents){
+    if((buf+x).length<LAMBDA_LO){buf+=x;continue}
+    if(buf){out.push((buf+x).trim());buf=''}
+    else out.push(x.trim());
+  }
+  if(buf)out.push(buf.trim());
+  return out.filter(x=>x);
+}
+
+// Voice selection memo, pinned by voiceURI in localStorage: reloads reuse
+// last session's pick without rescanning the voice list, and the
+// voiceschanged handler only invalidates if the pinned voice disappeared
+let cachedVoice=null;
+function getVoice(){
+  if(cachedVoice)return cachedVoice;
   const voices=window.speechSynthesis.getVoices();
-  const eng=voices.find(v=>v.name.includes('Samantha'))||voices.find(v=>v.lang.startsWith('en')&&v.localService)||voices.find(v=>v.lang.startsWith('en'))||voices[0];
-  if(eng)utter.voice=eng;
-  utter.rate=0.95;
-  utter.onstart=()=>{{if(ep===ttsEpoch)setTxt('Listening')}};
-  utter.onend=()=>{{if(ep===ttsEpoch)onTTSEnd(ep,myCur,s)}};
-  utter.onerror=(e)=>{{if(e.error!=='canceled'&&ep===ttsEpoch){{speaking=false;setTxt('Error');setTimeout(()=>setTxt(listenMode?'Listening':'Listen'),2000)}}}};
-  window.speechSynthesis.speak(utter);
-  if(!window._ttsKeepAlive){{window._ttsKeepAlive=setInterval(()=>{{if(window.speechSynthesis.speaking){{window.speechSynthesis.pause();window.speechSynthesis.resume()}}}},10000)}}
-}}
-
-async function speakSlide(){{
+  if(!voices.length)return null;
+  let pinned=null;
+  try{pinned=localStorage.getItem('tts.voiceURI')}catch(e){}
+  if(pinned){
+    const v=voices.find(v=>v.voiceURI===pinned);
+    if(v){cachedVoice=v;return v}
+  }
+  const v=voices.find(v=>v.name.includes('Samantha'))||voices.find(v=>v.lang.startsWith('en')&&v.localService)||voices.find(v=>v.lang.startsWith('en'))||voices[0];
+  if(v){cachedVoice=v;try{localStorage.setItem('tts.voiceURI',v.voiceURI)}catch(e){}}
+  return v;
+}
+if(window.speechSynthesis)window.speechSynthesis.onvoiceschanged=()=>{
+  if(cachedVoice&&!window.speechSynthesis.getVoices().some(v=>v.voiceURI===cachedVoice.voiceURI))cachedVoice=null;
+};
+// Resolves once the async voice list has loaded (Chrome populates it after
+// the first getVoices() call); the 500ms cap keeps speech from hanging on
+// engines that never fire voiceschanged
+const voicesReady=!window.speechSynthesis?Promise.resolve():new Promise(r=>{
+  if(window.speechSynthesis.getVoices().length)return r();
+  window.speechSynthesis.addEventListener('voiceschanged',r,{once:true});
+  setTimeout(r,500);
+});
+
+// The pause/resume keep-alive defeats Chrome's ~15s utterance cutoff, so
+// typical narration can go out as ONE utterance with continuous prosody;
+// chunking is kept only for extreme texts where the engine itself struggles
+let kaTimer=null;
+function startKeepAlive(){
+  stopKeepAlive();
+  kaTimer=setInterval(()=>{if(window.speechSynthesis.speaking){window.speechSynthesis.pause();window.speechSynthesis.resume()}},10000);
+}
+function stopKeepAlive(){if(kaTimer){clearInterval(kaTimer);kaTimer=null}}
+
+async function speakBrowser(text,myCur,s,setTxt,ep){
+  if(!window.speechSynthesis){setTxt('Error');speaking=false;return}
+  window.speechSynthesis.cancel();
+  await voicesReady;
+  if(ep!==ttsEpoch)return;
+  const eng=getVoice();
+  const chunks=text.length<=1000?[text]:splitTextForTTS(text);
+  for(let i=0;i<chunks.length;i++){
+    const utter=new SpeechSynthesisUtterance(chunks[i]);
+    if(eng)utter.voice=eng;
+    utter.rate=0.95;
+    if(i===0)utter.onstart=()=>{if(ep===ttsEpoch)setTxt('Listening')};
+    if(i===chunks.length-1)utter.onend=()=>{stopKeepAlive();if(ep===ttsEpoch)onTTSEnd(ep,myCur,s)};
+    utter.onerror=(e)=>{if(e.error!=='canceled'&&ep===ttsEpoch){stopKeepAlive();speaking=false;setTxt('Error');setTimeout(()=>setTxt(listenMode?'Listening':'Listen'),2000)}};
+    window.speechSynthesis.speak(utter);
+  }
+  startKeepAlive();
+}
+
+async function speakSlide(){
   stopAudio();
   if(!listenMode)return;
   const ep=ttsEpoch;
   const myCur=cur,s=S[myCur],text=slideText(s);
   speaking=true;
-  const badge=document.getElementById('listen-toggle');
-  const setTxt=(t)=>{{if(ep===ttsEpoch&&badge){{const lt=badge.querySelector('.listen-text');if(lt)lt.textContent=t}}}};
+  const badge=DOM.listenBadge;
+  const setTxt=(t)=>{if(ep===ttsEpoch&&badge){const lt=badge.querySelector('.listen-text');if(lt)lt.textContent=t}};
 
   // 1. Check pre-generated audio cache first (free, instant)
-  let url=audioCache[myCur]||null;
-  // 2. If no cached audio, try ElevenLabs API (if user set their own key)
-  if(!url&&!elFailed&&getELKey()){{
-    setTxt('Loading...');url=await elFetch(text,myCur);
+  let url=audioCache[myCur]||null,audio=null;
+  // 2. If no cached audio, try ElevenLabs (if user set their own key):
+  //    persistent cache first, then stream the synthesis so playback starts
+  //    on the first MP3 frame instead of after the whole clip
+  if(!url&&!elFailed&&getELKey()){
+    setTxt('Loading...');
+    const hash=await ttsHash(text,myCur);
     if(ep!==ttsEpoch)return;
-  }}
-
-  // If audio URL available, play it
-  if(url){{
+    if(hash){
+      const hit=await idbGet(hash).catch(()=>null);
+      if(ep!==ttsEpoch)return;
+      if(hit&&hit.blob){url=URL.createObjectURL(hit.blob);audioBlobs[myCur]=hit.blob;audioCache[myCur]=url;idbTouch(hash)}
+    }
+    if(!url&&ttsInflight[myCur]){
+      url=await ttsInflight[myCur];
+      if(ep!==ttsEpoch)return;
+    }
+    if(!url){
+      if(mseOk())audio=elStream(text,myCur,hash);
+      else{url=await elFetch(text,myCur);if(ep!==ttsEpoch)return}
+    }
+  }
+
+  // Replay fast path: pre-decoded PCM starts in a few ms and skips the
+  // media-element re-decode stall
+  if(url&&!audio&&ac&&pcmCache[myCur]){
+    setTxt('Listening');
+    const srcNode=ac.createBufferSource();
+    srcNode.buffer=pcmCache[myCur];
+    srcNode.connect(ac.destination);
+    srcNode.onended=()=>{if(ep===ttsEpoch)onTTSEnd(ep,myCur,s)};
+    currentAudio={pause(){try{srcNode.stop()}catch(e){}},currentTime:0};
+    try{srcNode.start();preCache(myCur)}catch(e){speaking=false}
+    return;
+  }
+  // If audio available, play it (and queue a decode for the next replay)
+  if(url&&!audio){audio=new Audio(url);decodePCM(myCur)}
+  if(audio){
     if(ep!==ttsEpoch)return;
     setTxt('Listening');
-    const audio=new Audio(url);
     currentAudio=audio;
-    audio.onended=()=>{{if(ep===ttsEpoch)onTTSEnd(ep,myCur,s)}};
-    audio.onerror=()=>{{if(ep===ttsEpoch){{speaking=false;currentAudio=null;setTxt('Error');setTimeout(()=>setTxt(listenMode?'Listening':'Listen'),2000)}}}};
-    try{{await audio.play();if(ep===ttsEpoch)preCache(myCur)}}catch(e){{if(ep===ttsEpoch)speaking=false}}
+    audio.onended=()=>{if(ep===ttsEpoch)onTTSEnd(ep,myCur,s)};
+    audio.onerror=()=>{if(ep===ttsEpoch){speaking=false;currentAudio=null;
+      if(elFailed){setTxt('Loading...');speakBrowser(text,myCur,s,setTxt,ep)}
+      else{setTxt('Error');setTimeout(()=>setTxt(listenMode?'Listening':'Listen'),2000)}}};
+    try{await audio.play();if(ep===ttsEpoch)preCache(myCur)}catch(e){if(ep===ttsEpoch)speaking=false}
     return;
-  }}
+  }
 
   // Fallback: browser SpeechSynthesis
   if(ep!==ttsEpoch)return;
   setTxt('Loading...');
   speakBrowser(text,myCur,s,setTxt,ep);
-}}
+}
 
-function toggleListen(){{
+function toggleListen(){
   listenMode=!listenMode;
-  if(listenMode){{unlockAudio();speakSlide()}}else{{stopAudio()}}
-  const badge=document.getElementById('listen-toggle');
-  if(badge){{badge.className=listenMode?'listen-badge':'listen-badge off';badge.querySelector('.listen-text').textContent=listenMode?'Listening':'Listen'}}
-}}
-// Init browser voices early
-if(window.speechSynthesis){{window.speechSynthesis.getVoices();window.speechSynthesis.onvoiceschanged=()=>window.speechSynthesis.getVoices()}}
-
-function openVoiceSettings(){{
+  if(listenMode){unlockAudio();speakSlide()}else{stopAudio()}
+  const badge=DOM.listenBadge;
+  if(badge){badge.className=listenMode?'listen-badge':'listen-badge off';badge.querySelector('.listen-text').textContent=listenMode?'Listening':'Listen'}
+}
+function openVoiceSettings(){
   const existing=document.getElementById('voice-settings-modal');
   if(existing)existing.remove();
   const curKey=getELKey();
   const curVoice=getELVoice();
   const hasPre=Object.keys(audioCache).length>0;
   const bg=document.createElement('div');bg.className='voice-modal-bg';bg.id='voice-settings-modal';
-  bg.onclick=(e)=>{{if(e.target===bg)bg.remove()}};
+  bg.onclick=(e)=>{if(e.target===bg)bg.remove()};
   let statusHtml='';
   if(hasPre)statusHtml='<div class="vm-status" style="background:#F0FDF4;color:#16A34A">\\u2713 Pre-generated ElevenLabs audio embedded ('+Object.keys(audioCache).length+' slides)</div>';
   else if(curKey)statusHtml='<div class="vm-status" style="background:#F0FDF4;color:#16A34A">\\u2713 ElevenLabs connected (live API)</div>';
   else statusHtml='<div class="vm-status" style="background:#F0F9FF;color:#4E83FF">\\uD83D\\uDD0A Browser TTS active (no key needed)</div>';
   bg.innerHTML=`<div class="voice-modal">
     <h3>Voice Settings</h3>
-    <p>${{hasPre?'This lesson has premium ElevenLabs audio built in. No API key needed!':curKey?'Using ElevenLabs premium voice via your API key.':'Using browser built-in voice (free). Add an ElevenLabs key for premium AI voices.'}}</p>
-    ${{statusHtml}}
+    <p>${hasPre?'This lesson has premium ElevenLabs audio built in. No API key needed!':curKey?'Using ElevenLabs premium voice via your API key.':'Using browser built-in voice (free). Add an ElevenLabs key for premium AI voices.'}</p>
+    ${statusHtml}
     <label>ElevenLabs API Key (optional — for slides without pre-generated audio)</label>
-    <input type="password" id="vm-el-key" placeholder="sk_..." value="${{curKey}}">
+    <input type="password" id="vm-el-key" placeholder="sk_..." value="${curKey}">
     <label>Voice ID</label>
-    <input type="text" id="vm-el-voice" placeholder="EXAVITQu4vr4xnSDxMaL" value="${{curVoice}}">
+    <input type="text" id="vm-el-voice" placeholder="EXAVITQu4vr4xnSDxMaL" value="${curVoice}">
     <div style="font-size:11px;color:var(--c3);margin-bottom:16px">Get a key at <a href="https://elevenlabs.io" target="_blank" style="color:var(--b)">elevenlabs.io</a>. Leave blank to use free browser voice.</div>
     <div class="vm-btns">
-      ${{curKey?'<button class="vm-btn" onclick="clearVoiceKey()">Remove key</button>':''}}
+      ${curKey?'<button class="vm-btn" onclick="clearVoiceKey()">Remove key</button>':''}
       <button class="vm-btn" onclick="document.getElementById(\\'voice-settings-modal\\').remove()">Cancel</button>
       <button class="vm-btn primary" onclick="saveVoiceSettings()">Save</button>
     </div>
   </div>`;
   document.body.appendChild(bg);
-}}
+}
 
-function saveVoiceSettings(){{
+function saveVoiceSettings(){
   const key=document.getElementById('vm-el-key').value.trim();
   const voice=document.getElementById('vm-el-voice').value.trim()||'EXAVITQu4vr4xnSDxMaL';
-  if(key){{localStorage.setItem('lf_el_key',key);localStorage.setItem('lf_el_voice',voice)}}
-  else{{localStorage.removeItem('lf_el_key');localStorage.removeItem('lf_el_voice')}}
+  if(key){localStorage.setItem('lf_el_key',key);localStorage.setItem('lf_el_voice',voice)}
+  else{localStorage.removeItem('lf_el_key');localStorage.removeItem('lf_el_voice')}
   // Reset TTS state so next speak uses new settings
-  audioCache={{}};elFailed=false;
+  audioCache={};elFailed=false;
   document.getElementById('voice-settings-modal').remove();
-}}
+}
 
-function clearVoiceKey(){{
+function clearVoiceKey(){
   localStorage.removeItem('lf_el_key');localStorage.removeItem('lf_el_voice');
-  audioCache={{}};elFailed=false;
+  audioCache={};elFailed=false;
   document.getElementById('voice-settings-modal').remove();
-}}
+}
 
-// Pre-cache first slides on load (only if no pre-generated audio and user has EL key)
-if(getELKey()){{for(let i=0;i<Math.min(3,S.length);i++){{if(!audioCache[i])elFetch(slideText(S[i]),i).catch(()=>{{}})}}}}
+// Pre-cache first slides on load (only if no pre-generated audio and user has
+// EL key). This runs before the welcome modal paints, so the time the user
+// spends reading it doubles as a free synthesis window: by the time they hit
+// "Listen Along" slide 0 is usually already cached.
+if(getELKey()){for(let i=0;i<Math.min(3,S.length);i++){if(!audioCache[i])elFetch(slideText(S[i]),i).catch(()=>{})}}
 
 // ── WELCOME MODAL ──
-function showWelcome(){{
+function showWelcome(){
+  // The markup lives in a server-rendered <template>: cloning skips the
+  // runtime innerHTML parse, and textContent slots keep titles XSS-inert
   const hasVoice=Object.keys(audioCache).length>0||!!getELKey()||!!window.speechSynthesis;
-  const m=document.createElement('div');m.className='modal-bg';m.id='welcome-modal';
-  m.innerHTML=`<div class="modal">
-    <h2 style="margin-top:8px">${{COURSE_TITLE}}</h2>
-    <p>${{S[0]&&S[0].s?S[0].s:'Master key concepts through interactive lessons, quizzes, and activities.'}}</p>
-    ${{hasVoice?`<button class="modal-btn primary" onclick="startListenMode()">Listen Along<span style="font-size:12.5px;color:rgba(255,255,255,.6);margin-left:4px">\\u00B7 auto-play</span></button>`:''}}
-    <button class="modal-btn ${{hasVoice?'secondary':'primary'}}" onclick="closeWelcome()">Read at My Pace</button>
-    <div style="font-size:12px;color:var(--c3);margin-top:6px">${{S.length}} slides \\u00B7 Earn XP along the way</div>
-  </div>`;
-  document.body.appendChild(m);
-}}
-function startListenMode(){{listenMode=true;unlockAudio();closeWelcome();speakSlide()}}
-function closeWelcome(){{const m=document.getElementById('welcome-modal');if(m){{m.style.opacity='0';m.style.transition='opacity .25s';setTimeout(()=>m.remove(),260)}}}}
+  const frag=document.getElementById('welcome-tpl').content.cloneNode(true);
+  frag.querySelector('[data-slot="title"]').textContent=COURSE_TITLE;
+  frag.querySelector('[data-slot="sub"]').textContent=S[0]&&S[0].s?S[0].s:'Master key concepts through interactive lessons, quizzes, and activities.';
+  frag.querySelector('[data-slot="meta"]').textContent=S.length+' slides \\u00B7 Earn XP along the way';
+  const listen=frag.querySelector('[data-listen]');
+  if(!hasVoice){listen.remove();frag.querySelector('[data-read]').className='modal-btn primary'}
+  document.body.appendChild(frag);
+}
+function startListenMode(){listenMode=true;unlockAudio();closeWelcome();speakSlide()}
+function closeWelcome(){const m=document.getElementById('welcome-modal');if(m){m.style.opacity='0';m.style.transition='opacity .25s';setTimeout(()=>m.remove(),260)}}
 
 // ── UNDO HISTORY ──
 const undoStack=[];
 const UNDO_MAX=30;
-function pushUndo(){{
-  undoStack.push({{
+function pushUndo(){
+  undoStack.push({
     slidesData:JSON.parse(JSON.stringify(slidesData)),
     images:JSON.parse(JSON.stringify(IMAGES)),
-    sArr:S.map(s=>({{t:s.t,s:s.s,narr:s.narr,cat:s.cat}}))
-  }});
+    sArr:S.map(s=>({t:s.t,s:s.s,narr:s.narr,cat:s.cat}))
+  });
   if(undoStack.length>UNDO_MAX)undoStack.shift();
+  // Every mutation path snapshots first, so this is the one invalidation
+  // point the render cache needs for the slide about to change
+  if(slidesData[cur]){
+    renderCache.delete(slidesData[cur]);
+    msCache.delete(slidesData[cur]);
+    const bl=(slidesData[cur].body&&slidesData[cur].body.blocks)||slidesData[cur].body||[];
+    if(Array.isArray(bl))bl.forEach(b=>{if(b&&typeof b==='object')blockCache.delete(b)});
+  }
   updateUndoBtn();
-}}
-function doUndo(){{
+}
+function doUndo(){
   if(!undoStack.length)return;
   const snap=undoStack.pop();
   // Restore slidesData
-  for(let i=0;i<slidesData.length;i++){{
-    if(snap.slidesData[i])Object.assign(slidesData[i],snap.slidesData[i]);
-  }}
+  for(let i=0;i<slidesData.length;i++){
+    if(snap.slidesData[i]){Object.assign(slidesData[i],snap.slidesData[i]);renderCache.delete(slidesData[i]);msCache.delete(slidesData[i])}
+  }
   // Restore IMAGES
   Object.keys(IMAGES).forEach(k=>delete IMAGES[k]);
   Object.assign(IMAGES,snap.images);
@@ -1538,37 +2521,42 @@ function doUndo(){{
   // Rebuild all slides (restores render functions for all types)
   rebuildAllSlides();
   updateUndoBtn();
-}}
-function updateUndoBtn(){{
+}
+function updateUndoBtn(){
   const btn=document.getElementById('undo-btn');
   if(btn)btn.style.opacity=undoStack.length?'1':'0.35';
-}}
+}
 
 // ── DOWNLOAD WITH EDITS ──
-function downloadWithEdits(){{
+function downloadWithEdits(){
   let html='<!DOCTYPE html>\\n'+document.documentElement.outerHTML;
   // Replace slidesData with current edited version
   const sd1=html.indexOf('/*SDATA*/');
   const sd2=html.indexOf('/*EDATA*/');
-  if(sd1!==-1&&sd2!==-1){{
+  if(sd1!==-1&&sd2!==-1){
     html=html.substring(0,sd1)+'/*SDATA*/const slidesData='+JSON.stringify(slidesData)+';/*EDATA*/'+html.substring(sd2+9);
-  }}
+  }
   // Replace IMAGES with current version (includes newly added images)
   const im1=html.indexOf('/*SIMGS*/');
   const im2=html.indexOf('/*EIMGS*/');
-  if(im1!==-1&&im2!==-1){{
+  if(im1!==-1&&im2!==-1){
     html=html.substring(0,im1)+'/*SIMGS*/const IMAGES='+JSON.stringify(IMAGES)+';/*EIMGS*/'+html.substring(im2+9);
-  }}
+  }
   // Keep pre-generated audio (remove stale entries for edited slides)
   const au1=html.indexOf('/*SAUDIO*/');
   const au2=html.indexOf('/*EAUDIO*/');
-  if(au1!==-1&&au2!==-1){{
+  if(au1!==-1&&au2!==-1){
     html=html.substring(0,au1)+'/*SAUDIO*/const PREGEN_AUDIO='+JSON.stringify(PREGEN_AUDIO)+';/*EAUDIO*/'+html.substring(au2+10);
-  }}
+  }
+  const nh1=html.indexOf('/*SNARRH*/');
+  const nh2=html.indexOf('/*ENARRH*/');
+  if(nh1>-1&&nh2>-1){
+    html=html.substring(0,nh1)+'/*SNARRH*/const NARR_HASH='+JSON.stringify(NARR_HASH)+';/*ENARRH*/'+html.substring(nh2+10);
+  }
   // Strip edit mode so downloaded file is clean
   html=html.replace(' data-edit="1"','');
   // Download
-  const blob=new Blob([html],{{type:'text/html'}});
+  const blob=new Blob([html],{type:'text/html'});
   const url=URL.createObjectURL(blob);
   const a=document.createElement('a');
   a.href=url;
@@ -1577,99 +2565,99 @@ function downloadWithEdits(){{
   a.click();
   document.body.removeChild(a);
   URL.revokeObjectURL(url);
-}}
+}
 
 // ── EDIT MODE ──
-function openEdit(){{
+function openEdit(){
   const d=slidesData[cur];
   const tp=d.type||'content';
   let blocksHtml='';
 
-  if(tp==='content'){{
+  if(tp==='content'){
     const blocks=(d.body&&d.body.blocks)||d.body||[];
-    if(Array.isArray(blocks)){{
-      blocks.forEach((b,bi)=>{{
+    if(Array.isArray(blocks)){
+      blocks.forEach((b,bi)=>{
         const k=b.kind||b.type||'text';
-        if(k==='text'){{
-          blocksHtml+=`<div class="edit-block"><div class="edit-block-kind">Text</div><textarea class="edit-input" rows="3" data-bi="${{bi}}" data-field="html">${{(b.html||b.text||b.content||'').replace(/</g,'&lt;').replace(/>/g,'&gt;')}}</textarea></div>`;
-        }}else if(k==='bullets'){{
+        if(k==='text'){
+          blocksHtml+=`<div class="edit-block"><div class="edit-block-kind">Text</div><textarea class="edit-input" rows="3" data-bi="${bi}" data-field="html">${(b.html||b.text||b.content||'').replace(/</g,'&lt;').replace(/>/g,'&gt;')}</textarea></div>`;
+        }else if(k==='bullets'){
           const items=(b.items||[]).join('\\n');
-          blocksHtml+=`<div class="edit-block"><div class="edit-block-kind">Bullet Points</div><textarea class="edit-input" rows="${{Math.max(3,(b.items||[]).length+1)}}" data-bi="${{bi}}" data-field="items" data-type="list">${{items}}</textarea><div style="font-size:10px;color:var(--c3);margin-top:4px">One bullet per line</div></div>`;
-        }}else if(k==='tip'||k==='info'){{
-          blocksHtml+=`<div class="edit-block"><div class="edit-block-kind">${{k==='tip'?'Tip':'Info'}}</div><textarea class="edit-input" rows="2" data-bi="${{bi}}" data-field="text">${{b.text||b.content||''}}</textarea></div>`;
-        }}else if(k==='steps'){{
+          blocksHtml+=`<div class="edit-block"><div class="edit-block-kind">Bullet Points</div><textarea class="edit-input" rows="${Math.max(3,(b.items||[]).length+1)}" data-bi="${bi}" data-field="items" data-type="list">${items}</textarea><div style="font-size:10px;color:var(--c3);margin-top:4px">One bullet per line</div></div>`;
+        }else if(k==='tip'||k==='info'){
+          blocksHtml+=`<div class="edit-block"><div class="edit-block-kind">${k==='tip'?'Tip':'Info'}</div><textarea class="edit-input" rows="2" data-bi="${bi}" data-field="text">${b.text||b.content||''}</textarea></div>`;
+        }else if(k==='steps'){
           const items=(b.items||[]).map(x=>x.label||x.text||x).join('\\n');
-          blocksHtml+=`<div class="edit-block"><div class="edit-block-kind">Steps</div><textarea class="edit-input" rows="${{Math.max(3,(b.items||[]).length+1)}}" data-bi="${{bi}}" data-field="items" data-type="steps">${{items}}</textarea><div style="font-size:10px;color:var(--c3);margin-top:4px">One step per line</div></div>`;
-        }}else if(k==='icons'){{
-          const items=(b.items||[]).map(x=>{{const l=x.label||x.text||'';const dd=x.desc||'';const ic=x.icon||'';return ic+'|'+l+'|'+dd}}).join('\\n');
-          blocksHtml+=`<div class="edit-block"><div class="edit-block-kind">Icons</div><textarea class="edit-input" rows="${{Math.max(3,(b.items||[]).length+1)}}" data-bi="${{bi}}" data-field="items" data-type="icons">${{items}}</textarea><div style="font-size:10px;color:var(--c3);margin-top:4px">Format: emoji|label|description (one per line)</div></div>`;
-        }}else if(k==='compare'){{
-          blocksHtml+=`<div class="edit-block"><div class="edit-block-kind">Compare</div><div class="edit-label" style="margin-top:6px">Do This</div><textarea class="edit-input" rows="2" data-bi="${{bi}}" data-field="good">${{b.good||''}}</textarea><div class="edit-label" style="margin-top:8px">Not This</div><textarea class="edit-input" rows="2" data-bi="${{bi}}" data-field="bad">${{b.bad||''}}</textarea></div>`;
-        }}else if(k==='code'){{
-          blocksHtml+=`<div class="edit-block"><div class="edit-block-kind">Code</div><textarea class="edit-input" rows="3" data-bi="${{bi}}" data-field="text" style="font-family:monospace">${{b.code||b.text||''}}</textarea></div>`;
-        }}else if(k==='heading'){{
-          blocksHtml+=`<div class="edit-block"><div class="edit-block-kind">Heading</div><input class="edit-input" data-bi="${{bi}}" data-field="text" value="${{(b.text||b.content||'').replace(/"/g,'&quot;')}}"></div>`;
-        }}else if(k==='image'){{
+          blocksHtml+=`<div class="edit-block"><div class="edit-block-kind">Steps</div><textarea class="edit-input" rows="${Math.max(3,(b.items||[]).length+1)}" data-bi="${bi}" data-field="items" data-type="steps">${items}</textarea><div style="font-size:10px;color:var(--c3);margin-top:4px">One step per line</div></div>`;
+        }else if(k==='icons'){
+          const items=(b.items||[]).map(x=>{const l=x.label||x.text||'';const dd=x.desc||'';const ic=x.icon||'';return ic+'|'+l+'|'+dd}).join('\\n');
+          blocksHtml+=`<div class="edit-block"><div class="edit-block-kind">Icons</div><textarea class="edit-input" rows="${Math.max(3,(b.items||[]).length+1)}" data-bi="${bi}" data-field="items" data-type="icons">${items}</textarea><div style="font-size:10px;color:var(--c3);margin-top:4px">Format: emoji|label|description (one per line)</div></div>`;
+        }else if(k==='compare'){
+          blocksHtml+=`<div class="edit-block"><div class="edit-block-kind">Compare</div><div class="edit-label" style="margin-top:6px">Do This</div><textarea class="edit-input" rows="2" data-bi="${bi}" data-field="good">${b.good||''}</textarea><div class="edit-label" style="margin-top:8px">Not This</div><textarea class="edit-input" rows="2" data-bi="${bi}" data-field="bad">${b.bad||''}</textarea></div>`;
+        }else if(k==='code'){
+          blocksHtml+=`<div class="edit-block"><div class="edit-block-kind">Code</div><textarea class="edit-input" rows="3" data-bi="${bi}" data-field="text" style="font-family:monospace">${b.code||b.text||''}</textarea></div>`;
+        }else if(k==='heading'){
+          blocksHtml+=`<div class="edit-block"><div class="edit-block-kind">Heading</div><input class="edit-input" data-bi="${bi}" data-field="text" value="${(b.text||b.content||'').replace(/"/g,'&quot;')}"></div>`;
+        }else if(k==='image'){
           const imgIdx=b.image_idx;
           const hasMedia=imgIdx!==undefined&&IMAGES[imgIdx];
           const vid=isVideo(imgIdx);
-          const preview=hasMedia?(vid?`<video src="${{mediaSrc(imgIdx)}}" controls playsinline style="max-width:100%;max-height:200px"></video>`:`<img src="${{mediaSrc(imgIdx)}}">`):
+          const preview=hasMedia?(vid?`<video src="${mediaSrc(imgIdx)}" controls playsinline style="max-width:100%;max-height:200px"></video>`:`<img src="${mediaSrc(imgIdx)}">`):
           `<div class="placeholder">Click to upload image or video</div>`;
-          blocksHtml+=`<div class="edit-block" id="edit-img-block-${{bi}}"><div class="edit-block-kind">${{vid?'Video':'Image'}}</div><div class="edit-img-slot" id="edit-img-slot-${{bi}}" onclick="this.querySelector('input').click()"><input type="file" accept="image/*,video/mp4,video/webm" style="display:none" onchange="editImgChange(this,${{imgIdx!==undefined?imgIdx:'null'}},${{bi}})">${{preview}}</div><div class="edit-img-actions">${{hasMedia?`<button class="edit-img-del" onclick="editImgDelete(${{bi}},${{imgIdx!==undefined?imgIdx:'null'}})">Delete</button>`:''}}</div><input class="edit-input" style="margin-top:6px" data-bi="${{bi}}" data-field="alt" placeholder="Description" value="${{(b.alt||b.caption||'').replace(/"/g,'&quot;')}}"></div>`;
-        }}else if(k==='table'){{
-          blocksHtml+=`<div class="edit-block"><div class="edit-block-kind">Table (headers)</div><input class="edit-input" data-bi="${{bi}}" data-field="headers" data-type="csv" value="${{(b.headers||[]).join(', ')}}"><div class="edit-label" style="margin-top:8px">Rows (comma-separated, one row per line)</div><textarea class="edit-input" rows="${{Math.max(2,(b.rows||[]).length+1)}}" data-bi="${{bi}}" data-field="rows" data-type="table">${{(b.rows||[]).map(r=>r.join(', ')).join('\\n')}}</textarea></div>`;
-        }}
+          blocksHtml+=`<div class="edit-block" id="edit-img-block-${bi}"><div class="edit-block-kind">${vid?'Video':'Image'}</div><div class="edit-img-slot" id="edit-img-slot-${bi}" onclick="this.querySelector('input').click()"><input type="file" accept="image/*,video/mp4,video/webm" style="display:none" onchange="editImgChange(this,${imgIdx!==undefined?imgIdx:'null'},${bi})">${preview}</div><div class="edit-img-actions">${hasMedia?`<button class="edit-img-del" onclick="editImgDelete(${bi},${imgIdx!==undefined?imgIdx:'null'})">Delete</button>`:''}</div><input class="edit-input" style="margin-top:6px" data-bi="${bi}" data-field="alt" placeholder="Description" value="${(b.alt||b.caption||'').replace(/"/g,'&quot;')}"></div>`;
+        }else if(k==='table'){
+          blocksHtml+=`<div class="edit-block"><div class="edit-block-kind">Table (headers)</div><input class="edit-input" data-bi="${bi}" data-field="headers" data-type="csv" value="${(b.headers||[]).join(', ')}"><div class="edit-label" style="margin-top:8px">Rows (comma-separated, one row per line)</div><textarea class="edit-input" rows="${Math.max(2,(b.rows||[]).length+1)}" data-bi="${bi}" data-field="rows" data-type="table">${(b.rows||[]).map(r=>r.join(', ')).join('\\n')}</textarea></div>`;
+        }
         // Insert media button after each block
-        blocksHtml+=`<div class="edit-insert-media"><button class="edit-insert-btn" onclick="insertMediaAt(${{bi+1}})"><svg width="10" height="10" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2"><path stroke-linecap="round" d="M12 5v14m-7-7h14"/></svg> Insert image / video here</button></div>`;
-      }});
-    }}
-  }}else if(tp==='quiz'){{
-    const body=d.body||{{}};
+        blocksHtml+=`<div class="edit-insert-media"><button class="edit-insert-btn" onclick="insertMediaAt(${bi+1})"><svg width="10" height="10" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2"><path stroke-linecap="round" d="M12 5v14m-7-7h14"/></svg> Insert image / video here</button></div>`;
+      });
+    }
+  }else if(tp==='quiz'){
+    const body=d.body||{};
     const q=body.question||d.question||'';
     const opts=body.options||d.options||[];
     const ci=body.correct!==undefined?body.correct:(d.correct||0);
-    const ex=body.explanations||d.explanations||{{}};
-    blocksHtml+=`<div class="edit-block"><div class="edit-block-kind">Question</div><textarea class="edit-input" rows="2" id="eq-q">${{q}}</textarea></div>`;
-    opts.forEach((o,i)=>{{
-      blocksHtml+=`<div class="edit-block"><div class="edit-block-kind">Option ${{i+1}} ${{i===ci?'(correct)':''}}</div><input class="edit-input" id="eq-o${{i}}" value="${{o.replace(/"/g,'&quot;')}}"></div>`;
-    }});
-    blocksHtml+=`<div class="edit-block"><div class="edit-block-kind">Correct answer (0-${{opts.length-1}})</div><input class="edit-input" type="number" id="eq-ci" value="${{ci}}" min="0" max="${{opts.length-1}}"></div>`;
-    blocksHtml+=`<div class="edit-block"><div class="edit-block-kind">Explanation (correct)</div><textarea class="edit-input" rows="2" id="eq-exc">${{typeof ex==='string'?ex:(ex.correct||'')}}</textarea></div>`;
-    blocksHtml+=`<div class="edit-block"><div class="edit-block-kind">Explanation (wrong)</div><textarea class="edit-input" rows="2" id="eq-exw">${{typeof ex==='object'?(ex.wrong||''):''}}</textarea></div>`;
-  }}else if(tp==='matching'){{
-    const body=d.body||{{}};
+    const ex=body.explanations||d.explanations||{};
+    blocksHtml+=`<div class="edit-block"><div class="edit-block-kind">Question</div><textarea class="edit-input" rows="2" id="eq-q">${q}</textarea></div>`;
+    opts.forEach((o,i)=>{
+      blocksHtml+=`<div class="edit-block"><div class="edit-block-kind">Option ${i+1} ${i===ci?'(correct)':''}</div><input class="edit-input" id="eq-o${i}" value="${o.replace(/"/g,'&quot;')}"></div>`;
+    });
+    blocksHtml+=`<div class="edit-block"><div class="edit-block-kind">Correct answer (0-${opts.length-1})</div><input class="edit-input" type="number" id="eq-ci" value="${ci}" min="0" max="${opts.length-1}"></div>`;
+    blocksHtml+=`<div class="edit-block"><div class="edit-block-kind">Explanation (correct)</div><textarea class="edit-input" rows="2" id="eq-exc">${typeof ex==='string'?ex:(ex.correct||'')}</textarea></div>`;
+    blocksHtml+=`<div class="edit-block"><div class="edit-block-kind">Explanation (wrong)</div><textarea class="edit-input" rows="2" id="eq-exw">${typeof ex==='object'?(ex.wrong||''):''}</textarea></div>`;
+  }else if(tp==='matching'){
+    const body=d.body||{};
     const pairs=body.pairs||[];
-    blocksHtml+=`<div class="edit-block"><div class="edit-block-kind">Matching Pairs</div><textarea class="edit-input" rows="${{Math.max(4,pairs.length+1)}}" id="eq-pairs">${{pairs.map(p=>(p.left||'')+' | '+(p.right||'')).join('\\n')}}</textarea><div style="font-size:10px;color:var(--c3);margin-top:4px">One pair per line: left | right</div></div>`;
-  }}else if(tp==='prompt_builder'){{
-    const body=d.body||{{}};
-    blocksHtml+=`<div class="edit-block"><div class="edit-block-kind">Instructions</div><textarea class="edit-input" rows="2" id="eq-pb-instr">${{body.instructions||''}}</textarea></div>`;
-    blocksHtml+=`<div class="edit-block"><div class="edit-block-kind">Chips</div><textarea class="edit-input" rows="${{Math.max(3,(body.chips||[]).length)}}" id="eq-pb-chips">${{(body.chips||[]).join('\\n')}}</textarea><div style="font-size:10px;color:var(--c3);margin-top:4px">One chip per line</div></div>`;
-    blocksHtml+=`<div class="edit-block"><div class="edit-block-kind">Placeholder</div><input class="edit-input" id="eq-pb-ph" value="${{(body.placeholder||'').replace(/"/g,'&quot;')}}"></div>`;
-  }}else if(tp==='ordering'){{
-    const body=d.body||{{}};
-    blocksHtml+=`<div class="edit-block"><div class="edit-block-kind">Instructions</div><textarea class="edit-input" rows="2" id="eq-ord-instr">${{body.instructions||''}}</textarea></div>`;
-    blocksHtml+=`<div class="edit-block"><div class="edit-block-kind">Correct Order</div><textarea class="edit-input" rows="${{Math.max(3,(body.correct_order||[]).length)}}" id="eq-ord-items">${{(body.correct_order||[]).join('\\n')}}</textarea><div style="font-size:10px;color:var(--c3);margin-top:4px">One step per line (in correct order)</div></div>`;
-  }}else if(tp==='milestone'){{
-    const body=d.body||{{}};
-    blocksHtml+=`<div class="edit-block"><div class="edit-block-kind">Emoji</div><input class="edit-input" id="eq-ms-emoji" value="${{(body.emoji||'').replace(/"/g,'&quot;')}}"></div>`;
-    blocksHtml+=`<div class="edit-block"><div class="edit-block-kind">Message</div><textarea class="edit-input" rows="2" id="eq-ms-msg">${{body.message||''}}</textarea></div>`;
-  }}else if(tp==='completion'){{
-    const body=d.body||{{}};
-    blocksHtml+=`<div class="edit-block"><div class="edit-block-kind">Takeaways</div><textarea class="edit-input" rows="${{Math.max(3,(body.takeaways||[]).length+1)}}" id="eq-comp-ta">${{(body.takeaways||[]).join('\\n')}}</textarea><div style="font-size:10px;color:var(--c3);margin-top:4px">One takeaway per line</div></div>`;
-    blocksHtml+=`<div class="edit-block"><div class="edit-block-kind">Call to Action</div><input class="edit-input" id="eq-comp-cta" value="${{(body.cta||'').replace(/"/g,'&quot;')}}"></div>`;
-  }}
+    blocksHtml+=`<div class="edit-block"><div class="edit-block-kind">Matching Pairs</div><textarea class="edit-input" rows="${Math.max(4,pairs.length+1)}" id="eq-pairs">${pairs.map(p=>(p.left||'')+' | '+(p.right||'')).join('\\n')}</textarea><div style="font-size:10px;color:var(--c3);margin-top:4px">One pair per line: left | right</div></div>`;
+  }else if(tp==='prompt_builder'){
+    const body=d.body||{};
+    blocksHtml+=`<div class="edit-block"><div class="edit-block-kind">Instructions</div><textarea class="edit-input" rows="2" id="eq-pb-instr">${body.instructions||''}</textarea></div>`;
+    blocksHtml+=`<div class="edit-block"><div class="edit-block-kind">Chips</div><textarea class="edit-input" rows="${Math.max(3,(body.chips||[]).length)}" id="eq-pb-chips">${(body.chips||[]).join('\\n')}</textarea><div style="font-size:10px;color:var(--c3);margin-top:4px">One chip per line</div></div>`;
+    blocksHtml+=`<div class="edit-block"><div class="edit-block-kind">Placeholder</div><input class="edit-input" id="eq-pb-ph" value="${(body.placeholder||'').replace(/"/g,'&quot;')}"></div>`;
+  }else if(tp==='ordering'){
+    const body=d.body||{};
+    blocksHtml+=`<div class="edit-block"><div class="edit-block-kind">Instructions</div><textarea class="edit-input" rows="2" id="eq-ord-instr">${body.instructions||''}</textarea></div>`;
+    blocksHtml+=`<div class="edit-block"><div class="edit-block-kind">Correct Order</div><textarea class="edit-input" rows="${Math.max(3,(body.correct_order||[]).length)}" id="eq-ord-items">${(body.correct_order||[]).join('\\n')}</textarea><div style="font-size:10px;color:var(--c3);margin-top:4px">One step per line (in correct order)</div></div>`;
+  }else if(tp==='milestone'){
+    const body=d.body||{};
+    blocksHtml+=`<div class="edit-block"><div class="edit-block-kind">Emoji</div><input class="edit-input" id="eq-ms-emoji" value="${(body.emoji||'').replace(/"/g,'&quot;')}"></div>`;
+    blocksHtml+=`<div class="edit-block"><div class="edit-block-kind">Message</div><textarea class="edit-input" rows="2" id="eq-ms-msg">${body.message||''}</textarea></div>`;
+  }else if(tp==='completion'){
+    const body=d.body||{};
+    blocksHtml+=`<div class="edit-block"><div class="edit-block-kind">Takeaways</div><textarea class="edit-input" rows="${Math.max(3,(body.takeaways||[]).length+1)}" id="eq-comp-ta">${(body.takeaways||[]).join('\\n')}</textarea><div style="font-size:10px;color:var(--c3);margin-top:4px">One takeaway per line</div></div>`;
+    blocksHtml+=`<div class="edit-block"><div class="edit-block-kind">Call to Action</div><input class="edit-input" id="eq-comp-cta" value="${(body.cta||'').replace(/"/g,'&quot;')}"></div>`;
+  }
 
   const panel=document.createElement('div');
   panel.className='edit-panel open';
   panel.id='edit-panel';
   panel.innerHTML=`<div class="edit-ov" onclick="closeEdit()"></div><div class="edit-drawer">
-    <h3>Edit Slide ${{cur+1}} <span style="font-size:11px;font-weight:400;background:var(--c5,#f3f4f6);padding:2px 8px;border-radius:4px;margin-left:6px">${{tp}}</span></h3>
+    <h3>Edit Slide ${cur+1} <span style="font-size:11px;font-weight:400;background:var(--c5,#f3f4f6);padding:2px 8px;border-radius:4px;margin-left:6px">${tp}</span></h3>
     <div class="edit-slide-actions" style="display:flex;gap:6px;flex-wrap:wrap;margin-bottom:14px">
-      <button class="edit-action-btn" onclick="moveSlide(-1)" title="Move up" ${{cur===0?'disabled':''}}><svg width="12" height="12" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2"><path stroke-linecap="round" stroke-linejoin="round" d="M5 15l7-7 7 7"/></svg> Up</button>
-      <button class="edit-action-btn" onclick="moveSlide(1)" title="Move down" ${{cur>=slidesData.length-1?'disabled':''}}><svg width="12" height="12" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2"><path stroke-linecap="round" stroke-linejoin="round" d="M19 9l-7 7-7-7"/></svg> Down</button>
+      <button class="edit-action-btn" onclick="moveSlide(-1)" title="Move up" ${cur===0?'disabled':''}><svg width="12" height="12" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2"><path stroke-linecap="round" stroke-linejoin="round" d="M5 15l7-7 7 7"/></svg> Up</button>
+      <button class="edit-action-btn" onclick="moveSlide(1)" title="Move down" ${cur>=slidesData.length-1?'disabled':''}><svg width="12" height="12" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2"><path stroke-linecap="round" stroke-linejoin="round" d="M19 9l-7 7-7-7"/></svg> Down</button>
       <button class="edit-action-btn" onclick="duplicateSlide()"><svg width="12" height="12" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2"><rect x="9" y="9" width="13" height="13" rx="2" ry="2"/><path d="M5 15H4a2 2 0 01-2-2V4a2 2 0 012-2h9a2 2 0 012 2v1"/></svg> Duplicate</button>
       <button class="edit-action-btn" onclick="addSlideAfter()"><svg width="12" height="12" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2"><path stroke-linecap="round" d="M12 5v14m-7-7h14"/></svg> Add slide</button>
-      <button class="edit-action-btn" onclick="deleteSlide()" style="color:#ef4444;border-color:rgba(239,68,68,.3)" ${{slidesData.length<=1?'disabled':''}}><svg width="12" height="12" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2"><path stroke-linecap="round" d="M19 7l-.867 12.142A2 2 0 0116.138 21H7.862a2 2 0 01-1.995-1.858L5 7m5 4v6m4-6v6m1-10V4a1 1 0 00-1-1h-4a1 1 0 00-1 1v3M4 7h16"/></svg> Delete</button>
+      <button class="edit-action-btn" onclick="deleteSlide()" style="color:#ef4444;border-color:rgba(239,68,68,.3)" ${slidesData.length<=1?'disabled':''}><svg width="12" height="12" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2"><path stroke-linecap="round" d="M19 7l-.867 12.142A2 2 0 0116.138 21H7.862a2 2 0 01-1.995-1.858L5 7m5 4v6m4-6v6m1-10V4a1 1 0 00-1-1h-4a1 1 0 00-1 1v3M4 7h16"/></svg> Delete</button>
     </div>
     <div class="ai-suggest-wrap">
       <div class="edit-label" style="display:flex;align-items:center;gap:6px"><svg width="14" height="14" viewBox="0 0 24 24" fill="none" stroke="#7c3aed" stroke-width="2"><path d="M12 2L2 7l10 5 10-5-10-5z"/><path d="M2 17l10 5 10-5"/><path d="M2 12l10 5 10-5"/></svg> AI Suggest</div>
@@ -1680,82 +2668,29 @@ function openEdit(){{
       <div class="ai-suggest-hint">Describe changes for this slide. AI will update the fields below.</div>
       <div class="ai-suggest-error" id="ai-error"></div>
     </div>
-    <div class="edit-section"><div class="edit-label">Title</div><input class="edit-input" id="edit-title" value="${{(d.t||'').replace(/"/g,'&quot;')}}"></div>
-    <div class="edit-section"><div class="edit-label">Subtitle</div><input class="edit-input" id="edit-sub" value="${{(d.s||'').replace(/"/g,'&quot;')}}"></div>
-    <div class="edit-section"><div class="narr-header"><div class="edit-label">Narration (voice-over text)</div><button class="narr-regen" id="narr-regen-btn" onclick="regenNarration()"><svg width="10" height="10" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2"><path d="M12 2L2 7l10 5 10-5-10-5z"/><path d="M2 17l10 5 10-5"/><path d="M2 12l10 5 10-5"/></svg> Rewrite with AI</button></div><textarea class="edit-input" id="edit-narr" rows="4">${{d.narration||''}}</textarea></div>
-    ${{tp==='content'?`<div class="edit-section"><div class="edit-label">Content Blocks</div>${{blocksHtml}}<button class="edit-add-img" onclick="editAddImage()"><svg width="14" height="14" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="1.5"><rect x="3" y="3" width="18" height="18" rx="2"/><circle cx="8.5" cy="8.5" r="1.5"/><path d="m21 15-5-5L5 21"/></svg> Add Image / Video</button><input type="file" accept="image/*,video/mp4,video/webm" id="edit-add-img-input" style="display:none" onchange="editAddImageDone(this)"></div>`:(blocksHtml?`<div class="edit-section"><div class="edit-label">Content Blocks</div>${{blocksHtml}}</div>`:'')}}
+    <div class="edit-section"><div class="edit-label">Title</div><input class="edit-input" id="edit-title" value="${(d.t||'').replace(/"/g,'&quot;')}"></div>
+    <div class="edit-section"><div class="edit-label">Subtitle</div><input class="edit-input" id="edit-sub" value="${(d.s||'').replace(/"/g,'&quot;')}"></div>
+    <div class="edit-section"><div class="narr-header"><div class="edit-label">Narration (voice-over text)</div><button class="narr-regen" id="narr-regen-btn" onclick="regenNarration()"><svg width="10" height="10" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2"><path d="M12 2L2 7l10 5 10-5-10-5z"/><path d="M2 17l10 5 10-5"/><path d="M2 12l10 5 10-5"/></svg> Rewrite with AI</button></div><textarea class="edit-input" id="edit-narr" rows="4">${d.narration||''}</textarea></div>
+    ${tp==='content'?`<div class="edit-section"><div class="edit-label">Content Blocks</div>${blocksHtml}<button class="edit-add-img" onclick="editAddImage()"><svg width="14" height="14" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="1.5"><rect x="3" y="3" width="18" height="18" rx="2"/><circle cx="8.5" cy="8.5" r="1.5"/><path d="m21 15-5-5L5 21"/></svg> Add Image / Video</button><input type="file" accept="image/*,video/mp4,video/webm" id="edit-add-img-input" style="display:none" onchange="editAddImageDone(this)"></div>`:(blocksHtml?`<div class="edit-section"><div class="edit-label">Content Blocks</div>${blocksHtml}</div>`:'')}
     <button class="edit-save" onclick="saveEdit()">Save Changes</button>
     <div style="height:20px"></div>
   </div>`;
   document.body.appendChild(panel);
-}}
+}
 
-function closeEdit(){{
+function closeEdit(){
   const p=document.getElementById('edit-panel');
-  if(p){{p.querySelector('.edit-drawer').style.animation='editIn .2s ease reverse both';setTimeout(()=>p.remove(),200)}}
-}}
+  if(p){p.querySelector('.edit-drawer').style.animation='editIn .2s ease reverse both';setTimeout(()=>p.remove(),200)}
+}
 
-function rebuildAllSlides(){{
-  S=slidesData.map((d,idx)=>{{
-    const tp=d.type||'content';
-    const obj={{cat:d.cat||'Lesson',t:d.t||'',s:d.s||'',narr:d.narration||''}};
-    if(tp==='content'){{
-      obj.r=function(){{return buildContentSlide(d)}};
-    }}else if(tp==='quiz'){{
-      const qid='q'+idx;
-      const opts=d.options||(d.body&&d.body.options)||[];
-      const ci=d.correct!==undefined?d.correct:(d.body&&d.body.correct!==undefined?d.body.correct:0);
-      const q=d.question||(d.body&&d.body.question)||d.t;
-      const exObj=d.explanations||(d.body&&d.body.explanations)||null;
-      const ex=exObj?(typeof exObj==='string'?exObj:((exObj.correct||'')+(exObj.wrong?' '+exObj.wrong:''))):(d.explanation||(d.body&&d.body.explanation)||'');
-      obj.r=function(){{return `<div id="${{qid}}" class="an"></div>`}};
-      obj.i=function(){{QZ(qid,q,opts,ci,ex,true)}};
-    }}else if(tp==='matching'){{
-      const mid='m'+idx;
-      const pairs=d.pairs||(d.body&&d.body.pairs)||[];
-      obj.r=function(){{return `<div id="${{mid}}" class="an"></div>`}};
-      obj.i=function(){{MATCH(mid,pairs)}};
-    }}else if(tp==='ordering'){{
-      const oid='o'+idx;
-      const items=d.items||(d.body&&d.body.correct_order)||(d.body&&d.body.items)||[];
-      obj.r=function(){{return `<div id="${{oid}}" class="an"></div>`}};
-      obj.i=function(){{ORDER(oid,items)}};
-    }}else if(tp==='prompt_builder'){{
-      const pbid='pb'+idx;
-      const rawParts=d.parts||(d.body&&d.body.parts)||[];
-      const parts=(d.body&&d.body.chips)?[{{l:d.body.instructions||'Build your response',o:d.body.chips}}]:rawParts;
-      obj.r=function(){{return `<div id="${{pbid}}" class="an"></div>`}};
-      obj.i=function(){{PBUILD(pbid,parts)}};
-    }}else if(tp==='milestone'){{
-      const mMsg=d.s||(d.body&&d.body.message)||'Great progress! Keep going.';
-      obj.r=function(){{
-        return `<div style="text-align:center;padding:20px 0">
-          <div class="an" style="font-size:20px;font-weight:600;color:var(--c1);margin-bottom:8px">${{d.t}}</div>
-          <div class="an" style="font-size:14px;color:var(--c2);line-height:1.6;max-width:320px;margin:0 auto 20px">${{mMsg}}</div>
-          <div class="an" style="display:inline-flex;align-items:center;gap:6px;background:linear-gradient(135deg,#FEF3C7,#FDE68A);border-radius:20px;padding:8px 20px;font-size:14px;color:#92400E;font-weight:500"><span class="coin-icon">${{coinSvg}}</span> ${{xp}} XP earned</div>
-        </div>`;
-      }};
-    }}else if(tp==='completion'){{
-      const cMsg=d.s||(d.body&&d.body.message)||'You have completed the lesson. Well done!';
-      obj.r=function(){{
-        return `<div style="text-align:center;padding:20px 0">
-          <div class="an" style="font-size:22px;font-weight:600;color:var(--c1);margin-bottom:8px">${{d.t||'Lesson Complete!'}}</div>
-          <div class="an" style="font-size:14px;color:var(--c2);line-height:1.6;max-width:340px;margin:0 auto 24px">${{cMsg}}</div>
-          <div class="an" style="display:inline-flex;align-items:center;gap:8px;background:linear-gradient(135deg,#FEF3C7,#FDE68A);border:2px solid #FCD34D;border-radius:24px;padding:12px 28px;font-size:18px;color:#92400E;font-weight:600"><span class="coin-icon">${{coinSvg}}</span> ${{xp}} XP</div>
-          <div class="an" style="margin-top:20px;font-size:12.5px;color:var(--c3)">Share your achievement or revisit any slide from the menu</div>
-        </div>`;
-      }};
-    }}else{{
-      obj.r=function(){{return buildContentSlide(d)}};
-    }}
-    return obj;
-  }});
+function rebuildAllSlides(){
+  S=slidesData.map(buildSlide);
   if(cur>=S.length)cur=S.length-1;
   if(cur<0)cur=0;
   R();
-}}
+}
 
-function moveSlide(dir){{
+function moveSlide(dir){
   const target=cur+dir;
   if(target<0||target>=slidesData.length)return;
   pushUndo();
@@ -1766,9 +2701,9 @@ function moveSlide(dir){{
   closeEdit();
   rebuildAllSlides();
   setTimeout(()=>openEdit(),250);
-}}
+}
 
-function duplicateSlide(){{
+function duplicateSlide(){
   pushUndo();
   const copy=JSON.parse(JSON.stringify(slidesData[cur]));
   copy.t=(copy.t||'')+' (copy)';
@@ -1777,19 +2712,19 @@ function duplicateSlide(){{
   closeEdit();
   rebuildAllSlides();
   setTimeout(()=>openEdit(),250);
-}}
+}
 
-function addSlideAfter(){{
+function addSlideAfter(){
   pushUndo();
-  const newSlide={{cat:'Content',t:'New Slide',s:'',narration:'',type:'content',body:{{blocks:[{{kind:'text',html:'Edit this slide content.'}}]}}}};
+  const newSlide={cat:'Content',t:'New Slide',s:'',narration:'',type:'content',body:{blocks:[{kind:'text',html:'Edit this slide content.'}]}};
   slidesData.splice(cur+1,0,newSlide);
   cur=cur+1;
   closeEdit();
   rebuildAllSlides();
   setTimeout(()=>openEdit(),250);
-}}
+}
 
-function deleteSlide(){{
+function deleteSlide(){
   if(slidesData.length<=1)return;
   if(!confirm('Delete slide '+(cur+1)+'?'))return;
   pushUndo();
@@ -1797,26 +2732,26 @@ function deleteSlide(){{
   if(cur>=slidesData.length)cur=slidesData.length-1;
   closeEdit();
   rebuildAllSlides();
-}}
+}
 
-async function callClaude(apiKey,slide,instruction){{
+async function callClaude(apiKey,slide,instruction){
   const sysPrompt='You are an expert instructional designer editing a single lesson slide. You will receive the current slide data as JSON and a user instruction describing what to change. Return ONLY valid JSON with the updated slide. Keep the same structure/schema. Keep the same type and cat unless the user explicitly asks to change them. Write narration as a friendly teacher explaining the content (2-5 sentences). Keep content concise for a mobile screen. Return ONLY the JSON object, no markdown fences, no extra text.';
   const userMsg='Current slide JSON:\\n'+JSON.stringify(slide)+'\\n\\nUser instruction: '+instruction+'\\n\\nReturn the updated slide JSON only.';
-  const resp=await fetch('https://api.anthropic.com/v1/messages',{{
+  const resp=await fetch('https://api.anthropic.com/v1/messages',{
     method:'POST',
-    headers:{{'Content-Type':'application/json','x-api-key':apiKey,'anthropic-version':'2023-06-01','anthropic-dangerous-direct-browser-access':'true'}},
-    body:JSON.stringify({{model:'claude-sonnet-4-20250514',max_tokens:4000,system:sysPrompt,messages:[{{role:'user',content:userMsg}}]}})
-  }});
-  if(!resp.ok){{const e=await resp.text();throw new Error('Claude API error ('+resp.status+'): '+e.slice(0,200))}}
+    headers:{'Content-Type':'application/json','x-api-key':apiKey,'anthropic-version':'2023-06-01','anthropic-dangerous-direct-browser-access':'true'},
+    body:JSON.stringify({model:'claude-sonnet-4-20250514',max_tokens:4000,system:sysPrompt,messages:[{role:'user',content:userMsg}]})
+  });
+  if(!resp.ok){const e=await resp.text();throw new Error('Claude API error ('+resp.status+'): '+e.slice(0,200))}
   const result=await resp.json();
   let text='';
-  for(const block of (result.content||[])){{if(block.type==='text')text+=block.text||''}}
+  for(const block of (result.content||[])){if(block.type==='text')text+=block.text||''}
   text=text.trim();
-  if(text.startsWith('```')){{const lines=text.split('\\n');lines.shift();if(lines.length&&lines[lines.length-1].trim().startsWith('```'))lines.pop();text=lines.join('\\n')}}
+  if(text.startsWith('```')){const lines=text.split('\\n');lines.shift();if(lines.length&&lines[lines.length-1].trim().startsWith('```'))lines.pop();text=lines.join('\\n')}
   return JSON.parse(text);
-}}
+}
 
-async function aiSuggest(){{
+async function aiSuggest(){
   const prompt=document.getElementById('ai-prompt');
   const btn=document.getElementById('ai-suggest-btn');
   const errEl=document.getElementById('ai-error');
@@ -1825,11 +2760,11 @@ async function aiSuggest(){{
 
   // Get API key from localStorage (same key used by main app)
   const apiKey=localStorage.getItem('lf_anthropic_key')||'';
-  if(!apiKey){{
+  if(!apiKey){
     errEl.textContent='No API key found. Set your Anthropic API key in the main app Configure section first.';
     errEl.style.display='block';
     return;
-  }}
+  }
 
   // Build current slide snapshot from the edit form
   const d=slidesData[cur];
@@ -1843,7 +2778,7 @@ async function aiSuggest(){{
   btn.innerHTML='<div style="width:12px;height:12px;border:1.5px solid rgba(255,255,255,.3);border-top-color:#fff;border-radius:50%;animation:spin .7s linear infinite"></div> Thinking...';
   errEl.style.display='none';
 
-  try{{
+  try{
     const updated=await callClaude(apiKey,snapshot,instruction);
 
     // Populate form fields with AI suggestions
@@ -1853,61 +2788,61 @@ async function aiSuggest(){{
 
     // Update content blocks in the form
     const tp=d.type||'content';
-    if(tp==='content'&&updated.body){{
+    if(tp==='content'&&updated.body){
       const newBlocks=(updated.body.blocks)||[];
       const oldBlocks=(d.body&&d.body.blocks)||[];
       // Update existing block fields
-      document.querySelectorAll('[data-bi]').forEach(el=>{{
+      document.querySelectorAll('[data-bi]').forEach(el=>{
         const bi=parseInt(el.dataset.bi);
         const field=el.dataset.field;
         const dtype=el.dataset.type;
         if(!newBlocks[bi])return;
         const nb=newBlocks[bi];
-        if(dtype==='list'&&nb.items){{el.value=nb.items.join('\\n')}}
-        else if(dtype==='steps'&&nb.items){{el.value=nb.items.map(x=>x.text||x.label||x).join('\\n')}}
-        else if(dtype==='icons'&&nb.items){{el.value=nb.items.map(x=>(x.icon||'')+'|'+(x.label||'')+'|'+(x.desc||'')).join('\\n')}}
-        else if(dtype==='csv'&&nb[field]){{el.value=nb[field].join(', ')}}
-        else if(dtype==='table'&&nb.rows){{el.value=nb.rows.map(r=>r.join(', ')).join('\\n')}}
-        else if(field==='html'){{el.value=nb.html||nb.text||nb.content||''}}
-        else if(field==='good'||field==='bad'){{el.value=nb[field]||''}}
-        else if(field==='alt'){{el.value=nb.alt||nb.caption||''}}
-        else if(field==='text'){{el.value=nb.text||nb.content||nb.code||''}}
-        else if(nb[field]!==undefined){{el.value=nb[field]}}
-      }});
+        if(dtype==='list'&&nb.items){el.value=nb.items.join('\\n')}
+        else if(dtype==='steps'&&nb.items){el.value=nb.items.map(x=>x.text||x.label||x).join('\\n')}
+        else if(dtype==='icons'&&nb.items){el.value=nb.items.map(x=>(x.icon||'')+'|'+(x.label||'')+'|'+(x.desc||'')).join('\\n')}
+        else if(dtype==='csv'&&nb[field]){el.value=nb[field].join(', ')}
+        else if(dtype==='table'&&nb.rows){el.value=nb.rows.map(r=>r.join(', ')).join('\\n')}
+        else if(field==='html'){el.value=nb.html||nb.text||nb.content||''}
+        else if(field==='good'||field==='bad'){el.value=nb[field]||''}
+        else if(field==='alt'){el.value=nb.alt||nb.caption||''}
+        else if(field==='text'){el.value=nb.text||nb.content||nb.code||''}
+        else if(nb[field]!==undefined){el.value=nb[field]}
+      });
       // Store new blocks so saveEdit picks them up
       pushUndo();
       if(d.body)d.body.blocks=newBlocks;
-    }}else if(tp==='quiz'&&updated.body){{
+    }else if(tp==='quiz'&&updated.body){
       const b=updated.body;
       const qEl=document.getElementById('eq-q');if(qEl&&b.question)qEl.value=b.question;
-      (b.options||[]).forEach((o,i)=>{{const el=document.getElementById('eq-o'+i);if(el)el.value=o}});
+      (b.options||[]).forEach((o,i)=>{const el=document.getElementById('eq-o'+i);if(el)el.value=o});
       const ciEl=document.getElementById('eq-ci');if(ciEl&&b.correct!==undefined)ciEl.value=b.correct;
-      if(b.explanations){{
+      if(b.explanations){
         const excEl=document.getElementById('eq-exc');if(excEl)excEl.value=b.explanations.correct||'';
         const exwEl=document.getElementById('eq-exw');if(exwEl)exwEl.value=b.explanations.wrong||'';
-      }}
-    }}
+      }
+    }
 
     // Flash success
     btn.innerHTML='<svg width="12" height="12" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="3"><path stroke-linecap="round" d="M5 13l4 4L19 7"/></svg> Applied!';
     btn.style.background='#16a34a';
-    setTimeout(()=>{{btn.disabled=false;btn.innerHTML='<svg width="12" height="12" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2"><path d="M12 2L2 7l10 5 10-5-10-5z"/><path d="M2 17l10 5 10-5"/><path d="M2 12l10 5 10-5"/></svg> Apply';btn.style.background=''}},2000);
-  }}catch(e){{
+    setTimeout(()=>{btn.disabled=false;btn.innerHTML='<svg width="12" height="12" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2"><path d="M12 2L2 7l10 5 10-5-10-5z"/><path d="M2 17l10 5 10-5"/><path d="M2 12l10 5 10-5"/></svg> Apply';btn.style.background=''},2000);
+  }catch(e){
     errEl.textContent=e.message;
     errEl.style.display='block';
     btn.disabled=false;
     btn.innerHTML='<svg width="12" height="12" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2"><path d="M12 2L2 7l10 5 10-5-10-5z"/><path d="M2 17l10 5 10-5"/><path d="M2 12l10 5 10-5"/></svg> Apply';
-  }}
-}}
+  }
+}
 
-async function regenNarration(){{
+async function regenNarration(){
   const btn=document.getElementById('narr-regen-btn');
   const narrEl=document.getElementById('edit-narr');
   const apiKey=localStorage.getItem('lf_anthropic_key')||'';
-  if(!apiKey){{
+  if(!apiKey){
     alert('No API key found. Set your Anthropic API key in the main app Configure section first.');
     return;
-  }}
+  }
 
   // Build a snapshot with current form values
   const d=slidesData[cur];
@@ -1916,147 +2851,151 @@ async function regenNarration(){{
   snapshot.s=document.getElementById('edit-sub').value;
   // Read current block edits from the form
   const tp=d.type||'content';
-  if(tp==='content'){{
+  if(tp==='content'){
     const blocks=(snapshot.body&&snapshot.body.blocks)||[];
-    document.querySelectorAll('[data-bi]').forEach(el=>{{
+    document.querySelectorAll('[data-bi]').forEach(el=>{
       const bi=parseInt(el.dataset.bi);
       const field=el.dataset.field;
       const dtype=el.dataset.type;
       if(!blocks[bi])return;
       if(dtype==='list')blocks[bi].items=el.value.split('\\n').filter(x=>x.trim());
-      else if(field==='html'){{blocks[bi].html=el.value;blocks[bi].text=el.value}}
+      else if(field==='html'){blocks[bi].html=el.value;blocks[bi].text=el.value}
       else if(field==='text')blocks[bi].text=el.value;
       else if(field!=='alt')blocks[bi][field]=el.value;
-    }});
-  }}else if(tp==='quiz'){{
-    const body=snapshot.body||{{}};
+    });
+  }else if(tp==='quiz'){
+    const body=snapshot.body||{};
     const qEl=document.getElementById('eq-q');if(qEl)body.question=qEl.value;
-    const opts=[];for(let i=0;i<4;i++){{const el=document.getElementById('eq-o'+i);if(el)opts.push(el.value)}}
+    const opts=[];for(let i=0;i<4;i++){const el=document.getElementById('eq-o'+i);if(el)opts.push(el.value)}
     if(opts.length)body.options=opts;
     snapshot.body=body;
-  }}
+  }
   delete snapshot.narration;
 
   btn.disabled=true;
   btn.innerHTML='<svg width="10" height="10" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2" style="animation:spin .7s linear infinite"><path d="M12 2L2 7l10 5 10-5-10-5z"/></svg> Rewriting...';
 
-  try{{
+  try{
     const updated=await callClaude(apiKey,snapshot,'Rewrite ONLY the narration field for this slide. Write 2-5 sentences as a friendly teacher explaining the current content of this slide. Keep the narration natural and conversational. Return the full slide JSON with the updated narration.');
-    if(updated&&updated.narration){{
+    if(updated&&updated.narration){
       narrEl.value=updated.narration;
       btn.innerHTML='<svg width="10" height="10" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="3"><path stroke-linecap="round" d="M5 13l4 4L19 7"/></svg> Done!';
       btn.style.borderColor='#16a34a';btn.style.color='#16a34a';
-      setTimeout(()=>{{btn.disabled=false;btn.innerHTML='<svg width="10" height="10" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2"><path d="M12 2L2 7l10 5 10-5-10-5z"/><path d="M2 17l10 5 10-5"/><path d="M2 12l10 5 10-5"/></svg> Rewrite with AI';btn.style.borderColor='';btn.style.color=''}},2000);
-    }}else{{throw new Error('No narration returned')}}
-  }}catch(e){{
+      setTimeout(()=>{btn.disabled=false;btn.innerHTML='<svg width="10" height="10" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2"><path d="M12 2L2 7l10 5 10-5-10-5z"/><path d="M2 17l10 5 10-5"/><path d="M2 12l10 5 10-5"/></svg> Rewrite with AI';btn.style.borderColor='';btn.style.color=''},2000);
+    }else{throw new Error('No narration returned')}
+  }catch(e){
     alert('Failed: '+e.message);
     btn.disabled=false;
     btn.innerHTML='<svg width="10" height="10" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2"><path d="M12 2L2 7l10 5 10-5-10-5z"/><path d="M2 17l10 5 10-5"/><path d="M2 12l10 5 10-5"/></svg> Rewrite with AI';
-  }}
-}}
+  }
+}
 
-function editImgChange(input,imgIdx,bi){{
+function editImgChange(input,imgIdx,bi){
   if(!input.files||!input.files[0])return;
   const file=input.files[0];
   const reader=new FileReader();
-  reader.onload=function(e){{
+  reader.onload=function(e){
     const dataUri=e.target.result;
     // Store new media
-    if(imgIdx===null||imgIdx===undefined){{imgIdx=Object.keys(IMAGES).length;while(IMAGES[imgIdx])imgIdx++}}
+    if(imgIdx===null||imgIdx===undefined){imgIdx=Object.keys(IMAGES).length;while(IMAGES[imgIdx])imgIdx++}
     IMAGES[imgIdx]=dataUri;
     // Update block
     const d=slidesData[cur];
     const blocks=(d.body&&d.body.blocks)||[];
-    if(blocks[bi]){{blocks[bi].image_idx=imgIdx}}
+    if(blocks[bi]){blocks[bi].image_idx=imgIdx}
     // Invalidate blob cache for this index
-    if(_blobCache[imgIdx]){{URL.revokeObjectURL(_blobCache[imgIdx]);delete _blobCache[imgIdx]}}
+    if(_blobCache[imgIdx]){URL.revokeObjectURL(_blobCache[imgIdx]);delete _blobCache[imgIdx]}
     // Update preview
     const slot=input.parentElement;
     const src=mediaSrc(imgIdx);
     const vid=dataUri.startsWith('data:video/');
-    const mediaEl=vid?`<video src="${{src}}" controls playsinline style="max-width:100%;max-height:200px"></video>`:`<img src="${{src}}">`;
-    slot.innerHTML=`<input type="file" accept="image/*,video/mp4,video/webm" style="display:none" onchange="editImgChange(this,${{imgIdx}},${{bi}})">${{mediaEl}}`;
+    const mediaEl=vid?`<video src="${src}" controls playsinline style="max-width:100%;max-height:200px"></video>`:`<img src="${src}">`;
+    slot.innerHTML=`<input type="file" accept="image/*,video/mp4,video/webm" style="display:none" onchange="editImgChange(this,${imgIdx},${bi})">${mediaEl}`;
     // If video was added/replaced, update narration and clear audio cache
-    if(vid){{
+    if(vid){
       const d2=slidesData[cur];
       const narr=d2.narration||'';
-      if(!/video|watch|demo|action|look at/i.test(narr)){{
+      if(!/video|watch|demo|action|look at/i.test(narr)){
         d2.narration=(narr.trim()?narr.trim()+' ':'')+'Now, let\\'s watch the video to see this in action.';
         S[cur].narr=d2.narration;
-      }}
+      }
       if(audioCache)delete audioCache[cur];
+      delete pcmCache[cur];delete audioBlobs[cur];
+      if(typeof NARR_HASH==='object')NARR_HASH[cur]=null;
       if(typeof PREGEN_AUDIO==='object')delete PREGEN_AUDIO[cur];
-    }}
-  }};
+    }
+  };
   reader.readAsDataURL(file);
-}}
+}
 
-function editImgDelete(bi,imgIdx){{
+function editImgDelete(bi,imgIdx){
   pushUndo();
   const d=slidesData[cur];
   const blocks=(d.body&&d.body.blocks)||[];
-  if(blocks[bi]){{delete blocks[bi].image_idx}}
-  if(imgIdx!==null&&imgIdx!==undefined){{
-    if(_blobCache[imgIdx]){{URL.revokeObjectURL(_blobCache[imgIdx]);delete _blobCache[imgIdx]}}
+  if(blocks[bi]){delete blocks[bi].image_idx}
+  if(imgIdx!==null&&imgIdx!==undefined){
+    if(_blobCache[imgIdx]){URL.revokeObjectURL(_blobCache[imgIdx]);delete _blobCache[imgIdx]}
     delete IMAGES[imgIdx];
-  }}
+  }
   // Update UI
   const slot=document.getElementById('edit-img-slot-'+bi);
-  if(slot){{slot.innerHTML=`<input type="file" accept="image/*,video/mp4,video/webm" style="display:none" onchange="editImgChange(this,null,${{bi}})"><div class="placeholder">Click to upload image or video</div>`}}
+  if(slot){slot.innerHTML=`<input type="file" accept="image/*,video/mp4,video/webm" style="display:none" onchange="editImgChange(this,null,${bi})"><div class="placeholder">Click to upload image or video</div>`}
   const actions=slot&&slot.nextElementSibling;
   if(actions)actions.innerHTML='';
-}}
+}
 
-function editAddImage(){{
+function editAddImage(){
   const inp=document.getElementById('edit-add-img-input');
   inp.dataset.insertAt='';
   inp.click();
-}}
+}
 
-function insertMediaAt(pos){{
+function insertMediaAt(pos){
   const inp=document.getElementById('edit-add-img-input');
   inp.dataset.insertAt=pos;
   inp.click();
-}}
+}
 
-function editAddImageDone(input){{
+function editAddImageDone(input){
   if(!input.files||!input.files[0])return;
   const insertPos=input.dataset.insertAt;
   const file=input.files[0];
   const reader=new FileReader();
-  reader.onload=function(e){{
+  reader.onload=function(e){
     pushUndo();
     const dataUri=e.target.result;
     let imgIdx=0;
     while(IMAGES[imgIdx])imgIdx++;
     IMAGES[imgIdx]=dataUri;
     const d=slidesData[cur];
-    if(!d.body)d.body={{}};
+    if(!d.body)d.body={};
     if(!d.body.blocks)d.body.blocks=[];
-    const newBlock={{kind:'image',image_idx:imgIdx,alt:''}};
-    if(insertPos!==undefined&&insertPos!==''){{
+    const newBlock={kind:'image',image_idx:imgIdx,alt:''};
+    if(insertPos!==undefined&&insertPos!==''){
       d.body.blocks.splice(parseInt(insertPos),0,newBlock);
-    }}else{{
+    }else{
       d.body.blocks.push(newBlock);
-    }}
+    }
     // If a video was added, auto-update narration and clear audio cache
-    if(dataUri.startsWith('data:video/')){{
+    if(dataUri.startsWith('data:video/')){
       const narr=d.narration||'';
-      if(!/video|watch|demo|action|look at/i.test(narr)){{
+      if(!/video|watch|demo|action|look at/i.test(narr)){
         d.narration=(narr.trim()?narr.trim()+' ':'')+'Now, let\\'s watch the video to see this in action.';
         S[cur].narr=d.narration;
-      }}
+      }
       if(audioCache)delete audioCache[cur];
+      delete pcmCache[cur];delete audioBlobs[cur];
+      if(typeof NARR_HASH==='object')NARR_HASH[cur]=null;
       if(typeof PREGEN_AUDIO==='object')delete PREGEN_AUDIO[cur];
-    }}
+    }
     input.value='';
     closeEdit();
     setTimeout(()=>openEdit(),250);
-  }};
+  };
   reader.readAsDataURL(file);
-}}
+}
 
-function saveEdit(){{
+function saveEdit(){
   pushUndo();
   const d=slidesData[cur];
   const tp=d.type||'content';
@@ -2070,92 +3009,94 @@ function saveEdit(){{
   S[cur].s=d.s;
   S[cur].narr=d.narration;
 
-  if(tp==='content'){{
+  if(tp==='content'){
     const blocks=(d.body&&d.body.blocks)||[];
-    document.querySelectorAll('[data-bi]').forEach(el=>{{
+    document.querySelectorAll('[data-bi]').forEach(el=>{
       const bi=parseInt(el.dataset.bi);
       const field=el.dataset.field;
       const dtype=el.dataset.type;
       if(!blocks[bi])return;
-      if(dtype==='list'){{
+      if(dtype==='list'){
         blocks[bi].items=el.value.split('\\n').filter(x=>x.trim());
-      }}else if(dtype==='steps'){{
-        blocks[bi].items=el.value.split('\\n').filter(x=>x.trim()).map(x=>({{text:x}}));
-      }}else if(dtype==='icons'){{
-        blocks[bi].items=el.value.split('\\n').filter(x=>x.trim()).map(x=>{{const p=x.split('|');return{{icon:p[0]||'',label:p[1]||'',desc:p[2]||''}}}});
-      }}else if(dtype==='csv'){{
+      }else if(dtype==='steps'){
+        blocks[bi].items=el.value.split('\\n').filter(x=>x.trim()).map(x=>({text:x}));
+      }else if(dtype==='icons'){
+        blocks[bi].items=el.value.split('\\n').filter(x=>x.trim()).map(x=>{const p=x.split('|');return{icon:p[0]||'',label:p[1]||'',desc:p[2]||''}});
+      }else if(dtype==='csv'){
         blocks[bi][field]=el.value.split(',').map(x=>x.trim());
-      }}else if(dtype==='table'){{
+      }else if(dtype==='table'){
         blocks[bi].rows=el.value.split('\\n').filter(x=>x.trim()).map(r=>r.split(',').map(c=>c.trim()));
-      }}else if(field==='html'){{
+      }else if(field==='html'){
         blocks[bi].html=el.value;blocks[bi].text=el.value;blocks[bi].content=el.value;
-      }}else if(field==='good'||field==='bad'){{
+      }else if(field==='good'||field==='bad'){
         blocks[bi][field]=el.value;
-      }}else if(field==='alt'){{
+      }else if(field==='alt'){
         blocks[bi].alt=el.value;blocks[bi].caption=el.value;
-      }}else{{
-        blocks[bi][field]=el.value;if(field==='text'){{blocks[bi].content=el.value;blocks[bi].code=el.value}}
-      }}
-    }});
-  }}else if(tp==='quiz'){{
-    const body=d.body||{{}};
+      }else{
+        blocks[bi][field]=el.value;if(field==='text'){blocks[bi].content=el.value;blocks[bi].code=el.value}
+      }
+    });
+  }else if(tp==='quiz'){
+    const body=d.body||{};
     body.question=document.getElementById('eq-q').value;
     const opts=[];
-    for(let i=0;i<4;i++){{const el=document.getElementById('eq-o'+i);if(el)opts.push(el.value)}}
+    for(let i=0;i<4;i++){const el=document.getElementById('eq-o'+i);if(el)opts.push(el.value)}
     body.options=opts;
     body.correct=parseInt(document.getElementById('eq-ci').value)||0;
-    body.explanations={{correct:document.getElementById('eq-exc').value,wrong:document.getElementById('eq-exw').value}};
+    body.explanations={correct:document.getElementById('eq-exc').value,wrong:document.getElementById('eq-exw').value};
     d.body=body;
     // Sync top-level so rebuild reads updated values
     d.question=body.question;d.options=body.options;d.correct=body.correct;d.explanations=body.explanations;
-  }}else if(tp==='matching'){{
-    const body=d.body||{{}};
+  }else if(tp==='matching'){
+    const body=d.body||{};
     const pairsEl=document.getElementById('eq-pairs');
-    if(pairsEl){{
-      body.pairs=pairsEl.value.split('\\n').filter(x=>x.trim()).map(line=>{{
+    if(pairsEl){
+      body.pairs=pairsEl.value.split('\\n').filter(x=>x.trim()).map(line=>{
         const parts=line.split('|').map(p=>p.trim());
-        return{{left:parts[0]||'',right:parts[1]||''}};
-      }});
-    }}
+        return{left:parts[0]||'',right:parts[1]||''};
+      });
+    }
     d.body=body;
     d.pairs=body.pairs;
-  }}else if(tp==='prompt_builder'){{
-    const body=d.body||{{}};
+  }else if(tp==='prompt_builder'){
+    const body=d.body||{};
     const instrEl=document.getElementById('eq-pb-instr');if(instrEl)body.instructions=instrEl.value;
     const chipsEl=document.getElementById('eq-pb-chips');if(chipsEl)body.chips=chipsEl.value.split('\\n').filter(x=>x.trim());
     const phEl=document.getElementById('eq-pb-ph');if(phEl)body.placeholder=phEl.value;
     d.body=body;
-    d.parts=body.chips?[{{l:body.instructions||'Build your response',o:body.chips}}]:(d.parts||[]);
-  }}else if(tp==='ordering'){{
-    const body=d.body||{{}};
+    d.parts=body.chips?[{l:body.instructions||'Build your response',o:body.chips}]:(d.parts||[]);
+  }else if(tp==='ordering'){
+    const body=d.body||{};
     const instrEl=document.getElementById('eq-ord-instr');if(instrEl)body.instructions=instrEl.value;
     const itemsEl=document.getElementById('eq-ord-items');if(itemsEl)body.correct_order=itemsEl.value.split('\\n').filter(x=>x.trim());
     d.body=body;
     d.items=body.correct_order;
-  }}else if(tp==='milestone'){{
-    const body=d.body||{{}};
+  }else if(tp==='milestone'){
+    const body=d.body||{};
     const emojiEl=document.getElementById('eq-ms-emoji');if(emojiEl)body.emoji=emojiEl.value;
     const msgEl=document.getElementById('eq-ms-msg');if(msgEl)body.message=msgEl.value;
     d.body=body;
     d.emoji=body.emoji;
-  }}else if(tp==='completion'){{
-    const body=d.body||{{}};
+  }else if(tp==='completion'){
+    const body=d.body||{};
     const taEl=document.getElementById('eq-comp-ta');if(taEl)body.takeaways=taEl.value.split('\\n').filter(x=>x.trim());
     const ctaEl=document.getElementById('eq-comp-cta');if(ctaEl)body.cta=ctaEl.value;
     d.body=body;
     d.emoji=body.emoji;
-  }}
+  }
 
   // Clear audio cache for this slide (narration changed)
   if(audioCache)delete audioCache[cur];
+  delete pcmCache[cur];delete audioBlobs[cur];
+  if(typeof NARR_HASH==='object')NARR_HASH[cur]=null;
   if(typeof PREGEN_AUDIO==='object')delete PREGEN_AUDIO[cur];
 
   closeEdit();
-  try{{rebuildAllSlides()}}catch(e){{console.error('rebuildAllSlides error:',e);R()}}
-}}
+  try{rebuildAllSlides()}catch(e){console.error('rebuildAllSlides error:',e);R()}
+}
 
 // ── KEYS ──
-document.addEventListener('keydown',e=>{{if(e.key==='ArrowRight')go(cur+1);if(e.key==='ArrowLeft')go(cur-1)}});
+document.addEventListener('keydown',e=>{if(e.key==='ArrowRight')go(cur+1);if(e.key==='ArrowLeft')go(cur-1)});
 
 R();
 showWelcome();
@@ -2163,21 +3104,117 @@ showWelcome();
 </body>
 </html>'''
 
+try:
+    # Optional: shrink the <style> block once at import — builds and the
+    # browser then carry minified CSS; gzip on the HTTP layer compounds it
+    import rcssmin
+    _css_s = _HTML_STATIC_HEAD.index("<style>") + len("<style>")
+    _css_e = _HTML_STATIC_HEAD.index("</style>")
+    _HTML_STATIC_HEAD = (
+        _HTML_STATIC_HEAD[:_css_s]
+        + rcssmin.cssmin(_HTML_STATIC_HEAD[_css_s:_css_e])
+        + _HTML_STATIC_HEAD[_css_e:]
+    )
+except ImportError:
+    pass
+
+
+
+def build_html(slides_data, course_title, elevenlabs_key="", elevenlabs_voice="EXAVITQu4vr4xnSDxMaL", images=None, audio_cache=None):
+    """Wrap the slides JSON in the complete, guaranteed-working HTML shell."""
+    return "".join(build_html_parts(slides_data, course_title, elevenlabs_key, elevenlabs_voice, images, audio_cache))
+
 
-def extract_pptx_slide_titles(filepath):
+def build_html_parts(slides_data, course_title, elevenlabs_key="", elevenlabs_voice="EXAVITQu4vr4xnSDxMaL", images=None, audio_cache=None):
+    """Yield the lesson HTML in segments.
+
+    The slides/images/audio JSON payloads can run to many megabytes of
+    base64; yielding them as separate chunks lets callers write or stream
+    the document without splicing everything into one giant f-string first.
+    """
+
+    # Derive title if not provided — first content slide with one wins.
+    # The welcome modal needs no server-side scan: the viewer fills its
+    # subtitle from slide 0 directly (showWelcome), so only the title is
+    # derived here
+    if not course_title:
+        for s in slides_data:
+            if s.get("type") == "content" and s.get("t"):
+                course_title = s["t"]
+                break
+        else:
+            course_title = slides_data[0].get("t", "Lesson") if slides_data else "Lesson"
+
+    slides_json = _json_dumps_str(slides_data)
+
+    # Build images lookup: index -> data_uri. The dict holds references to
+    # the existing URI strings (no byte copy); the only full-size
+    # materialization is the serialized JSON itself
+    images_dict = {i: img["data_uri"] for i, img in enumerate(images or [])}
+    images_json = _json_dumps_str(images_dict)
+
+    # Build pre-generated audio lookup: index -> base64 mp3
+    audio_dict = audio_cache if audio_cache else {}
+    audio_json = _json_dumps_str(audio_dict)
+
+    # Stable per-slide audio cache keys, computed once at build time so the
+    # viewer never has to hash narration on the playback path. Slides that
+    # share narration (boilerplate openers) collapse to one cache entry.
+    narr_hashes = [
+        hashlib.sha256(
+            f"{generate_slide_narration_text(s, images)}|{elevenlabs_voice}|eleven_turbo_v2_5".encode()
+        ).hexdigest()
+        for s in slides_data
+    ]
+    narr_hash_json = _json_dumps_str(narr_hashes)
+
+    # Titles come from user uploads/filenames: escape them for the two spots
+    # they land in — HTML text in <title>, and a JS template literal where a
+    # backtick or ${ would otherwise terminate or evaluate. '<' is escaped
+    # too: the literal sits inside an inline <script>, where a '</script>'
+    # in the data would end the block early
+    _js_title = (course_title.replace("\\", "\\\\").replace("`", "\\`")
+                 .replace("${", "\\${").replace("<", "\\x3C"))
+
+    yield f'''<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="UTF-8">
+<meta name="viewport" content="width=device-width, initial-scale=1, maximum-scale=1, user-scalable=no">
+<title>{_html_escape(course_title)}</title>'''
+    yield _HTML_STATIC_HEAD
+    # The three big payloads go out as their own chunks — they dominate the
+    # document size and never need to be copied into the surrounding markup
+    yield slides_json
+    yield ";/*EDATA*/\n/*SIMGS*/const IMAGES="
+    yield images_json
+    yield ";/*EIMGS*/\n/*SAUDIO*/const PREGEN_AUDIO="
+    yield audio_json
+    yield f''';/*EAUDIO*/
+/*SNARRH*/const NARR_HASH={narr_hash_json};/*ENARRH*/
+const EL_BAKED_VOICE='{elevenlabs_voice}';
+const COURSE_TITLE=`{_js_title}`;
+'''
+    yield _VIEWER_JS
+
+
+def extract_pptx_slide_titles(source):
     """Extract slide titles from a PPTX file for the slide-by-slide image assignment UI."""
     slides = []
-    with zipfile.ZipFile(filepath, "r") as zf:
-        slide_paths = _pptx_slide_order(zf)
+    zf, owned = _pptx_zf(source)
+    try:
+        slide_paths, trees = _slide_inventory(zf)
         for i, sp in enumerate(slide_paths):
+            title = ""
             try:
-                slide_tree = etree.parse(zf.open(sp))
-                title, texts = _get_slide_texts(slide_tree)
-                if not title and texts:
-                    for t in texts:
-                        if len(t) > 3:
-                            title = t[:80]
-                            break
+                slide_tree = trees.get(sp)
+                if slide_tree is not None:
+                    title, texts, _ = _slide_text_bundle(zf, sp, slide_tree)
+                    if not title and texts:
+                        for t in texts:
+                            if len(t) > 3:
+                                title = t[:80]
+                                break
             except Exception:
                 title = ""
             slides.append({
@@ -2185,26 +3222,109 @@ def extract_pptx_slide_titles(filepath):
                 "title": title or f"Slide {i + 1}",
                 "slide_number": i + 1
             })
+    finally:
+        if owned:
+            zf.close()
     return slides
 
 
-def extract_pdf_page_titles(filepath):
-    """Extract page titles/first-lines from a PDF for the slide-by-slide image assignment UI."""
-    pages = []
+class _StopTitleScan(Exception):
+    """Raised from the visitor to abort content-stream parsing early."""
+
+
+def _pdf_first_line(page):
+    """Extract a page's first text line without rendering the whole page.
+
+    Walks the content stream with a visitor and bails out as soon as the
+    text baseline moves off the first line (or 80 chars accumulate), so
+    dense pages don't pay full extract_text just to keep one line."""
+    parts = []
+    state = {"y": None, "n": 0}
+
+    def visit(text, cm, tm, font, size):
+        t = text.strip()
+        if not t:
+            return
+        y = tm[5]
+        if state["y"] is None:
+            state["y"] = y
+        elif abs(y - state["y"]) > 1.0:
+            raise _StopTitleScan
+        parts.append(t)
+        state["n"] += len(t) + 1
+        if state["n"] >= 80:
+            raise _StopTitleScan
+
     try:
-        reader = PdfReader(filepath)
-        for i, page in enumerate(reader.pages):
-            text = page.extract_text()
+        page.extract_text(visitor_text=visit)
+    except _StopTitleScan:
+        pass
+    except Exception:
+        return ""
+    return " ".join(parts)[:80]
+
+
+def _pdf_titles_worker(args):
+    """Extract first-line titles for one contiguous chunk of PDF pages.
+
+    Top-level so ProcessPoolExecutor can pickle it; each worker re-opens the
+    document from the raw bytes (pypdf readers are not shareable across
+    processes)."""
+    data, idxs = args
+    reader = PdfReader(io.BytesIO(data))
+    out = []
+    for i in idxs:
+        title = ""
+        try:
+            page = reader.pages[i]
+            title = _pdf_first_line(page)
+            if not title:
+                # Rare: visitor saw nothing usable — fall back to the full pass
+                text = page.extract_text()
+                if text:
+                    for line in text.split("\n"):
+                        line = line.strip()
+                        if line:
+                            title = line[:80]
+                            break
+        except Exception:
             title = ""
-            if text:
-                for line in text.split("\n"):
-                    line = line.strip()
-                    if line:
-                        title = line[:80]
-                        break
+        out.append((i, title))
+    return out
+
+
+def extract_pdf_page_titles(source):
+    """Extract page titles/first-lines from a PDF for the slide-by-slide image assignment UI.
+
+    pypdf's extract_text is CPU-bound pure Python, so large documents fan the
+    pages out over a process pool; small ones run inline to skip the fork
+    overhead.
+    """
+    pages = []
+    try:
+        if hasattr(source, "read"):
+            data = source.read()
+        else:
+            with open(source, "rb") as f:
+                data = f.read()
+        n = len(PdfReader(io.BytesIO(data)).pages)
+        workers = min(os.cpu_count() or 1, n)
+        titles = {}
+        if n >= 8 and workers > 1:
+            step = -(-n // workers)
+            chunks = [(data, list(range(s, min(n, s + step)))) for s in range(0, n, step)]
+            try:
+                with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+                    for out in pool.map(_pdf_titles_worker, chunks):
+                        titles.update(out)
+            except (OSError, concurrent.futures.process.BrokenProcessPool):
+                titles = dict(_pdf_titles_worker((data, list(range(n)))))
+        else:
+            titles = dict(_pdf_titles_worker((data, list(range(n)))))
+        for i in range(n):
             pages.append({
                 "index": i,
-                "title": title or f"Page {i + 1}",
+                "title": titles.get(i) or f"Page {i + 1}",
                 "slide_number": i + 1
             })
     except Exception as e:
@@ -2212,14 +3332,26 @@ def extract_pdf_page_titles(filepath):
     return pages
 
 
-def generate_lesson(pdf_text, api_key, course_title=None, elevenlabs_key="", elevenlabs_voice="EXAVITQu4vr4xnSDxMaL", images=None, slide_text_notes=None):
-    """Generate interactive HTML lesson from PDF text."""
-    images_info = [{"page": img["page"], "desc": img["desc"]} for img in (images or [])]
+def generate_lesson_parts(pdf_text, api_key, course_title=None, elevenlabs_key="", elevenlabs_voice="EXAVITQu4vr4xnSDxMaL", images=None, slide_text_notes=None):
+    """Generate an interactive HTML lesson, yielded in segments.
+
+    Callers that write to disk stream these chunks straight into a
+    text-mode file — the encoder works per chunk, so the multi-MB document
+    is never materialized as one whole str (or re-encoded as one whole
+    bytes) in memory."""
+    # Only the description reaches the prompt (placement is the model's job
+    # via image_idx), so skip building per-image dicts just to unpack them
+    images_info = [img["desc"] for img in (images or [])]
     slides_data = generate_slides_json(pdf_text, api_key, course_title, images_info=images_info or None, slide_text_notes=slide_text_notes)
     title = course_title or "Interactive Lesson"
     # Pre-generate ElevenLabs audio at build time (baked into HTML)
-    audio = pre_generate_audio(slides_data, elevenlabs_key, elevenlabs_voice) if elevenlabs_key else {}
-    return build_html(slides_data, title, images=images, audio_cache=audio)
+    audio = pre_generate_audio(slides_data, elevenlabs_key, elevenlabs_voice, images=images) if elevenlabs_key else {}
+    return build_html_parts(slides_data, title, images=images, audio_cache=audio)
+
+
+def generate_lesson(pdf_text, api_key, course_title=None, elevenlabs_key="", elevenlabs_voice="EXAVITQu4vr4xnSDxMaL", images=None, slide_text_notes=None):
+    """Generate interactive HTML lesson from PDF text."""
+    return "".join(generate_lesson_parts(pdf_text, api_key, course_title, elevenlabs_key, elevenlabs_voice, images, slide_text_notes))
 
 
 @app.route("/")
@@ -2227,30 +3359,50 @@ def index():
     return render_template("index.html")
 
 
+def _receive_single_upload_bytes(field_name="file"):
+    """Read a single-file upload into memory, skipping the temp-file round trip.
+
+    Used by routes that only parse the upload (no image-extraction libs that
+    need a path): writing a 20MB deck to disk and immediately re-reading it
+    doubles the I/O for nothing. Returns (original_filename, BytesIO); both
+    are None when the field is missing or empty."""
+    if StreamingFormDataParser is not None and "multipart/form-data" in (request.content_type or ""):
+        target = ValueTarget()
+        parser = StreamingFormDataParser(headers=request.headers)
+        parser.register(field_name, target)
+        while True:
+            chunk = request.stream.read(65536)
+            if not chunk:
+                break
+            parser.data_received(chunk)
+        if not target.multipart_filename:
+            return None, None
+        return target.multipart_filename, io.BytesIO(target.value)
+
+    f = request.files.get(field_name)
+    if not f or not f.filename:
+        return None, None
+    return f.filename, io.BytesIO(f.read())
+
+
 @app.route("/extract", methods=["POST"])
 def extract():
     """Extract slide titles from an uploaded PPTX/PDF without generating a lesson."""
-    if "file" not in request.files:
+    original_name, buf = _receive_single_upload_bytes("file")
+    if buf is None:
         return jsonify({"error": "No file uploaded"}), 400
 
-    file = request.files["file"]
-    if file.filename == "":
-        return jsonify({"error": "No file selected"}), 400
-
-    if not allowed_file(file.filename):
+    if not allowed_file(original_name):
         return jsonify({"error": "Only PPTX and PDF files are allowed"}), 400
 
-    filename = secure_filename(file.filename)
-    ext = get_file_ext(filename)
-    temp_path = os.path.join(app.config["UPLOAD_FOLDER"], f"temp_{uuid.uuid4().hex}_{filename}")
-    file.save(temp_path)
+    ext = get_file_ext(original_name)
 
     try:
         if ext in ("pptx", "ppt"):
-            slides = extract_pptx_slide_titles(temp_path)
+            slides = extract_pptx_slide_titles(buf)
             file_type = "pptx"
         else:
-            slides = extract_pdf_page_titles(temp_path)
+            slides = extract_pdf_page_titles(buf)
             file_type = "pdf"
 
         return jsonify({
@@ -2262,9 +3414,6 @@ def extract():
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
-    finally:
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
 
 
 @app.route("/convert", methods=["POST"])
@@ -2287,12 +3436,24 @@ def convert():
     ext = get_file_ext(filename)
     temp_path = os.path.join(app.config["UPLOAD_FOLDER"], f"temp_{uuid.uuid4().hex}_{filename}")
     file.save(temp_path)
+    # The extraction passes below read the file strictly front-to-back; tell
+    # the kernel so it reads ahead instead of faulting page by page
+    try:
+        fd = os.open(temp_path, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        finally:
+            os.close(fd)
+    except (AttributeError, OSError):
+        pass
 
     try:
         # Extract text + images based on file type
         if ext in ("pptx", "ppt"):
-            content_text = extract_pptx_text(temp_path)
-            auto_images = extract_pptx_images(temp_path)
+            # Read the archive into memory once; both passes share it
+            with _open_pptx(temp_path) as pptx_zf:
+                content_text = extract_pptx_text(pptx_zf)
+                auto_images = extract_pptx_images(pptx_zf)
             slide_label = "Slide"
         else:
             content_text = extract_pdf_text(temp_path)
@@ -2313,27 +3474,43 @@ def convert():
                 assignments = json.loads(image_assignments_json)
                 # assignments is a dict: {"0": "slide_image_0", "3": "slide_image_3", ...}
                 # The keys are slide indices, values are the form field names
+                pairs = []
                 for slide_idx_str, field_name in assignments.items():
                     slide_idx = int(slide_idx_str)
                     img_file = request.files.get(field_name)
                     if img_file and img_file.filename:
                         img_ext = get_file_ext(img_file.filename)
                         if img_ext in ("png", "jpg", "jpeg", "gif", "webp", "svg"):
-                            blob = img_file.read()
-                            content_type = img_file.content_type or f"image/{img_ext}"
-                            b64 = base64.b64encode(blob).decode("utf-8")
-                            assigned_images.append({
-                                "page": slide_idx + 1,
-                                "data_uri": f"data:{content_type};base64,{b64}",
-                                "desc": f"User-assigned image for slide {slide_idx + 1}",
-                                "source": "assigned"
-                            })
+                            pairs.append((slide_idx, img_file, img_ext))
+
+                def _ingest_assigned(pair):
+                    slide_idx, img_file, img_ext = pair
+                    # read() and b64encode both release the GIL, so distinct
+                    # files encode concurrently instead of back to back
+                    blob = img_file.read()
+                    content_type = img_file.content_type or f"image/{img_ext}"
+                    return {
+                        "page": slide_idx + 1,
+                        "data_uri": _data_uri(content_type, blob),
+                        "desc": f"User-assigned image for slide {slide_idx + 1}",
+                        "source": "assigned"
+                    }
+
+                if len(pairs) > 1:
+                    with concurrent.futures.ThreadPoolExecutor(max_workers=min(8, len(pairs))) as ex:
+                        assigned_images = list(ex.map(_ingest_assigned, pairs))
+                else:
+                    assigned_images = [_ingest_assigned(p) for p in pairs]
             except (json.JSONDecodeError, ValueError) as e:
                 print(f"Warning: Could not parse image_assignments: {e}")
 
         # Combine: assigned images first (highest priority), then manual uploads, then auto-extracted
         all_images = assigned_images + manual_images + auto_images
 
+        # Optionally serve images out-of-band instead of inlining base64
+        if request.form.get("embed_images", "1") == "0":
+            all_images = externalize_images(all_images)
+
         # Process per-slide text notes
         slide_text_notes = {}
         text_notes_json = request.form.get("slide_text_notes", "").strip()
@@ -2357,7 +3534,13 @@ def convert():
                 course_title = None
         elevenlabs_key = request.form.get("elevenlabs_key", "").strip()
         elevenlabs_voice = request.form.get("elevenlabs_voice", "").strip() or "EXAVITQu4vr4xnSDxMaL"
-        html_content = generate_lesson(
+
+        # Drop extraction scratch (parsed XML trees, media cache, candidate
+        # blobs) now — the Claude call below can take minutes and would
+        # otherwise pin that memory for the whole wait
+        gc.collect()
+
+        html_parts = generate_lesson_parts(
             content_text, api_key, course_title,
             elevenlabs_key=elevenlabs_key, elevenlabs_voice=elevenlabs_voice,
             images=all_images, slide_text_notes=slide_text_notes
@@ -2366,7 +3549,9 @@ def convert():
         output_name = f"lesson_{uuid.uuid4().hex[:8]}.html"
         output_path = os.path.join(app.config["UPLOAD_FOLDER"], output_name)
         with open(output_path, "w", encoding="utf-8") as f:
-            f.write(html_content)
+            for part in html_parts:
+                f.write(part)
+        _gzip_sibling(output_path)
 
         slides_count = content_text.count(f"--- {slide_label}")
 
@@ -2555,7 +3740,7 @@ def upload_html():
                 el_key = request.form.get("elevenlabs_key", "").strip()
                 el_voice = request.form.get("elevenlabs_voice", "").strip() or "EXAVITQu4vr4xnSDxMaL"
                 if el_key:
-                    new_audio = pre_generate_audio(slides_data, el_key, el_voice)
+                    new_audio = pre_generate_audio(slides_data, el_key, el_voice, images=images_list)
                     # Merge: new audio overwrites existing
                     existing_audio.update(new_audio)
 
@@ -2588,9 +3773,40 @@ def upload_html():
     })
 
 
+def _gzip_sibling(path):
+    """Pre-compress a written lesson so /preview can serve gzip bytes as-is.
+
+    Compressing once at build time beats per-request compression: lesson
+    files are written once and fetched many times, and the HTML (JSON +
+    base64 payloads) typically shrinks ~70%."""
+    try:
+        with open(path, "rb") as f_in, gzip.open(path + ".gz", "wb", compresslevel=6) as f_out:
+            while True:
+                chunk = f_in.read(65536)
+                if not chunk:
+                    break
+                f_out.write(chunk)
+    except OSError:
+        pass
+
+
 @app.route("/preview/<filename>")
 def preview(filename):
-    return send_from_directory(app.config["UPLOAD_FOLDER"], filename)
+    fname = secure_filename(filename)
+    headers = {
+        # Lesson filenames embed a uuid, so the bytes behind a URL are fixed
+        "Cache-Control": "public, max-age=31536000, immutable",
+        "Vary": "Accept-Encoding",
+    }
+    gz_path = os.path.join(app.config["UPLOAD_FOLDER"], fname + ".gz")
+    if "gzip" in (request.headers.get("Accept-Encoding") or "") and os.path.isfile(gz_path):
+        resp = send_from_directory(app.config["UPLOAD_FOLDER"], fname + ".gz", mimetype="text/html")
+        resp.headers["Content-Encoding"] = "gzip"
+        resp.headers.update(headers)
+        return resp
+    resp = send_from_directory(app.config["UPLOAD_FOLDER"], fname)
+    resp.headers.update(headers)
+    return resp
 
 
 @app.route("/batch-convert", methods=["POST"])
@@ -2639,8 +3855,9 @@ def batch_convert():
         ext = info["ext"]
         try:
             if ext in ("pptx", "ppt"):
-                content_text = extract_pptx_text(temp_path)
-                auto_images = extract_pptx_images(temp_path)
+                with _open_pptx(temp_path) as pptx_zf:
+                    content_text = extract_pptx_text(pptx_zf)
+                    auto_images = extract_pptx_images(pptx_zf)
             else:
                 content_text = extract_pdf_text(temp_path)
                 auto_images = extract_pdf_images(temp_path)
@@ -2650,7 +3867,9 @@ def batch_convert():
 
             course_title = os.path.splitext(filename)[0].replace("-", " ").replace("_", " ").strip() or None
 
-            html_content = generate_lesson(
+            gc.collect()  # free extraction scratch before the long API call
+
+            html_parts = generate_lesson_parts(
                 content_text, api_key, course_title,
                 elevenlabs_key=elevenlabs_key, elevenlabs_voice=elevenlabs_voice,
                 images=auto_images
@@ -2659,7 +3878,9 @@ def batch_convert():
             output_name = f"lesson_{uuid.uuid4().hex[:8]}.html"
             output_path = os.path.join(app.config["UPLOAD_FOLDER"], output_name)
             with open(output_path, "w", encoding="utf-8") as out_f:
-                out_f.write(html_content)
+                for part in html_parts:
+                    out_f.write(part)
+            _gzip_sibling(output_path)
 
             return {
                 "filename": info["original_name"],
@@ -2737,11 +3958,11 @@ def download(filename):
         html = f.read()
     # Strip edit mode: remove data-edit attribute so edit button is hidden via CSS
     html = html.replace(' data-edit="1"', '')
-    return Response(
-        html,
-        mimetype="text/html",
-        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
-    )
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"', "Vary": "Accept-Encoding"}
+    if "gzip" in (request.headers.get("Accept-Encoding") or ""):
+        headers["Content-Encoding"] = "gzip"
+        return Response(gzip.compress(html.encode("utf-8"), 6), mimetype="text/html", headers=headers)
+    return Response(html, mimetype="text/html", headers=headers)
 
 
 def scrape_url(url, timeout=30):
@@ -2822,12 +4043,12 @@ def topic_convert():
         slides_data = generate_slides_json(combined, api_key, course_title=topic)
         # Pre-generate ElevenLabs audio at build time
         audio = pre_generate_audio(slides_data, elevenlabs_key, elevenlabs_voice) if elevenlabs_key else {}
-        html_content = build_html(slides_data, topic, images=None, audio_cache=audio)
-
         output_name = f"lesson_{uuid.uuid4().hex[:8]}.html"
         output_path = os.path.join(app.config["UPLOAD_FOLDER"], output_name)
         with open(output_path, "w", encoding="utf-8") as f:
-            f.write(html_content)
+            for part in build_html_parts(slides_data, topic, images=None, audio_cache=audio):
+                f.write(part)
+        _gzip_sibling(output_path)
 
         return jsonify({
             "success": True,